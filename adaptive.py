@@ -0,0 +1,386 @@
+import sys
+import codecs
+import struct
+import argparse
+from bits import BitWriter
+from metrics import registry, timer
+
+"""
+Single pass adaptive Huffman coding (FGK algorithm) for pipes and streams of unknown length.
+Encoder and decoder start with tree that has only NYT (not yet transmitted) node and update
+their trees in same way after every symbol, so code table is never stored and every symbol
+can be written as soon as it is read.
+New symbol is written as code of NYT followed by its code point in 21 bits (value of byte in 9 bits in bytes mode),
+end of stream is written as NYT followed by code point that is not valid (0x110000, or 256 in bytes mode).
+Nodes are kept in list ordered by rank, root first, weights never increase along the list (sibling property),
+so before weight of node is increased node is swapped with first node of same weight (leader of its weight block).
+Every node points to block of its weight, block keeps index of its leader and is linked with blocks of
+next larger and smaller weight, so leader is found and moved in constant time and update costs one step
+for every node on path to root, not for every node of same weight
+"""
+
+ADAPTIVE_MAGIC = b'HUFA'
+ADAPTIVE_VERSION = 1
+ADAPTIVE_HEADER = struct.Struct('>4sBB')
+ADAPTIVE_BYTES = 1
+LITERAL_BITS = 21
+BYTE_LITERAL_BITS = 9
+END = 0x110000
+BYTE_END = 256
+READ_SIZE = 1 << 16
+
+class AdaptiveNode:
+    __slots__ = ('left', 'right', 'parent', 'char', 'frequency', 'index', 'block')
+
+    def __init__(self, parent=None, char=None, frequency=0, index=0, block=None):
+        """
+        Construct a new 'AdaptiveNode' object, node of adaptive Huffman tree.
+
+        :param parent: The parent node (AdaptiveNode)
+        :param char: The character of leaf, None for NYT and internal nodes (char or int)
+        :param frequency: number of times char was seen, for internal node sum of children (int)
+        :param index: rank of node in list of nodes, root is 0 (int)
+        :param block: block of all nodes with same frequency (WeightBlock)
+        :return: returns nothing
+        """
+        self.left = None
+        self.right = None
+        self.parent = parent
+        self.char = char
+        self.frequency = frequency
+        self.index = index
+        self.block = block
+
+    def is_leaf(self):
+        """
+        is_leaf checks if node is has children or no
+        :return: true or false weather node is leaf
+        """
+        return self.left is None and self.right is None
+
+
+class WeightBlock:
+    __slots__ = ('weight', 'leader', 'higher', 'lower')
+
+    def __init__(self, weight, leader, higher=None, lower=None):
+        """
+        Construct a new 'WeightBlock' object, nodes of same weight that follow each other in list of nodes.
+
+        :param weight: frequency of all nodes of block (int)
+        :param leader: index of first node of block (int)
+        :param higher: block of next larger weight, it is before this block in list of nodes (WeightBlock)
+        :param lower: block of next smaller weight (WeightBlock)
+        :return: returns nothing
+        """
+        self.weight = weight
+        self.leader = leader
+        self.higher = higher
+        self.lower = lower
+
+
+class AdaptiveTree:
+    def __init__(self, binary=False):
+        """
+        Construct a new 'AdaptiveTree' object with only NYT node.
+
+        :param binary: symbols are bytes (integers) instead of characters (bool)
+        :return: returns nothing
+        """
+        self.binary = binary
+        self.literal_bits = BYTE_LITERAL_BITS if binary else LITERAL_BITS
+        self.end = BYTE_END if binary else END
+        self.root = AdaptiveNode(block=WeightBlock(0, 0))
+        self.nyt = self.root
+        self.nodes = [self.root]
+        self.leaves = {}
+
+    def code(self, node):
+        """
+        code: returns current code of node, bits are collected from node up to root
+
+        :param node: node of tree (AdaptiveNode)
+        :return: returns code value and code length (tuple)
+        """
+        value = 0
+        length = 0
+        while node.parent is not None:
+            if node.parent.right is node:
+                value |= 1 << length
+            length += 1
+            node = node.parent
+        return value, length
+
+    def swap(self, first, second):
+        """
+        swap: exchanges positions of two nodes in tree and in list of nodes, subtrees move with nodes
+
+        :param first: node of tree (AdaptiveNode)
+        :param second: node of tree, not ancestor of first (AdaptiveNode)
+        :return: returns nothing
+        """
+        first_parent = first.parent
+        second_parent = second.parent
+        if first_parent is second_parent:
+            first_parent.left, first_parent.right = first_parent.right, first_parent.left
+        else:
+            if first_parent.left is first:
+                first_parent.left = second
+            else:
+                first_parent.right = second
+            if second_parent.left is second:
+                second_parent.left = first
+            else:
+                second_parent.right = first
+            first.parent, second.parent = second_parent, first_parent
+        first.index, second.index = second.index, first.index
+        self.nodes[first.index] = first
+        self.nodes[second.index] = second
+
+    def update(self, c):
+        """
+        update: adds one occurrence of symbol to tree
+        New symbol splits NYT to new NYT (left) and leaf of symbol (right), both in block of weight 0,
+        then weights are increased from leaf up to root, every node is first swapped with
+        leader of its block, so weights in list of nodes stay ordered, and moved to block of next weight.
+        Leaf whose sibling is NYT has same weight as its parent, which is its leader, so it is not swapped,
+        it is increased just before its parent, which then skips it when leader of their old block is moved
+
+        :param c: symbol (char or int)
+        :return: returns nothing
+        """
+        nodes = self.nodes
+        node = self.leaves.get(c)
+        if node is None:
+            parent = self.nyt
+            node = AdaptiveNode(parent, c, 0, len(nodes), parent.block)
+            self.nyt = AdaptiveNode(parent, None, 0, len(nodes) + 1, parent.block)
+            parent.left = self.nyt
+            parent.right = node
+            nodes.append(node)
+            nodes.append(self.nyt)
+            self.leaves[c] = node
+        count = len(nodes)
+        skip = False
+        while node is not None:
+            block = node.block
+            weight = block.weight
+            index = node.index
+            leader = block.leader
+            emptied = False
+            if (leader != index and nodes[leader] is node.parent):
+                skip = True
+            else:
+                if (leader != index):
+                    self.swap(node, nodes[leader])
+                    index = leader
+                following = index + 1 + skip
+                skip = False
+                if (following < count and nodes[following].block is block):
+                    block.leader = following
+                else:
+                    emptied = True
+            higher = block.higher
+            if (higher is not None and higher.weight == weight + 1):
+                if (higher.leader > index):
+                    higher.leader = index
+                node.block = higher
+                if (emptied):
+                    higher.lower = block.lower
+                    if block.lower is not None:
+                        block.lower.higher = higher
+            elif (emptied):
+                #node was only node of its weight, its block takes next weight
+                block.weight = weight + 1
+            else:
+                node.block = WeightBlock(weight + 1, index, higher, block)
+                block.higher = node.block
+                if higher is not None:
+                    higher.lower = node.block
+            node.frequency = weight + 1
+            node = node.parent
+
+
+class AdaptiveEncoder:
+    def __init__(self, binary=False):
+        """
+        Construct a new 'AdaptiveEncoder' object.
+
+        :param binary: encode bytes instead of text (bool)
+        :return: returns nothing
+        """
+        self.tree = AdaptiveTree(binary)
+        self.writer = BitWriter()
+
+    def write_literal(self, value):
+        nyt_value, nyt_length = self.tree.code(self.tree.nyt)
+        self.writer.write(nyt_value, nyt_length)
+        self.writer.write(value, self.tree.literal_bits)
+
+    def encode(self, string):
+        """
+        encode: encodes part of stream and updates tree after every symbol
+
+        :param string: next part of text or binary data (string or bytes)
+        :return: returns all complete encoded bytes, bits of last incomplete byte are kept for next part (bytes)
+        """
+        tree = self.tree
+        leaves = tree.leaves
+        write = self.writer.write
+        for c in string:
+            node = leaves.get(c)
+            if node is None:
+                self.write_literal(c if tree.binary else ord(c))
+            else:
+                write(*tree.code(node))
+            tree.update(c)
+        return self.writer.take()
+
+    def finish(self):
+        """
+        finish: writes end of stream and pads last byte with zeros
+
+        :return: returns remaining encoded bytes (bytes)
+        """
+        self.write_literal(self.tree.end)
+        return self.writer.getvalue()
+
+
+class AdaptiveDecoder:
+    def __init__(self, binary=False):
+        """
+        Construct a new 'AdaptiveDecoder' object.
+        Decoder keeps its position in tree between parts, so stream can be split at any byte
+
+        :param binary: decode bytes instead of text (bool)
+        :return: returns nothing
+        """
+        self.tree = AdaptiveTree(binary)
+        self.node = self.tree.root
+        #number of literal bits still to be read, first symbol is always literal
+        self.literal_left = self.tree.literal_bits
+        self.literal = 0
+        self.finished = False
+
+    def decode(self, data):
+        """
+        decode: decodes part of stream, bits are walked one at a time through tree
+
+        :param data: next part of encoded stream (bytes)
+        :return: returns decoded symbols of this part (string or bytes)
+        """
+        tree = self.tree
+        decoded = []
+        for byte in data:
+            if self.finished:
+                break
+            for shift in range(7, -1, -1):
+                bit = (byte >> shift) & 1
+                if self.literal_left:
+                    self.literal = (self.literal << 1) | bit
+                    self.literal_left -= 1
+                    if self.literal_left:
+                        continue
+                    if (self.literal == tree.end):
+                        self.finished = True
+                        break
+                    c = self.literal if tree.binary else chr(self.literal)
+                    self.literal = 0
+                else:
+                    self.node = self.node.right if bit else self.node.left
+                    if not self.node.is_leaf():
+                        continue
+                    if self.node is tree.nyt:
+                        self.literal_left = tree.literal_bits
+                        continue
+                    c = self.node.char
+                decoded.append(c)
+                tree.update(c)
+                self.node = tree.root
+                if self.node is tree.nyt:
+                    self.literal_left = tree.literal_bits
+        return bytes(decoded) if tree.binary else ''.join(decoded)
+
+
+def compress_adaptive(reader, writer, binary=False, read_size=READ_SIZE):
+    """
+    compress_adaptive: compresses stream in one pass, encoded bytes are written as soon as they are ready
+
+    :param reader: binary input stream, for example sys.stdin.buffer or open file
+    :param writer: binary output stream
+    :param binary: compress input as bytes, text is read as UTF-8 otherwise (bool)
+    :param read_size: maximal number of bytes read at once (int)
+    :return: returns number of read symbols (int)
+    """
+    encoder = AdaptiveEncoder(binary)
+    text = None if binary else codecs.getincrementaldecoder("utf-8")()
+    read = getattr(reader, "read1", reader.read)
+    symbols = 0
+    writer.write(ADAPTIVE_HEADER.pack(ADAPTIVE_MAGIC, ADAPTIVE_VERSION, ADAPTIVE_BYTES if binary else 0))
+    while True:
+        data = read(read_size)
+        part = data if binary else text.decode(data, not data)
+        with timer('encode', len(part)):
+            writer.write(encoder.encode(part))
+        writer.flush()
+        symbols += len(part)
+        if not data:
+            break
+    writer.write(encoder.finish())
+    writer.flush()
+    registry.add('input_symbols', symbols)
+    return symbols
+
+def decompress_adaptive(reader, writer, read_size=READ_SIZE):
+    """
+    decompress_adaptive: decompresses stream written by compress_adaptive, decoded part is written after every read
+
+    :param reader: binary input stream
+    :param writer: binary output stream, text is written as UTF-8
+    :param read_size: maximal number of bytes read at once (int)
+    :return: returns number of decoded symbols (int)
+    """
+    magic, version, flags = ADAPTIVE_HEADER.unpack(reader.read(ADAPTIVE_HEADER.size))
+    if (magic != ADAPTIVE_MAGIC or version != ADAPTIVE_VERSION):
+        raise IOError("Stream is not adaptive Huffman stream!")
+    decoder = AdaptiveDecoder(bool(flags & ADAPTIVE_BYTES))
+    read = getattr(reader, "read1", reader.read)
+    symbols = 0
+    while not decoder.finished:
+        data = read(read_size)
+        if not data:
+            raise EOFError("Stream ended before end of stream symbol!")
+        with timer('decode'):
+            part = decoder.decode(data)
+        writer.write(part if decoder.tree.binary else part.encode("utf-8", "surrogatepass"))
+        writer.flush()
+        symbols += len(part)
+    return symbols
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Single pass adaptive Huffman compression of streams")
+    parser.add_argument("input", nargs="?", default="-", help="input file, standard input if not given or -")
+    parser.add_argument("output", nargs="?", default="-", help="output file, standard output if not given or -")
+    parser.add_argument("-d", "--decompress", action="store_true", help="decompress adaptive Huffman stream")
+    parser.add_argument("--bytes", action="store_true", help="compress input as bytes instead of UTF-8 text")
+    parser.add_argument("--metrics", default=None, help="write measurements of all stages as JSON to given file")
+    return parser.parse_args()
+
+def start():
+    args = parse_arguments()
+    reader = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    writer = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        if (args.decompress):
+            decompress_adaptive(reader, writer)
+        else:
+            compress_adaptive(reader, writer, args.bytes)
+    finally:
+        if reader is not sys.stdin.buffer:
+            reader.close()
+        if writer is not sys.stdout.buffer:
+            writer.close()
+    if (args.metrics):
+        registry.to_json(args.metrics)
+
+if __name__ == '__main__':
+    start()
@@ -0,0 +1,132 @@
+import sys
+import time
+import argparse
+from collections import Counter
+from tables import encode_with_table, encoded_length, code_lengths, symbol_frequency
+from container import ContainerWriter, pack_local_table, block_checksum, FLAG_LOCAL, FLAG_TOKENS, KIND_SHARED, \
+    KIND_ESCAPE, KIND_LOCAL
+from pipeline import block_codes
+from model import escape_model, MODEL_DIRECTORY
+from metrics import registry, timer
+from util import open_document
+
+"""
+Appending of new data to existing container, for example of new lines of growing log file.
+New data is added as new blocks at the end of container, earlier blocks are not read or encoded again.
+Every new block is encoded with cheapest of:
+    shared - code table of container, possible only when every symbol of block is in it
+    escape - code table of container with escape, symbol that is not in table is written as escape and literal
+    local - new code table built from block, stored before block
+Cost of each is number of encoded bits, cost of local table includes bits of stored table.
+Container with local tables gets new local tables, container compressed with pre-trained model is
+appended with model, which has its own escape.
+Container of word or n-gram tokens gets new blocks with local tables of characters, because tokens of new data
+are not known and escape of model can only write single characters
+"""
+
+def block_costs(frequency, codes, model):
+    """
+    block_costs: calculates size of block in bits for code table of container, with and without escape
+
+    :param frequency: frequency of every symbol of block (dictionary)
+    :param codes: code table of container (dictionary)
+    :param model: model with escape for code table of container, None when code table is empty (Model)
+    :return: returns cost with code table (None when some symbol is not in it)
+             and cost with escape (None without model) (tuple)
+    """
+    if model is None:
+        return None, None
+    shared = None
+    if all(c in codes for c in frequency):
+        shared = encoded_length(frequency, code_lengths(codes))
+    escape_length = model.escape_code[1] + model.literal_bits
+    escaped = sum(count * (model.codes[c][1] if c in model.codes else escape_length)
+                  for c, count in frequency.items())
+    return shared, escaped
+
+def encode_append_block(block, codes, model):
+    """
+    encode_append_block: chooses cheapest code table for block and encodes block with it
+
+    :param block: text or binary data of block (string or bytes)
+    :param codes: code table of container (dictionary)
+    :param model: model with escape for code table of container, None when code table is empty (Model)
+    :return: returns encoded block (BitWriter), local table (empty if not used) and kind of block (tuple)
+    """
+    frequency = symbol_frequency(block)
+    local_codes = block_codes(block)
+    local_table = pack_local_table(local_codes)
+    local = encoded_length(frequency, code_lengths(local_codes)) + 8 * len(local_table)
+    shared, escaped = block_costs(frequency, codes, model)
+    if (shared is not None and shared <= min(local, escaped)):
+        return encode_with_table(block, codes), b'', KIND_SHARED
+    if (escaped is not None and escaped <= local):
+        encoded, escaped_symbols = model.encode(block)
+        return encoded, b'', KIND_ESCAPE
+    return encode_with_table(block, local_codes), local_table, KIND_LOCAL
+
+def append(file_name, string, block_size=None, model_directory=MODEL_DIRECTORY):
+    """
+    append: adds text or binary data to existing container as new blocks
+
+    :param file_name: name of container file (string)
+    :param string: new data, must be bytes for container compressed in bytes mode (string or bytes)
+    :param block_size: number of symbols in one new block, block size of container if not given (int)
+    :param model_directory: directory of pre-trained models, used when document was compressed with model (string)
+    :return: returns number of new blocks of every kind (dictionary)
+    """
+    kinds = Counter()
+    with ContainerWriter.append_to(file_name, model_directory) as writer:
+        if (writer.binary != isinstance(string, bytes)):
+            raise ValueError("Type of data is not correct!")
+        block_size = block_size or writer.block_size
+        tokens = bool(writer.flags & FLAG_TOKENS)
+        model = escape_model(writer.codes) if writer.codes and writer.model is None and not tokens else None
+        registry.add('input_symbols', len(string))
+        for i in range(0, len(string), block_size):
+            block = string[i:i + block_size]
+            with timer('encode', len(block)):
+                if (writer.flags & FLAG_LOCAL or tokens):
+                    codes = block_codes(block)
+                    encoded, table, kind = encode_with_table(block, codes), pack_local_table(codes), KIND_LOCAL
+                    #every block of local container has its table, token container marks new blocks as segments
+                    writer.add_block(encoded, len(block), block_checksum(block), table=table,
+                                     kind=KIND_SHARED if writer.flags & FLAG_LOCAL else KIND_LOCAL)
+                elif writer.model is not None:
+                    encoded, escaped = writer.model.encode(block)
+                    kind = KIND_ESCAPE if escaped else KIND_SHARED
+                    writer.add_block(encoded, len(block), block_checksum(block), escaped)
+                else:
+                    encoded, table, kind = encode_append_block(block, writer.codes, model)
+                    writer.add_block(encoded, len(block), block_checksum(block), table=table, kind=kind)
+            kinds[kind] += 1
+    return dict(kinds)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Appending of new data to Huffman container")
+    parser.add_argument("file_name", help="path to compressed .bin file")
+    parser.add_argument("input", help="document with new data, appended to end of compressed document")
+    parser.add_argument("--block-size", type=int, default=None, help="number of symbols in one new block")
+    parser.add_argument("--model-dir", default=MODEL_DIRECTORY, help="directory of pre-trained models")
+    return parser.parse_args()
+
+def start():
+    if len(sys.argv) < 3:
+        print("[ERROR] Path to bin file and to document with new data are required.")
+        sys.exit()
+    args = parse_arguments()
+    binary = not args.input.endswith(".txt")
+    with open_document(args.input, binary=binary) as reader:
+        string = reader.read()
+    print("Appending to file: ", args.file_name)
+    start_time = time.time()
+    kinds = append(args.file_name, string, args.block_size, args.model_dir)
+    print("Blocks with code table of container: ", kinds.get(KIND_SHARED, 0))
+    print("Blocks with escape: ", kinds.get(KIND_ESCAPE, 0))
+    print("Blocks with local table: ", kinds.get(KIND_LOCAL, 0))
+    duration = time.time() - start_time
+    print(f"Duration {duration} seconds")
+    registry.report()
+
+if __name__ == '__main__':
+    start()
@@ -0,0 +1,309 @@
+import os
+import sys
+import mmap
+import time
+import zlib
+import struct
+import argparse
+from tables import build_codes_from_frequency
+from bits import BitWriter
+from container import ContainerWriter, ContainerReader, block_checksum, write_varint, read_varint, BLOCK_SIZE, \
+    DECODE_CHUNK
+from pipeline import encode_pipeline_block, compress_document
+from estimate import read_document, count_symbols, batch_files
+from executor import get_executor
+from model import MODEL_DIRECTORY
+from metrics import registry, timer
+
+"""
+Archive of many files in one file, every file (member) is compressed to its own container.
+Layout of archive:
+    header - magic, version, number of members and offset of central directory
+    members - containers of members one after another, offsets in container are relative to its start,
+              so every member can be read as standalone container
+    central directory - for every member its name (UTF-8 length as varint and UTF-8 bytes), offset and size
+                        of its container, original size and CRC32 of original file
+Members are compressed in parallel: small files are batched and every batch is compressed by one executor worker,
+large files are compressed one by one and their blocks are encoded by all workers.
+Single member is extracted by seeking to its container through central directory, other members are not read,
+container is read directly from mapped archive and decoded part by part, so member is never whole in memory
+"""
+
+#distinct from magic of container (HUFB), model (HUFM) and adaptive stream (HUFA)
+ARCHIVE_MAGIC = b'HUFR'
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER = struct.Struct('>4sBxxxIQ')
+MEMBER = struct.Struct('>QQQI')
+
+def list_members(file_names):
+    """
+    list_members: replaces directories with files in them, recursively, and gives every file its name in archive
+    File keeps only its base name, files of directory keep path from directory, including directory name.
+    Two different files with same name can't be members of one archive, so error is raised for them
+
+    :param file_names: names of files or directories (list)
+    :return: returns path and member name of every file, sorted by member name (list)
+    """
+    members = {}
+    def add(name, path):
+        if (name in members and os.path.realpath(members[name]) != os.path.realpath(path)):
+            raise ValueError("Member name is not unique: " + name)
+        members[name] = path
+
+    for file_name in file_names:
+        if os.path.isdir(file_name):
+            parent = os.path.dirname(os.path.normpath(file_name))
+            for directory, subdirectories, names in os.walk(file_name):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    add(os.path.relpath(path, parent).replace(os.sep, "/"), path)
+        else:
+            add(os.path.basename(file_name), file_name)
+    return [(members[name], name) for name in sorted(members)]
+
+def compress_batch(file_names, block_size=BLOCK_SIZE):
+    """
+    compress_batch: compresses batch of small files in worker, every file to container in memory
+
+    :param file_names: names of files (list)
+    :param block_size: number of symbols in one block (int)
+    :return: returns name, container, original size and checksum of every file (list)
+    """
+    results = []
+    for file_name in file_names:
+        document = read_document(file_name)
+        with timer('archive.small', len(document)):
+            container = compress_document(document, block_size)
+        results.append((file_name, container, os.path.getsize(file_name), block_checksum(document)))
+    return results
+
+def compress_member(file_name, archive, count=count_symbols, block_size=BLOCK_SIZE):
+    """
+    compress_member: compresses large file to container written at current position of archive
+    Frequencies are counted with count function and blocks are encoded by executor workers
+
+    :param file_name: name of file (string)
+    :param archive: archive opened for writing (file)
+    :param count: function that returns frequency of every symbol of document (function)
+    :param block_size: number of symbols in one block (int)
+    :return: returns offset and size of container, original size and checksum of file (tuple)
+    """
+    document = read_document(file_name)
+    with timer('count', len(document)):
+        frequency = count(document)
+    with timer('build'):
+        codes = build_codes_from_frequency(frequency)
+    blocks = [document[i:i + block_size] for i in range(0, len(document), block_size)]
+    executor = get_executor()
+    backend, parts = executor.choose(len(document))
+    with timer('encode', len(document)):
+        with executor.share(codes) as shared:
+            results = executor.map('archive.encode', encode_pipeline_block, [(block, shared) for block in blocks],
+                                   backend, len(document))
+    offset = archive.tell()
+    with ContainerWriter(archive, codes, block_size, binary=isinstance(document, bytes)) as writer:
+        for block, (table, data, bits, checksum) in zip(blocks, results):
+            writer.add_block(BitWriter.from_bytes(data, bits), len(block), checksum)
+    return offset, archive.tell() - offset, os.path.getsize(file_name), block_checksum(document)
+
+def create_archive(file_names, output_file_name, count=count_symbols, block_size=BLOCK_SIZE):
+    """
+    create_archive: compresses files and directories to one archive
+    Small files are batched and compressed by executor workers, large files are compressed with count function
+    (parallel get_frequency) and their blocks are encoded by executor workers
+
+    :param file_names: names of files or directories (list)
+    :param output_file_name: name of archive file (string)
+    :param count: function that returns frequency of every symbol of large document (function)
+    :param block_size: number of symbols in one block (int)
+    :return: returns number of members (int)
+    """
+    members = list_members(file_names)
+    sizes = {path: os.path.getsize(path) for path, name in members}
+    backend, batches = batch_files([path for path, name in members], sizes)
+    executor = get_executor()
+    entries = {}
+    with open(output_file_name, "wb") as archive:
+        archive.write(bytes(ARCHIVE_HEADER.size))
+        with timer('archive', sum(sizes.values())):
+            for batch in executor.map('archive', compress_batch, [(batch, block_size) for batch in batches], backend):
+                for path, container, size, checksum in batch:
+                    entries[path] = (archive.tell(), len(container), size, checksum)
+                    archive.write(container)
+            for path, name in members:
+                if path not in entries:
+                    entries[path] = compress_member(path, archive, count, block_size)
+        directory_offset = archive.tell()
+        #containers of members record their own output bytes, archive adds only header and central directory
+        for path, name in members:
+            encoded = name.encode("utf-8", "surrogatepass")
+            archive.write(write_varint(len(encoded)) + encoded)
+            archive.write(MEMBER.pack(*entries[path]))
+        directory_size = archive.tell() - directory_offset
+        archive.seek(0)
+        archive.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, len(members), directory_offset))
+    registry.add('archived_files', len(members))
+    registry.add('archive.directory_bytes', ARCHIVE_HEADER.size + directory_size)
+    return len(members)
+
+
+class ArchiveReader:
+    def __init__(self, file_name, model_directory=MODEL_DIRECTORY):
+        """
+        Construct a new 'ArchiveReader' object, maps archive to memory and reads its central directory.
+        Containers of members are read only when members are extracted
+
+        :param file_name: name of archive file (string)
+        :param model_directory: directory of pre-trained models (string)
+        :return: returns nothing
+        """
+        self.model_directory = model_directory
+        with open(file_name, "rb") as reader:
+            if (os.fstat(reader.fileno()).st_size < ARCHIVE_HEADER.size):
+                raise IOError("File is not Huffman archive!")
+            self.data = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, directory_offset = ARCHIVE_HEADER.unpack_from(self.data, 0)
+        if (magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION):
+            self.close()
+            raise IOError("File is not Huffman archive!")
+        self.members = {}
+        position = directory_offset
+        for _ in range(count):
+            size, position = read_varint(self.data, position)
+            name = self.data[position:position + size].decode("utf-8", "surrogatepass")
+            self.members[name] = MEMBER.unpack_from(self.data, position + size)
+            position += size + MEMBER.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        close: unmaps archive file
+
+        :return: returns nothing
+        """
+        if not self.data.closed:
+            self.data.close()
+
+    def names(self):
+        """
+        names: returns names of members in order of central directory
+
+        :return: returns names of members (list)
+        """
+        return list(self.members)
+
+    def container(self, name):
+        """
+        container: opens container of one member, container is view of mapped archive and is not copied
+
+        :param name: name of member (string)
+        :return: returns reader of container (ContainerReader)
+        """
+        if name not in self.members:
+            raise ValueError("Member is not in archive!")
+        offset, size, original_size, checksum = self.members[name]
+        return ContainerReader(memoryview(self.data)[offset:offset + size], self.model_directory)
+
+    def iter_read(self, name, chunk_size=DECODE_CHUNK, parallel=False):
+        """
+        iter_read: decompresses one member part by part, checksum of original file is calculated
+        from parts and checked after last part
+
+        :param name: name of member (string)
+        :param chunk_size: number of characters (bytes for binary files) in one part (int)
+        :param parallel: decode blocks of member in parallel (bool)
+        :return: yields parts of original text, bytes for binary files (string or bytes)
+        """
+        checksum = 0
+        with self.container(name) as reader:
+            for part in reader.decode_chunks(chunk_size, parallel):
+                checksum = zlib.crc32(part if reader.binary else part.encode("utf-8", "surrogatepass"), checksum)
+                yield part
+        if (checksum != self.members[name][3]):
+            raise IOError("Member is corrupted!")
+
+    def read(self, name, parallel=False):
+        """
+        read: decompresses one member and checks it with checksum of original file
+
+        :param name: name of member (string)
+        :param parallel: decode blocks of member in parallel (bool)
+        :return: returns original text, bytes for binary files (string or bytes)
+        """
+        with self.container(name) as reader:
+            empty = reader.empty
+        return empty.join(self.iter_read(name, parallel=parallel))
+
+    def extract(self, name, output_directory=".", parallel=False):
+        """
+        extract: decompresses one member to file with its name in output directory
+
+        :param name: name of member (string)
+        :param output_directory: directory to which member is written (string)
+        :param parallel: decode blocks of member in parallel (bool)
+        :return: returns name of written file (string)
+        """
+        path = os.path.normpath(name)
+        if (os.path.isabs(path) or path.split(os.sep)[0] == ".."):
+            raise ValueError("Member name is not correct!")
+        output_file_name = os.path.join(output_directory, path)
+        os.makedirs(os.path.dirname(output_file_name) or ".", exist_ok=True)
+        try:
+            with open(output_file_name, "wb") as writer:
+                for part in self.iter_read(name, parallel=parallel):
+                    writer.write(part if isinstance(part, bytes) else part.encode("utf-8", "surrogatepass"))
+        except IOError:
+            #corrupted member is not left in output directory
+            os.remove(output_file_name)
+            raise
+        return output_file_name
+
+    def verify(self, sample=None, parallel=False):
+        """
+        verify: checks block checksums of every member without writing decoded data
+
+        :param sample: part of blocks of every member that is checked, all blocks if not given (float)
+        :param parallel: check blocks in parallel (bool)
+        :return: returns names of members with corrupted blocks (list)
+        """
+        corrupted = []
+        for name in self.members:
+            with self.container(name) as reader:
+                if reader.verify(sample, parallel):
+                    corrupted.append(name)
+        return corrupted
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Extraction of files from Huffman archive")
+    parser.add_argument("file_name", help="path to archive .bin file")
+    parser.add_argument("members", nargs="*", help="names of extracted members, all members if not given")
+    parser.add_argument("--list", action="store_true", help="only print members with their sizes")
+    parser.add_argument("--output-dir", default=".", help="directory to which members are extracted")
+    parser.add_argument("--parallel", action="store_true", help="decode blocks of members in parallel")
+    parser.add_argument("--model-dir", default=MODEL_DIRECTORY, help="directory of pre-trained models")
+    return parser.parse_args()
+
+def start():
+    if len(sys.argv) == 1:
+        print("[ERROR] Path to archive is required.")
+        sys.exit()
+    args = parse_arguments()
+    with ArchiveReader(args.file_name, args.model_dir) as archive:
+        if (args.list):
+            for name, (offset, size, original_size, checksum) in archive.members.items():
+                print(f"{name}: {original_size} -> {size} bytes")
+            return
+        start_time = time.time()
+        for name in args.members or archive.names():
+            print("Written file: ", archive.extract(name, args.output_dir, args.parallel))
+        duration = time.time() - start_time
+        print(f"Duration {duration} seconds")
+    registry.report()
+
+if __name__ == '__main__':
+    start()
@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import lzma
+import zlib
+import random
+import argparse
+import tempfile
+import resource
+import subprocess
+import statistics
+import time
+from collections import Counter
+
+"""
+Benchmark of sequential and parallel Huffman pipelines.
+Synthetic corpora of given size and symbol distribution are generated with fixed seed,
+each variant is run in its own process (both variants have modules named main and huffman)
+with warm-up and repetitions, results are written as JSON:
+median time of every stage, throughput in MB/s of UTF-8 input, peak RSS,
+compression ratio and ratio of zlib and lzma on same corpus as reference.
+With --adaptive single pass adaptive Huffman is compared with static two pass coding on same corpora
+"""
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+from util import open_document
+VARIANTS = ["sequential", "parallel"]
+CORPORA = ["uniform", "zipf", "tiny", "unicode"]
+SIZES = [100000, 1000000]
+
+def generate_corpus(kind, size, seed=0):
+    """
+    generate_corpus: generates synthetic text with controlled symbol distribution
+
+    :param kind: 'uniform' printable ASCII with equal probability, 'zipf' 200 symbols with Zipfian probability,
+    'tiny' alphabet of 4 symbols, 'unicode' code points from whole Unicode range (string)
+    :param size: number of characters (int)
+    :param seed: seed of random generator (int)
+    :return: returns generated text (string)
+    """
+    generator = random.Random(seed)
+    if (kind == "uniform"):
+        alphabet = [chr(c) for c in range(32, 127)]
+        return ''.join(generator.choices(alphabet, k=size))
+    if (kind == "zipf"):
+        alphabet = [chr(c) for c in range(32, 232)]
+        weights = [1 / rank for rank in range(1, len(alphabet) + 1)]
+        return ''.join(generator.choices(alphabet, weights, k=size))
+    if (kind == "tiny"):
+        return ''.join(generator.choices("ACGT", [8, 4, 2, 1], k=size))
+    if (kind == "unicode"):
+        alphabet = [chr(generator.choice([generator.randint(32, 0xd7ff), generator.randint(0xe000, 0x10ffff)]))
+                    for _ in range(5000)]
+        return ''.join(generator.choices(alphabet, k=size))
+    raise ValueError("Corpus is not correct!")
+
+def peak_rss():
+    """
+    peak_rss: returns peak resident memory of this process and its finished children in bytes
+
+    :return: returns peak resident memory (int)
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    #ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return max(own, children) * scale
+
+def run_variant(variant, corpus_file, repeat, warmup):
+    """
+    run_variant: runs encode_huffman and get_original of one variant, must run in its own process
+
+    :param variant: 'sequential' or 'parallel' (string)
+    :param corpus_file: name of file with corpus (string)
+    :param repeat: number of measured repetitions (int)
+    :param warmup: number of repetitions that are not measured (int)
+    :return: returns measurements (dictionary)
+    """
+    sys.path.insert(0, os.path.join(ROOT, variant))
+    import main
+    import huffman
+    from metrics import registry
+
+    with open_document(corpus_file) as reader:
+        text = reader.read()
+    size = len(text.encode("utf-8", "surrogatepass"))
+
+    stages = {}
+    totals = []
+    for i in range(warmup + repeat):
+        registry.reset()
+        begin = time.perf_counter()
+        encoded, tree, r, encoded_tree = main.encode_huffman(text)
+        with registry.timer("decode", len(text)):
+            original = huffman.get_original(tree, encoded)
+        total = time.perf_counter() - begin
+        if (original != text):
+            raise RuntimeError("Decoded text does not match corpus!")
+        if (i < warmup):
+            continue
+        totals.append(total)
+        for stage in ("count", "build", "serialize", "encode", "decode"):
+            if stage in registry.timers:
+                stages.setdefault(stage, []).append(registry.timers[stage]["seconds"])
+
+    compressed = (len(encoded) + len(encoded_tree) + 7) // 8
+    seconds = statistics.median(totals)
+    return {
+        "variant": variant,
+        "input_bytes": size,
+        "seconds": seconds,
+        "throughput": size / seconds / 1e6,
+        "stages": {stage: statistics.median(values) for stage, values in stages.items()},
+        "peak_rss": peak_rss(),
+        "ratio": compressed / size,
+    }
+
+def baselines(text):
+    """
+    baselines: compression ratio and time of zlib and lzma on same text
+
+    :param text: corpus (string)
+    :return: returns ratio and seconds of every baseline (dictionary)
+    """
+    data = text.encode("utf-8", "surrogatepass")
+    results = {}
+    for name, compress in (("zlib", zlib.compress), ("lzma", lzma.compress)):
+        begin = time.perf_counter()
+        compressed = compress(data)
+        seconds = time.perf_counter() - begin
+        results[name] = {"ratio": len(compressed) / len(data), "seconds": seconds,
+                         "throughput": len(data) / seconds / 1e6}
+    return results
+
+def run_adaptive(text, repeat, warmup):
+    """
+    run_adaptive: measures single pass adaptive Huffman and static two pass Huffman on same text
+    Static ratio counts encoded data and stored code table, adaptive ratio counts whole stream
+
+    :param text: corpus (string)
+    :param repeat: number of measured repetitions (int)
+    :param warmup: number of repetitions that are not measured (int)
+    :return: returns time, throughput in MB/s and ratio of both coders (dictionary)
+    """
+    from adaptive import AdaptiveEncoder, AdaptiveDecoder
+    from tables import DecodeTable, canonical_codes, encode_with_table
+    from container import pack_codes
+    from tree import HuffmanTree
+
+    def static():
+        codes = canonical_codes(HuffmanTree(Counter(text)).code_lengths())
+        encoded = encode_with_table(text, codes)
+        if (DecodeTable(codes).decode(encoded, len(text)) != text):
+            raise RuntimeError("Decoded text does not match corpus!")
+        return (len(encoded) + 7) // 8 + len(pack_codes(codes)[1])
+
+    def adaptive():
+        encoder = AdaptiveEncoder()
+        encoded = encoder.encode(text) + encoder.finish()
+        if (AdaptiveDecoder().decode(encoded) != text):
+            raise RuntimeError("Decoded text does not match corpus!")
+        return len(encoded)
+
+    size = len(text.encode("utf-8", "surrogatepass"))
+    results = {}
+    for name, coder in (("static", static), ("adaptive", adaptive)):
+        totals = []
+        for i in range(warmup + repeat):
+            begin = time.perf_counter()
+            compressed = coder()
+            if (i >= warmup):
+                totals.append(time.perf_counter() - begin)
+        seconds = statistics.median(totals)
+        results[name] = {"seconds": seconds, "throughput": size / seconds / 1e6, "ratio": compressed / size}
+    return results
+
+def crossover(results):
+    """
+    crossover: finds smallest input size where parallel variant is faster than sequential, for every corpus
+
+    :param results: list of measurements (list)
+    :return: returns smallest faster size or None for every corpus (dictionary)
+    """
+    sizes = {}
+    for result in results:
+        times = sizes.setdefault(result["corpus"], {}).setdefault(result["size"], {})
+        times[result["variant"]] = result["seconds"]
+    points = {}
+    for corpus, by_size in sizes.items():
+        faster = [size for size, times in sorted(by_size.items())
+                  if len(times) == 2 and times["parallel"] < times["sequential"]]
+        points[corpus] = faster[0] if faster else None
+    return points
+
+def benchmark(corpora=CORPORA, sizes=SIZES, variants=VARIANTS, repeat=3, warmup=1, seed=0, adaptive=False):
+    """
+    benchmark: runs every variant on every corpus and size, each run in separate process
+
+    :param corpora: kinds of corpora (list)
+    :param sizes: numbers of characters of corpora (list)
+    :param variants: variants to be measured (list)
+    :param repeat: number of measured repetitions (int)
+    :param warmup: number of repetitions that are not measured (int)
+    :param seed: seed of corpus generator (int)
+    :param adaptive: also compare adaptive and static coding, in this process (bool)
+    :return: returns all measurements (dictionary)
+    """
+    results = []
+    references = []
+    adaptive_results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in corpora:
+            for size in sizes:
+                text = generate_corpus(kind, size, seed)
+                corpus_file = os.path.join(directory, "{}_{}.txt".format(kind, size))
+                with open_document(corpus_file, "w") as writer:
+                    writer.write(text)
+                references.append({"corpus": kind, "size": size, **baselines(text)})
+                if (adaptive):
+                    adaptive_results.append({"corpus": kind, "size": size, **run_adaptive(text, repeat, warmup)})
+                for variant in variants:
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--worker", variant, corpus_file,
+                         "--repeat", str(repeat), "--warmup", str(warmup)],
+                        check=True, capture_output=True, text=True, cwd=os.path.join(ROOT, variant)).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                    results.append({"corpus": kind, "size": size, **result})
+                    print(kind, size, variant, "{:.3f} s".format(result["seconds"]),
+                          "{:.2f} MB/s".format(result["throughput"]), file=sys.stderr)
+    return {
+        "python": sys.version,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+        "baselines": references,
+        "parallel_faster_from": crossover(results),
+        "adaptive": adaptive_results,
+    }
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark of sequential and parallel Huffman pipelines")
+    parser.add_argument("--corpora", nargs="+", default=CORPORA, choices=CORPORA)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="numbers of characters of corpora")
+    parser.add_argument("--variants", nargs="+", default=VARIANTS, choices=VARIANTS)
+    parser.add_argument("--repeat", type=int, default=3, help="number of measured repetitions")
+    parser.add_argument("--warmup", type=int, default=1, help="number of repetitions that are not measured")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="file to which JSON results are written")
+    parser.add_argument("--adaptive", action="store_true", help="compare adaptive and static Huffman coding")
+    parser.add_argument("--worker", nargs=2, metavar=("VARIANT", "CORPUS"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def start():
+    args = parse_arguments()
+    if args.worker:
+        variant, corpus_file = args.worker
+        print(json.dumps(run_variant(variant, corpus_file, args.repeat, args.warmup)))
+        return
+    results = json.dumps(benchmark(args.corpora, args.sizes, args.variants, args.repeat, args.warmup, args.seed,
+                                   args.adaptive), indent=2)
+    if args.output:
+        with open(args.output, "w") as writer:
+            writer.write(results)
+    else:
+        print(results)
+
+if __name__ == '__main__':
+    start()
@@ -0,0 +1,194 @@
+"""
+Packed bit buffers used for encoded data and encoded Huffman tree.
+Bits are stored 8 per byte, first bit is the highest bit of first byte,
+last byte is padded with zeros
+"""
+
+class BitWriter:
+    def __init__(self):
+        """
+        Construct a new empty 'BitWriter' object.
+
+        :return: returns nothing
+        """
+        self.data = bytearray()
+        self.pending = 0
+        self.pending_length = 0
+
+    @classmethod
+    def from_bytes(cls, data, length):
+        """
+        from_bytes: creates writer holding already packed bits
+
+        :param data: packed bits (bytes)
+        :param length: number of bits in data (int)
+        :return: returns writer containing given bits (BitWriter)
+        """
+        writer = cls()
+        full = length >> 3
+        writer.data += data[:full]
+        writer.pending_length = length & 7
+        if (writer.pending_length):
+            writer.pending = data[full] >> (8 - writer.pending_length)
+        return writer
+
+    def __len__(self):
+        """
+        __len__ overrides len()
+        :return: number of bits written
+        """
+        return len(self.data) * 8 + self.pending_length
+
+    def write(self, value, length):
+        """
+        write: appends lowest `length` bits of value, highest bit first
+
+        :param value: bits to be written (int)
+        :param length: number of bits to be written (int)
+        :return: returns nothing
+        """
+        self.pending = (self.pending << length) | value
+        self.pending_length += length
+        if (self.pending_length >= 8):
+            rest = self.pending_length & 7
+            self.data += (self.pending >> rest).to_bytes(self.pending_length >> 3, 'big')
+            self.pending &= (1 << rest) - 1
+            self.pending_length = rest
+
+    def extend(self, other):
+        """
+        extend: appends all bits from other writer
+
+        :param other: writer whose bits are appended (BitWriter)
+        :return: returns nothing
+        """
+        self.write_bytes(other.data, len(other.data) * 8)
+        self.write(other.pending, other.pending_length)
+
+    def write_bytes(self, data, length):
+        """
+        write_bytes: appends packed bits
+        When writer is at byte boundary bytes are copied, otherwise all bits are shifted at once
+
+        :param data: packed bits, last byte is padded with zeros (bytes)
+        :param length: number of bits in data (int)
+        :return: returns nothing
+        """
+        full = length >> 3
+        if (self.pending_length == 0):
+            self.data += data[:full]
+        elif (full):
+            self.write(int.from_bytes(data[:full], 'big'), full * 8)
+        rest = length & 7
+        if (rest):
+            self.write(data[full] >> (8 - rest), rest)
+
+    def getvalue(self):
+        """
+        getvalue: returns written bits packed to bytes, last byte is padded with zeros
+
+        :return: returns packed bits (bytes)
+        """
+        if (self.pending_length == 0):
+            return bytes(self.data)
+        return bytes(self.data) + bytes([self.pending << (8 - self.pending_length)])
+
+    def flush(self, file):
+        """
+        flush: writes all complete bytes to file and removes them from writer
+        Bits of last incomplete byte stay in writer, after flush len() counts only bits that are not written
+
+        :param file: binary file opened for writing
+        :return: returns nothing
+        """
+        file.write(self.take())
+
+    def take(self):
+        """
+        take: removes all complete bytes from writer and returns them, bits of last incomplete byte stay in writer
+
+        :return: returns complete bytes (bytes)
+        """
+        data = bytes(self.data)
+        self.data = bytearray()
+        return data
+
+    def reader(self):
+        """
+        reader: creates reader over written bits
+
+        :return: returns reader positioned at first written bit (BitReader)
+        """
+        return BitReader(self.getvalue(), len(self))
+
+
+class BitReader:
+    def __init__(self, data, length=None, position=0):
+        """
+        Construct a new 'BitReader' object.
+
+        :param data: packed bits (bytes)
+        :param length: number of bits in data, all bits of data if not given (int)
+        :param position: index of first bit to be read (int)
+        :return: returns nothing
+        """
+        self.data = data
+        self.length = len(data) * 8 if length is None else length
+        self.position = position
+
+    def __len__(self):
+        """
+        __len__ overrides len()
+        :return: number of bits in reader
+        """
+        return self.length
+
+    def remaining(self):
+        """
+        remaining: number of bits that are not read yet
+
+        :return: returns number of remaining bits (int)
+        """
+        return self.length - self.position
+
+    def read(self, length):
+        """
+        read: reads next `length` bits and moves cursor after them
+
+        :param length: number of bits to be read (int)
+        :return: returns read bits, first read bit is highest (int)
+        """
+        if (length > self.remaining()):
+            raise EOFError("Not enough bits left!")
+        if (length == 0):
+            return 0
+        first = self.position >> 3
+        last = (self.position + length + 7) >> 3
+        value = int.from_bytes(self.data[first:last], 'big')
+        value >>= last * 8 - self.position - length
+        self.position += length
+        return value & ((1 << length) - 1)
+
+    def read_bit(self):
+        """
+        read_bit: reads next bit and moves cursor after it
+
+        :return: returns read bit (int)
+        """
+        if (self.position >= self.length):
+            raise EOFError("Not enough bits left!")
+        bit = (self.data[self.position >> 3] >> (7 - (self.position & 7))) & 1
+        self.position += 1
+        return bit
+
+
+def as_reader(bits):
+    """
+    as_reader: returns reader over given bits
+
+    :param bits: written or packed bits (BitWriter or BitReader)
+    :return: returns reader over bits (BitReader)
+    """
+    if isinstance(bits, BitWriter):
+        return bits.reader()
+    return bits
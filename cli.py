@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import argparse
+from contextlib import contextmanager
+from util import open_document
+from stream import CHUNK_SIZE
+from pipeline import compress_pipeline
+from estimate import estimate, print_estimates
+from archive import create_archive, ArchiveReader
+from container import BLOCK_SIZE, VERIFY_SAMPLE
+from decompress import decompress, verify
+from model import load_model, MODEL_DIRECTORY
+from metrics import registry, set_tree_debug
+from tokens import ALPHABETS
+
+"""
+Command line of sequential and parallel compression.
+Both mains parse same arguments and run same modes (compress, stream, pipeline, estimate, archive, decompress),
+they differ only in functions that count and compress document and in parallel flag
+passed to stages that decode or verify blocks
+"""
+
+def argument_parser():
+    parser = argparse.ArgumentParser(description="Huffman compression of txt documents")
+    parser.add_argument("file_name", help="path to txt document, or to bin file with --decompress")
+    parser.add_argument("--decompress", action="store_true",
+                        help="decompress bin file written by compression to txt document")
+    parser.add_argument("--estimate", action="store_true",
+                        help="only predict compressed size, entropy and ratio of document or of every file in directory")
+    parser.add_argument("--archive", action="store_true",
+                        help="compress document, or every file in directory, to one archive that can be extracted by member")
+    parser.add_argument("--bytes", action="store_true",
+                        help="compress document as bytes, used for every document that is not txt (images, binary files)")
+    parser.add_argument("--stream", action="store_true",
+                        help="compress chunk by chunk without reading whole document to memory")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="read, encode and write blocks at the same time, without reading whole document to memory")
+    parser.add_argument("--local-tables", action="store_true",
+                        help="in pipeline mode every block gets code table built from its own frequencies")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="number of characters in one chunk in stream mode")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE,
+                        help="number of characters in one independently decodable block")
+    parser.add_argument("--tree-codes", action="store_true",
+                        help="use codes generated from tree instead of canonical codes, whole code table is stored")
+    parser.add_argument("--max-code-length", type=int, default=None,
+                        help="limit length of canonical codes, for example 12 or 15 bits")
+    parser.add_argument("--alphabet", choices=ALPHABETS, default="chars",
+                        help="code single characters, or words and n-grams of txt document with characters for rare ones")
+    parser.add_argument("--model", default=None,
+                        help="ID of pre-trained model, document is encoded with it instead of its own code table")
+    parser.add_argument("--model-dir", default=MODEL_DIRECTORY, help="directory of pre-trained models")
+    parser.add_argument("--verify", choices=["full", "sample", "skip"], default="full",
+                        help="check checksums of all blocks, of part of blocks chosen at random, or skip check")
+    parser.add_argument("--sample", type=float, default=VERIFY_SAMPLE,
+                        help="part of blocks checked with --verify sample")
+    parser.add_argument("--metrics", default=None,
+                        help="write measurements of all stages as JSON to given file")
+    parser.add_argument("--memory", action="store_true",
+                        help="measure peak memory with tracemalloc, slows down compression")
+    parser.add_argument("--debug-tree", action="store_true",
+                        help="draw Huffman tree while it is built")
+    return parser
+
+def check_code_length(parser, max_length, alphabet):
+    """
+    check_code_length: reports error of command line when codes of maximal length can't code every symbol,
+    n symbols need codes of at least ceil(log2(n)) bits
+
+    :param parser: parser of command line (ArgumentParser)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :param alphabet: number of different symbols of document (int)
+    :return: returns nothing
+    """
+    if (max_length is not None and (1 << max_length) < alphabet):
+        parser.error(f"argument --max-code-length: {max_length} bits can't code {alphabet} symbols, "
+                     f"at least {(alphabet - 1).bit_length()} bits are needed")
+
+@contextmanager
+def code_length_errors(parser, max_length):
+    """
+    code_length_errors: reports error of limited codes as error of command line, used in modes that count
+    symbols themselves (stream, pipeline, estimate, words and n-grams), limit is checked when codes are built,
+    before any block is encoded
+
+    :param parser: parser of command line (ArgumentParser)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :return: returns nothing
+    """
+    try:
+        yield
+    except ValueError as error:
+        if max_length is None:
+            raise
+        parser.error(f"argument --max-code-length: {error}")
+
+def report(args):
+    """
+    report: prints collected measurements and writes them to JSON file if it was requested
+
+    :param args: parsed command line arguments
+    :return: returns nothing
+    """
+    registry.stop_memory()
+    registry.report()
+    if (args.metrics):
+        registry.to_json(args.metrics)
+
+def check(file_name, args, parallel=False):
+    """
+    check: verifies written container as requested on command line, by checksums of decoded blocks
+
+    :param file_name: name of container file (string)
+    :param args: parsed command line arguments
+    :param parallel: decode blocks in parallel (bool)
+    :return: returns nothing
+    """
+    if (args.verify == "skip"):
+        return
+    corrupted = verify(file_name, args.sample if args.verify == "sample" else None, parallel, args.model_dir)
+    if not corrupted:
+        print("MATCHES")
+    else:
+        print("ERROR")
+
+def start(count, compress, compress_with_model, compress_file, parallel=False):
+    """
+    start: runs mode chosen on command line
+
+    :param count: function that returns frequency of every symbol of document (function)
+    :param compress: function that compresses document to container, see sequential main (function)
+    :param compress_with_model: function that compresses document with pre-trained model (function)
+    :param compress_file: function that compresses document in stream mode (function)
+    :param parallel: decode, verify and pipeline stages use executor workers (bool)
+    :return: returns nothing
+    """
+    if len(sys.argv) == 1:
+        print("[ERROR] Path to txt document is required.")
+        sys.exit()
+    parser = argument_parser()
+    args = parser.parse_args()
+    file_name = args.file_name
+    if (args.max_code_length is not None and args.max_code_length < 1):
+        parser.error("argument --max-code-length: code length must be at least 1 bit")
+
+    if (args.decompress):
+        print("Decompressing file: ", file_name)
+        start_time = time.time()
+        print("Written file: ", decompress(file_name, parallel=parallel, model_directory=args.model_dir))
+        duration = time.time() - start_time
+        print(f"Duration {duration} seconds")
+        report(args)
+        return
+
+    if (args.estimate):
+        start_time = time.time()
+        with code_length_errors(parser, args.max_code_length):
+            print_estimates(estimate([file_name], args.block_size, args.max_code_length))
+        duration = time.time() - start_time
+        print(f"Duration {duration} seconds")
+        report(args)
+        return
+
+    if (args.archive):
+        start_time = time.time()
+        output_file_name = os.path.normpath(file_name).replace(".txt", "") + "_archive.bin"
+        print("Members: ", create_archive([file_name], output_file_name, count, args.block_size))
+        print("Written file: ", output_file_name)
+        if (args.verify != "skip"):
+            with ArchiveReader(output_file_name, args.model_dir) as archive:
+                corrupted = archive.verify(args.sample if args.verify == "sample" else None, parallel)
+            print("ERROR" if corrupted else "MATCHES")
+        duration = time.time() - start_time
+        print(f"Duration {duration} seconds")
+        report(args)
+        return
+
+    binary = args.bytes or not file_name.endswith(".txt")
+    print("Compressing file: ", file_name)
+    set_tree_debug(args.debug_tree)
+    if (args.memory):
+        registry.start_memory()
+    if ((args.stream or args.pipeline) and args.model):
+        print("[ERROR] Pre-trained model can't be used in stream mode.")
+        sys.exit()
+    if ((args.stream or args.pipeline or args.model) and args.alphabet != "chars"):
+        print("[ERROR] Words and n-grams can be coded only without stream mode and model.")
+        sys.exit()
+    if (args.pipeline):
+        start_time = time.time()
+        output_file_name = file_name.replace(".txt", "") + "_compressed.bin"
+        with code_length_errors(parser, args.max_code_length):
+            compress_pipeline(file_name, output_file_name, args.local_tables, args.block_size, args.max_code_length,
+                              binary, parallel=parallel)
+        print("Written file: ", output_file_name)
+        check(output_file_name, args, parallel)
+        duration = time.time() - start_time
+        print(f"Duration {duration} seconds")
+        report(args)
+        return
+    if (args.stream):
+        start_time = time.time()
+        with code_length_errors(parser, args.max_code_length):
+            output_file_name = compress_file(file_name, args.chunk_size, not args.tree_codes, args.max_code_length,
+                                             binary)
+        print("Written file: ", output_file_name)
+        check(output_file_name, args, parallel)
+        duration = time.time() - start_time
+        print(f"Duration {duration} seconds")
+        report(args)
+        return
+
+    output_file_name = file_name.replace(".txt", "") + "_compressed.bin"
+    with open_document(file_name, binary=binary) as reader:
+        document = reader.read()
+
+    tokens = args.alphabet != "chars" and not binary
+    if (args.max_code_length is not None and not args.model and not tokens):
+        check_code_length(parser, args.max_code_length, len(set(document)))
+
+    start_time = time.time()
+    if (args.model):
+        compress_with_model(document, output_file_name, load_model(args.model, args.model_dir), args.block_size)
+    else:
+        #alphabet of words and n-grams is known only after tokenization
+        with code_length_errors(parser, args.max_code_length if tokens else None):
+            compress(document, output_file_name, block_size=args.block_size, canonical=not args.tree_codes,
+                     max_length=args.max_code_length, alphabet=args.alphabet)
+
+    check(output_file_name, args, parallel)
+    duration = time.time() - start_time
+    print(f"Duration {duration} seconds")
+    report(args)
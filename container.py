@@ -0,0 +1,937 @@
+import os
+import mmap
+import zlib
+import random
+import struct
+from bisect import bisect_right
+from tables import DecodeTable, CanonicalTable, canonical_codes, code_lengths, is_byte_symbols, BYTE_SYMBOLS, \
+    TABLE_BITS_PER_SYMBOL
+from bits import BitWriter, BitReader
+from metrics import registry, timer
+from executor import get_executor
+from model import load_model, escape_model, MODEL_DIRECTORY, MODEL_ID_BYTES
+
+"""
+Block indexed container for compressed documents.
+Layout of file:
+    header - magic, version, padding of last block, flags, number of symbols in code table,
+             original length, block size, number of blocks and offset of block index
+    code table - canonical codes store only code lengths: for every symbol, sorted by code point,
+                 difference from previous code point (varint) and code length (byte),
+                 canonical codes of bytes are stored as fixed table of 256 code lengths plus one (0 for missing byte),
+                 other codes store for every symbol its code point, code length and code value,
+                 codes of token alphabets (symbols longer than one character) store every token as
+                 its UTF-8 length (varint) and UTF-8 bytes instead of code point,
+                 documents compressed with pre-trained model store only ID of model,
+                 documents with local tables have no code table here
+    blocks - each block is encoded independently and starts at byte boundary,
+             with local tables block starts with its own code table (flags, number of symbols, size, table)
+    block index - for every block its offset in file, number of bits and number of characters (bytes in bytes mode)
+    checksums - CRC32 of original data of every block (text is checked in UTF-8), since version 2
+    block kinds - only in containers with appended segments, one byte for every block:
+                  block encoded with code table of container, with code table and escape, or with its own local table
+Documents compressed with pre-trained model that fit in one block are written in compact form instead,
+because header, code table and index of full form would be larger than small document itself:
+    compact header - magic (2 bytes), flags (bytes mode and escapes) with padding of block in highest 3 bits
+    model ID, original length (varint) and CRC32 of original data, followed by encoded block
+Compact container has no index and no block size, before append it is rewritten to full form.
+Header is written last, so blocks can be added one by one without knowing the whole document.
+Blocks can also be appended to existing container: new blocks and new index, checksums and kinds are written
+after old index, and header that points to new index is written last, so until then old index stays valid and
+container interrupted during append still holds its old content. Blocks that are already in container are not read,
+old index stays in file as unused bytes.
+Checksums are computed while blocks are encoded, so container can be verified by decoding it block by block,
+without keeping decoded document in memory
+"""
+
+MAGIC = b'HUFB'
+VERSION = 2
+BLOCK_SIZE = 1 << 16
+HEADER = struct.Struct('>4sBBBxIQIIQ')
+CODE = struct.Struct('>IBQ')
+TOKEN_CODE = struct.Struct('>BQ')
+INDEX = struct.Struct('>QQQ')
+LOCAL_TABLE = struct.Struct('>BII')
+CHECKSUM = struct.Struct('>I')
+#magic of compact form, distinct from first two bytes of every other magic (HUFB, HUFM, HUFA, HUFR)
+COMPACT_MAGIC = b'Hm'
+COMPACT_HEADER = struct.Struct('>2sB')
+COMPACT_PADDING_SHIFT = 5
+FLAG_CANONICAL = 1
+FLAG_BYTES = 2
+FLAG_MODEL = 4
+#some block of model document contains escaped symbols
+FLAG_ESCAPES = 8
+#every block carries code table built from its own frequencies
+FLAG_LOCAL = 16
+#blocks were appended with different kinds of code tables, kind of every block is stored after checksums
+FLAG_SEGMENTS = 32
+#symbols of code table are tokens of word or n-gram alphabet, not single characters
+FLAG_TOKENS = 64
+#block encoded with code table of container
+KIND_SHARED = 0
+#block encoded with code table of container and escape for symbols that are not in it (see escape_model)
+KIND_ESCAPE = 1
+#block that starts with its own local table
+KIND_LOCAL = 2
+#number of characters in one part of streaming decode
+DECODE_CHUNK = 1 << 16
+#part of blocks checked when verification is sampled
+VERIFY_SAMPLE = 1 / 16
+
+
+def write_varint(value):
+    """
+    write_varint: encodes non negative integer in 7 bits per byte, highest bit marks that more bytes follow
+
+    :param value: integer to be encoded (int)
+    :return: return encoded integer (bytes)
+    """
+    data = bytearray()
+    while value >= 0x80:
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+def read_varint(data, position):
+    """
+    read_varint: decodes integer written with write_varint
+
+    :param data: encoded data (bytes)
+    :param position: index of first byte of integer (int)
+    :return: return decoded integer and index of byte after it (tuple)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, position
+
+def pack_codes(codes):
+    """
+    pack_codes: converts code table to bytes, canonical code is stored only with code lengths
+
+    :param codes: code table, codes[char] = (code value, code length), keys are integers in bytes mode (dictionary)
+    :return: return flags and packed code table (tuple)
+    """
+    lengths = code_lengths(codes)
+    data = bytearray()
+    flags = FLAG_BYTES if is_byte_symbols(codes) else 0
+    if (not flags and any(len(c) != 1 for c in codes)):
+        return pack_tokens(codes, lengths)
+    value_of = (lambda c: c) if flags & FLAG_BYTES else ord
+    if (canonical_codes(lengths) == codes):
+        if (flags & FLAG_BYTES):
+            return flags | FLAG_CANONICAL, bytes(lengths[b] + 1 if b in lengths else 0 for b in range(BYTE_SYMBOLS))
+        previous = 0
+        for c in sorted(codes):
+            data += write_varint(ord(c) - previous)
+            data.append(lengths[c])
+            previous = ord(c)
+        return flags | FLAG_CANONICAL, bytes(data)
+    for c in sorted(codes):
+        value, length = codes[c]
+        data += CODE.pack(value_of(c), length, value)
+    return flags, bytes(data)
+
+def unpack_codes(data, symbols, flags):
+    """
+    unpack_codes: converts bytes written with pack_codes back to code table
+
+    :param data: packed code table (bytes)
+    :param symbols: number of symbols in code table (int)
+    :param flags: container flags (int)
+    :return: return code table (dictionary)
+    """
+    codes = {}
+    symbol_of = (lambda value: value) if flags & FLAG_BYTES else chr
+    if (flags & FLAG_TOKENS):
+        return unpack_tokens(data, symbols, flags)
+    if (flags & FLAG_CANONICAL and flags & FLAG_BYTES):
+        return canonical_codes({b: data[b] - 1 for b in range(BYTE_SYMBOLS) if data[b]})
+    if (flags & FLAG_CANONICAL):
+        lengths = {}
+        code_point = 0
+        position = 0
+        for _ in range(symbols):
+            delta, position = read_varint(data, position)
+            code_point += delta
+            lengths[chr(code_point)] = data[position]
+            position += 1
+        return canonical_codes(lengths)
+    for i in range(symbols):
+        code_point, length, value = CODE.unpack_from(data, i * CODE.size)
+        codes[symbol_of(code_point)] = (value, length)
+    return codes
+
+def pack_tokens(codes, lengths):
+    """
+    pack_tokens: converts code table of token alphabet to bytes, every token is stored as UTF-8
+
+    :param codes: code table, codes[token] = (code value, code length) (dictionary)
+    :param lengths: code length of every token (dictionary)
+    :return: return flags and packed code table (tuple)
+    """
+    data = bytearray()
+    canonical = canonical_codes(lengths) == codes
+    for token in sorted(codes):
+        encoded = token.encode("utf-8", "surrogatepass")
+        data += write_varint(len(encoded))
+        data += encoded
+        if (canonical):
+            data.append(lengths[token])
+        else:
+            value, length = codes[token]
+            data += TOKEN_CODE.pack(length, value)
+    return FLAG_TOKENS | (FLAG_CANONICAL if canonical else 0), bytes(data)
+
+def unpack_tokens(data, symbols, flags):
+    """
+    unpack_tokens: converts bytes written with pack_tokens back to code table
+
+    :param data: packed code table (bytes)
+    :param symbols: number of tokens in code table (int)
+    :param flags: container flags (int)
+    :return: return code table (dictionary)
+    """
+    codes = {}
+    position = 0
+    for _ in range(symbols):
+        size, position = read_varint(data, position)
+        token = bytes(data[position:position + size]).decode("utf-8", "surrogatepass")
+        position += size
+        if (flags & FLAG_CANONICAL):
+            codes[token] = data[position]
+            position += 1
+        else:
+            length, value = TOKEN_CODE.unpack_from(data, position)
+            codes[token] = (value, length)
+            position += TOKEN_CODE.size
+    return canonical_codes(codes) if flags & FLAG_CANONICAL else codes
+
+
+def block_checksum(block):
+    """
+    block_checksum: calculates CRC32 of original data of block, text is checked in UTF-8
+
+    :param block: text or binary data of block (string or bytes)
+    :return: return checksum (int)
+    """
+    if isinstance(block, str):
+        block = block.encode("utf-8", "surrogatepass")
+    return zlib.crc32(block)
+
+def pack_local_table(codes):
+    """
+    pack_local_table: converts code table of one block to bytes that are written before encoded block
+
+    :param codes: code table of block (dictionary)
+    :return: return packed code table with its flags, number of symbols and size (bytes)
+    """
+    flags, table = pack_codes(codes)
+    return LOCAL_TABLE.pack(flags, len(codes), len(table)) + table
+
+def unpack_local_table(data):
+    """
+    unpack_local_table: reads code table written with pack_local_table from beginning of block
+
+    :param data: block that starts with local table (bytes)
+    :return: return code table and index of first byte of encoded data (tuple)
+    """
+    flags, symbols, size = LOCAL_TABLE.unpack_from(data, 0)
+    return unpack_codes(data[LOCAL_TABLE.size:LOCAL_TABLE.size + size], symbols, flags), LOCAL_TABLE.size + size
+
+
+class ContainerWriter:
+    def __init__(self, file_name, codes, block_size=BLOCK_SIZE, model=None, binary=False, compact=True):
+        """
+        Construct a new 'ContainerWriter' object, opens file and writes code table to it.
+        Document compressed with model is written in compact form on close when it has at most one block
+
+        :param file_name: name of container file, or binary file object which is left open (string or file)
+        :param codes: code table, codes[char] = (code value, code length),
+                      None when every block is added with its own table, not used with model (dictionary)
+        :param block_size: number of characters in one block, last block can be shorter (int)
+        :param model: pre-trained model, only its ID is written instead of code table (Model)
+        :param binary: blocks with local tables contain bytes, used only when codes is None (bool)
+        :param compact: allow compact form, full form is always written if false (bool)
+        :return: returns nothing
+        """
+        self.owned = isinstance(file_name, str)
+        self.file = open(file_name, "wb") if self.owned else file_name
+        self.start = self.file.tell()
+        self.closed = False
+        self.appending = False
+        self.kinds = None
+        self.model = model
+        self.compact = compact
+        self.first = None
+        self.codes = codes if model is None else model.codes
+        self.block_size = block_size
+        self.index = []
+        self.checksums = []
+        self.length = 0
+        with timer('serialize'):
+            if model is None and codes is None:
+                self.codes = {}
+                self.flags = FLAG_LOCAL | (FLAG_BYTES if binary else 0)
+                table = b''
+            elif model is None:
+                self.flags, table = pack_codes(codes)
+            else:
+                self.flags = FLAG_MODEL | (FLAG_BYTES if model.binary else 0)
+                table = bytes.fromhex(model.id)
+        self.file.write(bytes(HEADER.size))
+        self.file.write(table)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if (exc_type is not None and self.appending):
+            self.abort()
+        else:
+            self.close()
+
+    @classmethod
+    def append_to(cls, file_name, model_directory=MODEL_DIRECTORY):
+        """
+        append_to: opens existing container for adding blocks, only its header, code table and block index are read
+        New blocks are written at end of file, after old index, which stays valid until new header is written on close
+
+        :param file_name: name of container file (string)
+        :param model_directory: directory of pre-trained models, used when document was compressed with model (string)
+        :return: returns writer of container (ContainerWriter)
+        """
+        with open(file_name, "rb") as reader:
+            compact = reader.read(len(COMPACT_MAGIC)) == COMPACT_MAGIC
+        if (compact):
+            expand_compact(file_name, model_directory)
+        with ContainerReader(file_name, model_directory) as reader:
+            if reader.checksums is None:
+                raise ValueError("Container has no checksums!")
+            writer = cls.__new__(cls)
+            writer.owned = True
+            writer.file = open(file_name, "r+b")
+            writer.start = 0
+            writer.closed = False
+            writer.appending = True
+            writer.compact = False
+            writer.first = None
+            writer.codes = reader.codes
+            writer.model = reader.model
+            writer.binary = reader.binary
+            writer.block_size = reader.block_size
+            writer.index = list(reader.index)
+            writer.checksums = list(reader.checksums)
+            writer.kinds = list(reader.kinds) if reader.kinds is not None else None
+            writer.length = reader.length
+            writer.flags = reader.flags
+            writer.end = writer.file.seek(0, 2)
+        return writer
+
+    def add_block(self, encoded, length, checksum, escaped=False, table=b'', kind=KIND_SHARED):
+        """
+        add_block: writes one independently encoded block
+
+        :param encoded: encoded block (BitWriter)
+        :param length: number of characters in block (int)
+        :param checksum: checksum of original block, calculated with block_checksum (int)
+        :param escaped: block encoded with model contains escaped symbols (bool)
+        :param table: local code table of block written with pack_local_table, only with local tables (bytes)
+        :param kind: kind of appended block, KIND_SHARED, KIND_ESCAPE or KIND_LOCAL (int)
+        :return: returns nothing
+        """
+        if (escaped):
+            self.flags |= FLAG_ESCAPES
+        if (bool(table) != (bool(self.flags & FLAG_LOCAL) or kind == KIND_LOCAL)):
+            raise ValueError("Local table is not correct!")
+        if (kind != KIND_SHARED and self.kinds is None):
+            #first block of other kind, all blocks before it use code table of container
+            self.kinds = [KIND_SHARED] * len(self.index)
+            self.flags |= FLAG_SEGMENTS
+        if self.kinds is not None:
+            self.kinds.append(kind)
+        with timer('write'):
+            data = encoded.getvalue()
+            if (self.compact and self.model is not None and not self.index):
+                #first block is kept for compact form, which writes it again after compact header
+                self.first = data
+            #number of bits of block with local table includes its table
+            self.index.append((self.file.tell() - self.start, len(table) * 8 + len(encoded), length))
+            self.checksums.append(checksum)
+            self.file.write(table)
+            self.file.write(data)
+        self.length += length
+        registry.add('encoded_bits', len(encoded))
+
+    def abort(self):
+        """
+        abort: stops append without writing index and header, new blocks are removed and old index stays in use
+
+        :return: returns nothing
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.file.truncate(self.end)
+        self.file.close()
+
+    def is_compact(self):
+        """
+        is_compact: checks if container is written in compact form, document with model and at most one block
+
+        :return: returns true for compact form (bool)
+        """
+        return self.compact and bool(self.flags & FLAG_MODEL) and len(self.index) <= 1
+
+    def close(self):
+        """
+        close: writes block index, checksums and header and closes file,
+        compact container is written again from its start as compact header followed by its block
+
+        :return: returns nothing
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if (self.is_compact()):
+            padding = -self.index[0][1] % 8 if self.index else 0
+            self.file.seek(self.start)
+            self.file.write(COMPACT_HEADER.pack(COMPACT_MAGIC, (self.flags & (FLAG_BYTES | FLAG_ESCAPES)) |
+                                                padding << COMPACT_PADDING_SHIFT))
+            self.file.write(bytes.fromhex(self.model.id))
+            self.file.write(write_varint(self.length))
+            self.file.write(CHECKSUM.pack(self.checksums[0] if self.checksums else block_checksum(b'')))
+            self.file.write(self.first or b'')
+            self.file.truncate()
+            registry.add('output_bytes', self.file.tell() - self.start)
+            if (self.owned):
+                self.file.close()
+            return
+        index_offset = self.file.tell() - self.start
+        for entry in self.index:
+            self.file.write(INDEX.pack(*entry))
+        for checksum in self.checksums:
+            self.file.write(CHECKSUM.pack(checksum))
+        if self.kinds is not None:
+            self.file.write(bytes(self.kinds))
+        self.file.truncate()
+        if (self.appending):
+            #header is written only after new index is on disk, it switches container from old index to new one
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        padding = -self.index[-1][1] % 8 if self.index else 0
+        self.file.seek(self.start)
+        self.file.write(HEADER.pack(MAGIC, VERSION, padding, self.flags, len(self.codes), self.length,
+                                    self.block_size, len(self.index), index_offset))
+        self.file.seek(0, 2)
+        registry.add('output_bytes', self.file.tell() - self.start)
+        if (self.owned):
+            self.file.close()
+
+
+class ContainerReader:
+    def __init__(self, file_name, model_directory=MODEL_DIRECTORY):
+        """
+        Construct a new 'ContainerReader' object, maps file to memory and reads header, code table and block index.
+        Blocks are read from mapped file only when they are decoded
+
+        :param file_name: name of container file, or whole container already in memory,
+                          memoryview (for example of member of mapped archive) is read without copying
+                          (string, bytes or memoryview)
+        :param model_directory: directory of pre-trained models, used when document was compressed with model (string)
+        :return: returns nothing
+        """
+        self.file_name = file_name
+        if isinstance(file_name, str):
+            with open(file_name, "rb") as reader:
+                if (os.fstat(reader.fileno()).st_size < COMPACT_HEADER.size):
+                    raise IOError("File is not Huffman container!")
+                self.data = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        elif isinstance(file_name, memoryview):
+            self.data = file_name
+        else:
+            self.data = bytes(file_name)
+        self.compact = self.data[:len(COMPACT_MAGIC)] == COMPACT_MAGIC
+        if (self.compact):
+            self.read_compact(model_directory)
+            return
+        if (len(self.data) < HEADER.size):
+            self.close()
+            raise IOError("File is not Huffman container!")
+        magic, version, self.padding, self.flags, symbols, self.length, self.block_size, blocks, self.index_offset = \
+            HEADER.unpack_from(self.data, 0)
+        index_offset = self.index_offset
+        if (magic != MAGIC or version not in (1, VERSION)):
+            self.close()
+            raise IOError("File is not Huffman container!")
+        self.index = [INDEX.unpack_from(self.data, index_offset + i * INDEX.size) for i in range(blocks)]
+        #containers of version 1 have no checksums
+        self.checksums = None
+        if (version > 1):
+            checksum_offset = index_offset + blocks * INDEX.size
+            self.checksums = [CHECKSUM.unpack_from(self.data, checksum_offset + i * CHECKSUM.size)[0]
+                              for i in range(blocks)]
+        self.kinds = None
+        if (self.flags & FLAG_SEGMENTS):
+            kinds_offset = index_offset + blocks * (INDEX.size + CHECKSUM.size)
+            self.kinds = list(self.data[kinds_offset:kinds_offset + blocks])
+        #code table ends where first block starts
+        table_end = self.index[0][0] if self.index else index_offset
+        self.model = None
+        self.local = bool(self.flags & FLAG_LOCAL)
+        if (self.local):
+            self.codes = {}
+        elif (self.flags & FLAG_MODEL):
+            self.model = load_model(self.data[HEADER.size:table_end].hex(), model_directory)
+            self.codes = self.model.codes
+        else:
+            self.codes = unpack_codes(self.data[HEADER.size:table_end], symbols, self.flags)
+        self.read_starts()
+
+    def read_compact(self, model_directory):
+        """
+        read_compact: reads compact header, model ID, length and checksum of container in compact form
+        and describes its block with index of one entry, so it is decoded like block of full form
+
+        :param model_directory: directory of pre-trained models (string)
+        :return: returns nothing
+        """
+        if (len(self.data) < COMPACT_HEADER.size + MODEL_ID_BYTES):
+            self.close()
+            raise IOError("File is not Huffman container!")
+        magic, flags = COMPACT_HEADER.unpack_from(self.data, 0)
+        self.padding = flags >> COMPACT_PADDING_SHIFT
+        self.flags = FLAG_MODEL | (flags & (FLAG_BYTES | FLAG_ESCAPES))
+        position = COMPACT_HEADER.size + MODEL_ID_BYTES
+        model_id = self.data[COMPACT_HEADER.size:position].hex()
+        self.length, position = read_varint(self.data, position)
+        checksum, = CHECKSUM.unpack_from(self.data, position)
+        position += CHECKSUM.size
+        self.block_size = BLOCK_SIZE
+        self.index_offset = len(self.data)
+        self.index = [(position, (len(self.data) - position) * 8 - self.padding, self.length)] if self.length else []
+        self.checksums = [checksum] if self.length else []
+        self.kinds = None
+        self.local = False
+        self.model = load_model(model_id, model_directory)
+        self.codes = self.model.codes
+        self.read_starts()
+
+    def read_starts(self):
+        """
+        read_starts: calculates index of first character of every block, used to find blocks of range
+
+        :return: returns nothing
+        """
+        #bytes mode containers decode to bytes instead of text
+        self.binary = bool(self.flags & FLAG_BYTES)
+        self.empty = b'' if self.binary else ''
+        self.starts = []
+        start = 0
+        for offset, bits, length in self.index:
+            self.starts.append(start)
+            start += length
+        self.table = None
+        self.escape = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        close: unmaps container file, or releases view of container, so mapped file it views can be closed
+
+        :return: returns nothing
+        """
+        if isinstance(self.data, mmap.mmap) and not self.data.closed:
+            self.data.close()
+        elif isinstance(self.data, memoryview):
+            self.data.release()
+
+    def decode_table(self):
+        """
+        decode_table: returns decode table for code table of container, table is built on first use
+        and chosen by code_decoder, documents compressed with model use decode table cached with model
+
+        :return: returns decode table (DecodeTable or CanonicalTable)
+        """
+        if (self.local):
+            raise ValueError("Container has local tables!")
+        if self.model is not None:
+            return self.model.decode_table(bool(self.flags & FLAG_ESCAPES))
+        if self.table is None:
+            self.table = code_decoder(self.codes, self.flags, self.bits())
+        return self.table
+
+    def bits(self):
+        """
+        bits: returns number of encoded bits of all blocks
+
+        :return: returns number of bits (int)
+        """
+        return sum(entry[1] for entry in self.index)
+
+    def read_blocks(self, first=0, last=None):
+        """
+        read_blocks: reads encoded blocks from mapped file, blocks are copied to bytes so they can be sent to workers
+
+        :param first: index of first block (int)
+        :param last: index after last block, all blocks to the end if not given (int)
+        :return: returns list of (packed bits, number of bits, number of characters) (list)
+        """
+        return [(bytes(self.data[offset:offset + (bits + 7) // 8]), bits, length)
+                for offset, bits, length in self.index[first:last]]
+
+    def block_kinds(self, first=0, last=None):
+        """
+        block_kinds: returns kinds of blocks, in container without appended segments every block uses its code table
+
+        :param first: index of first block (int)
+        :param last: index after last block, all blocks to the end if not given (int)
+        :return: returns kind of every block (list)
+        """
+        if self.kinds is None:
+            return [KIND_SHARED] * len(self.index[first:last])
+        return self.kinds[first:last]
+
+    def escape_model(self):
+        """
+        escape_model: returns model used by appended blocks with escapes, model is built on first use
+
+        :return: returns model (Model)
+        """
+        if self.escape is None:
+            self.escape = escape_model(self.codes)
+        return self.escape
+
+    def block_decoder(self, data, bits, kind=KIND_SHARED):
+        """
+        block_decoder: returns decode table of block and reader of its encoded data
+
+        :param data: packed bits of block (bytes)
+        :param bits: number of bits of block (int)
+        :param kind: kind of block (int)
+        :return: returns decode table (DecodeTable, CanonicalTable or Model) and reader (tuple)
+        """
+        if (self.local or kind == KIND_LOCAL):
+            return local_block_decoder(data, bits)
+        if (kind == KIND_ESCAPE):
+            return self.escape_model(), BitReader(data, bits)
+        return self.decode_table(), BitReader(data, bits)
+
+    def decode_data(self, data, bits, length, kind=KIND_SHARED):
+        """
+        decode_data: decodes one block in this process, block with local table is decoded with its own table
+
+        :param data: packed bits of block (bytes)
+        :param bits: number of bits of block (int)
+        :param length: number of characters in block (int)
+        :param kind: kind of block (int)
+        :return: returns decoded text of block (string or bytes)
+        """
+        table, reader = self.block_decoder(data, bits, kind)
+        return table.decode(reader, length)
+
+    def decode_chunks(self, chunk_size=DECODE_CHUNK, parallel=False):
+        """
+        decode_chunks: decodes document in parts of chunk_size characters, last part can be shorter
+        Serially every block is decoded part by part, so memory depends only on chunk size, not on block size,
+        in parallel mode whole blocks are decoded by workers and cut to parts
+
+        :param chunk_size: number of characters (bytes in bytes mode) in one part (int)
+        :param parallel: decode blocks in parallel (bool)
+        :return: yields parts of original text (string or bytes)
+        """
+        if (chunk_size <= 0):
+            raise ValueError("Chunk size is not correct!")
+        executor = get_executor()
+        backend, parts = executor.choose(self.length) if parallel and self.model is None else ('serial', 1)
+        if (backend != 'serial'):
+            pieces = self.decode_blocks(parallel)
+        else:
+            pieces = (piece for (offset, bits, length), kind in zip(self.index, self.block_kinds())
+                      for piece in self.decode_block_chunks(self.data[offset:offset + (bits + 7) // 8], bits,
+                                                            length, chunk_size, kind))
+        pending = []
+        pending_length = 0
+        for piece in pieces:
+            if not piece:
+                continue
+            pending.append(piece)
+            pending_length += len(piece)
+            if (pending_length < chunk_size):
+                continue
+            text = self.empty.join(pending)
+            end = len(text) - len(text) % chunk_size
+            for i in range(0, end, chunk_size):
+                yield text[i:i + chunk_size]
+            pending = [text[end:]] if end < len(text) else []
+            pending_length = len(text) - end
+        if pending:
+            yield self.empty.join(pending)
+
+    def decode_block_chunks(self, data, bits, length, chunk_size, kind=KIND_SHARED):
+        """
+        decode_block_chunks: decodes one block in this process part by part
+        Blocks with escapes are decoded at once
+
+        :param data: packed bits of block (bytes)
+        :param bits: number of bits of block (int)
+        :param length: number of characters in block (int)
+        :param chunk_size: maximal number of characters in one part (int)
+        :param kind: kind of block (int)
+        :return: yields parts of decoded block (string or bytes)
+        """
+        table, reader = self.block_decoder(data, bits, kind)
+        if hasattr(table, "decode_chunks"):
+            yield from table.decode_chunks(reader, length, chunk_size)
+        else:
+            yield table.decode(reader, length)
+
+    def map_blocks(self, blocks, backend, checksum=False, kinds=None):
+        """
+        map_blocks: decodes blocks with executor, workers receive code table of container once
+
+        :param blocks: blocks returned by read_blocks (list)
+        :param backend: 'thread' or 'process' (string)
+        :param checksum: workers return only checksum of decoded block instead of its text (bool)
+        :param kinds: kinds of blocks, needed only in container with appended segments (list)
+        :return: returns decoded text or checksum of every block (list)
+        """
+        executor = get_executor()
+        size = sum(block[2] for block in blocks)
+        stage = 'verify' if checksum else 'decode'
+        if self.kinds is not None:
+            func = checksum_kind_block if checksum else decode_kind_block
+            escape = self.escape_model() if KIND_ESCAPE in kinds else None
+            with executor.share((self.codes, self.flags, self.bits())) as codes, executor.share(escape) as model:
+                return executor.map(stage, func, [(block, kind, codes, model) for block, kind in zip(blocks, kinds)],
+                                    backend, size)
+        if (self.local):
+            func = checksum_local_block if checksum else decode_local_block
+            return executor.map(stage, func, [(block,) for block in blocks], backend, size)
+        func = checksum_block if checksum else decode_block
+        with executor.share((self.codes, self.flags, self.bits())) as codes:
+            return executor.map(stage, func, [(block, codes) for block in blocks], backend, size)
+
+    def verify(self, sample=None, parallel=False):
+        """
+        verify: decodes blocks one batch at a time and compares checksums of decoded blocks with stored checksums,
+        decoded document is never kept in memory
+
+        :param sample: part of blocks that are checked, chosen at random, all blocks are checked if not given (float)
+        :param parallel: decode blocks in parallel (bool)
+        :return: returns indexes of blocks whose checksum doesn't match (list)
+        """
+        if self.checksums is None:
+            raise ValueError("Container has no checksums!")
+        blocks = range(len(self.index))
+        if (sample is not None):
+            blocks = sorted(random.sample(blocks, min(len(blocks), max(1, round(len(blocks) * sample)))))
+        registry.add('verified_blocks', len(blocks))
+        executor = get_executor()
+        backend, parts = executor.choose(self.length) if parallel and self.model is None else ('serial', 1)
+        corrupted = []
+        with timer('verify', sum(self.index[i][2] for i in blocks)):
+            for first in range(0, len(blocks), executor.workers):
+                batch = blocks[first:first + executor.workers]
+                read = [self.read_blocks(i, i + 1)[0] for i in batch]
+                kinds = [self.block_kinds(i, i + 1)[0] for i in batch]
+                if (backend == 'serial'):
+                    checksums = [block_checksum(self.decode_data(*block, kind)) for block, kind in zip(read, kinds)]
+                else:
+                    checksums = self.map_blocks(read, backend, True, kinds)
+                corrupted += [i for i, checksum in zip(batch, checksums) if checksum != self.checksums[i]]
+        return corrupted
+
+    def decode_blocks(self, parallel=False):
+        """
+        decode_blocks: decodes document block by block, so whole document doesn't have to be in memory
+        In parallel mode blocks are decoded in batches, one block per worker,
+        documents compressed with model are always decoded serially with decode table cached with model
+
+        :param parallel: decode blocks in parallel (bool)
+        :return: yields decoded text of every block (string or bytes)
+        """
+        executor = get_executor()
+        backend, parts = executor.choose(self.length) if parallel and self.model is None else ('serial', 1)
+        if (backend == 'serial'):
+            for (offset, bits, length), kind in zip(self.index, self.block_kinds()):
+                yield self.decode_data(self.data[offset:offset + (bits + 7) // 8], bits, length, kind)
+            return
+        for first in range(0, len(self.index), executor.workers):
+            last = first + executor.workers
+            yield from self.map_blocks(self.read_blocks(first, last), backend, kinds=self.block_kinds(first, last))
+
+    def decode(self, parallel=False):
+        """
+        decode: decodes whole document
+        In parallel mode blocks are decoded by executor, backend is chosen from length of document
+        and each worker builds decode table once, documents compressed with model are always decoded serially
+
+        :param parallel: decode blocks in parallel (bool)
+        :return: returns original text, bytes in bytes mode (string or bytes)
+        """
+        blocks = self.read_blocks()
+        with timer('decode', self.length):
+            executor = get_executor()
+            backend, parts = executor.choose(self.length) if parallel and self.model is None else ('serial', 1)
+            if (backend == 'serial'):
+                return self.empty.join(self.decode_data(*block, kind) for block, kind in zip(blocks, self.block_kinds()))
+            return self.empty.join(self.map_blocks(blocks, backend, kinds=self.block_kinds()))
+
+    def decode_range(self, start, end):
+        """
+        decode_range: decodes only blocks that cover given range of characters
+
+        :param start: index of first character (int)
+        :param end: index after last character (int)
+        :return: returns characters (bytes in bytes mode) from start to end of original text (string or bytes)
+        """
+        start = max(0, start)
+        end = min(self.length, end)
+        if (start >= end):
+            return self.empty
+        first = bisect_right(self.starts, start) - 1
+        last = bisect_right(self.starts, end - 1)
+        text = self.empty.join(self.decode_data(*block, kind)
+                               for block, kind in zip(self.read_blocks(first, last), self.block_kinds(first, last)))
+        offset = self.starts[first]
+        return text[start - offset:end - offset]
+
+
+def expand_compact(file_name, model_directory=MODEL_DIRECTORY):
+    """
+    expand_compact: rewrites container in compact form to full form, so blocks can be appended to it
+    Full form is written to temporary file that replaces container, so interrupted rewrite keeps compact container
+
+    :param file_name: name of container file (string)
+    :param model_directory: directory of pre-trained models (string)
+    :return: returns nothing
+    """
+    temporary_file_name = file_name + ".tmp"
+    with ContainerReader(file_name, model_directory) as reader:
+        with ContainerWriter(temporary_file_name, None, reader.block_size, reader.model, compact=False) as writer:
+            for (data, bits, length), checksum in zip(reader.read_blocks(), reader.checksums):
+                writer.add_block(BitWriter.from_bytes(data, bits), length, checksum,
+                                 bool(reader.flags & FLAG_ESCAPES))
+    os.replace(temporary_file_name, file_name)
+
+
+def code_decoder(codes, flags, bits):
+    """
+    code_decoder: builds decoder for code table, chosen by number of bits that will be decoded with it
+    For canonical code with few encoded bits per symbol, building byte table would cost more
+    than decoding, so small canonical table is used instead, other codes then walk trie of byte table bit by bit
+    Token alphabets always use byte table, it emits whole tokens for every byte
+
+    :param codes: code table (dictionary)
+    :param flags: flags of container or of local table (int)
+    :param bits: number of encoded bits decoded with code table (int)
+    :return: returns decode table (DecodeTable or CanonicalTable)
+    """
+    if (flags & FLAG_CANONICAL and not flags & FLAG_TOKENS and bits < TABLE_BITS_PER_SYMBOL * len(codes)):
+        return CanonicalTable(code_lengths(codes))
+    return DecodeTable(codes, None if flags & FLAG_TOKENS else bits)
+
+def build_code_decoder(shared):
+    """
+    build_code_decoder: builds decoder from code table, flags and bits shared with workers
+
+    :param shared: code table, flags and number of bits of container (tuple)
+    :return: returns decode table (DecodeTable or CanonicalTable)
+    """
+    return code_decoder(*shared)
+
+def decode_block(block, codes):
+    """
+    decode_block: decodes one block in worker, decode table is built once in each worker
+
+    :param block: packed bits, number of bits and number of characters of block (tuple)
+    :param codes: code table, flags and number of bits of container (Shared)
+    :return: returns decoded text of block (string)
+    """
+    data, bits, length = block
+    return codes.get(build_code_decoder).decode(BitReader(data, bits), length)
+
+def decode_local_block(block):
+    """
+    decode_local_block: decodes one block that starts with its own code table
+
+    :param block: packed bits, number of bits and number of characters of block (tuple)
+    :return: returns decoded text of block (string or bytes)
+    """
+    data, bits, length = block
+    table, reader = local_block_decoder(data, bits)
+    return table.decode(reader, length)
+
+def local_block_decoder(data, bits):
+    """
+    local_block_decoder: reads local table of block and builds its decode table
+
+    :param data: block that starts with local table (bytes)
+    :param bits: number of bits of block, including table (int)
+    :return: returns decode table and reader of encoded data of block (tuple)
+    """
+    codes, start = unpack_local_table(data)
+    bits -= start * 8
+    return code_decoder(codes, data[0], bits), BitReader(data[start:], bits)
+
+def checksum_block(block, codes):
+    """
+    checksum_block: decodes one block in worker and returns only checksum of decoded data
+
+    :param block: packed bits, number of bits and number of characters of block (tuple)
+    :param codes: code table, flags and number of bits of container (Shared)
+    :return: returns checksum of decoded block (int)
+    """
+    return block_checksum(decode_block(block, codes))
+
+def checksum_local_block(block):
+    """
+    checksum_local_block: decodes one block with local table in worker and returns only checksum of decoded data
+
+    :param block: packed bits, number of bits and number of characters of block (tuple)
+    :return: returns checksum of decoded block (int)
+    """
+    return block_checksum(decode_local_block(block))
+
+def decode_kind_block(block, kind, codes, model):
+    """
+    decode_kind_block: decodes one block of container with appended segments in worker
+
+    :param block: packed bits, number of bits and number of characters of block (tuple)
+    :param kind: kind of block (int)
+    :param codes: code table, flags and number of bits of container (Shared)
+    :param model: model with escape built with escape_model, None if no block of batch needs it (Shared)
+    :return: returns decoded text of block (string or bytes)
+    """
+    if (kind == KIND_LOCAL):
+        return decode_local_block(block)
+    if (kind == KIND_ESCAPE):
+        data, bits, length = block
+        return model.get().decode(BitReader(data, bits), length)
+    return decode_block(block, codes)
+
+def checksum_kind_block(block, kind, codes, model):
+    """
+    checksum_kind_block: decodes one block of container with appended segments in worker
+    and returns only checksum of decoded data
+
+    :param block: packed bits, number of bits and number of characters of block (tuple)
+    :param kind: kind of block (int)
+    :param codes: code table, flags and number of bits of container (Shared)
+    :param model: model with escape, None if no block of batch needs it (Shared)
+    :return: returns checksum of decoded block (int)
+    """
+    return block_checksum(decode_kind_block(block, kind, codes, model))
@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+import argparse
+from container import ContainerReader, VERIFY_SAMPLE, DECODE_CHUNK
+from model import MODEL_DIRECTORY
+from metrics import registry, timer
+
+"""
+Decompression of container files written by sequential or parallel compression.
+Container is mapped to memory, code table is rebuilt from its header and
+original text (or binary data in bytes mode) is written to output file block by block,
+so decompressed document never has to be in memory.
+Decompressed text can also be read as iterator of parts of fixed size, or written to any binary stream
+(for example standard output, so it can be piped to other process), stream is flushed after every part.
+Container can also be only verified: blocks are decoded and checked against their stored checksums
+"""
+
+def decompressed_file_name(file_name):
+    """
+    decompressed_file_name: returns default name of decompressed document,
+    doc_compressed.bin -> doc_decompressed.txt, huf.png_compressed.bin -> huf_decompressed.png
+
+    :param file_name: name of container file (string)
+    :return: returns name of decompressed document (string)
+    """
+    for suffix in ("_compressed.bin", ".bin"):
+        if file_name.endswith(suffix):
+            file_name = file_name[:-len(suffix)]
+            break
+    name, extension = os.path.splitext(file_name)
+    return name + "_decompressed" + (extension or ".txt")
+
+def decompress(file_name, output_file_name=None, parallel=False, model_directory=MODEL_DIRECTORY):
+    """
+    decompress: decodes container file and writes original text to txt document,
+    container compressed in bytes mode is written as binary file
+
+    :param file_name: name of container file (string)
+    :param output_file_name: name of txt document, derived from file_name if not given (string)
+    :param parallel: decode blocks in parallel (bool)
+    :param model_directory: directory of pre-trained models, used when document was compressed with model (string)
+    :return: returns name of written document (string)
+    """
+    if output_file_name is None:
+        output_file_name = decompressed_file_name(file_name)
+    with open(output_file_name, "wb") as writer:
+        decompress_to(file_name, writer, DECODE_CHUNK, parallel, model_directory)
+    return output_file_name
+
+def iter_decompress(file_name, chunk_size=DECODE_CHUNK, parallel=False, model_directory=MODEL_DIRECTORY):
+    """
+    iter_decompress: decodes container file part by part, only one part of decoded text is in memory at once
+
+    :param file_name: name of container file (string)
+    :param chunk_size: number of characters (bytes in bytes mode) in one part, last part can be shorter (int)
+    :param parallel: decode blocks in parallel (bool)
+    :param model_directory: directory of pre-trained models, used when document was compressed with model (string)
+    :return: yields parts of original text (string or bytes)
+    """
+    with ContainerReader(file_name, model_directory) as reader:
+        yield from reader.decode_chunks(chunk_size, parallel)
+
+def decompress_to(file_name, writer, chunk_size=DECODE_CHUNK, parallel=False, model_directory=MODEL_DIRECTORY):
+    """
+    decompress_to: decodes container file to binary stream, text is written in UTF-8,
+    stream is flushed after every part, so reader on other side of pipe gets text while it is decoded
+
+    :param file_name: name of container file (string)
+    :param writer: binary stream, for example open file or sys.stdout.buffer
+    :param chunk_size: number of characters (bytes in bytes mode) in one part (int)
+    :param parallel: decode blocks in parallel (bool)
+    :param model_directory: directory of pre-trained models, used when document was compressed with model (string)
+    :return: returns number of decoded characters (int)
+    """
+    symbols = 0
+    with ContainerReader(file_name, model_directory) as reader:
+        with timer('decode', reader.length):
+            for text in reader.decode_chunks(chunk_size, parallel):
+                writer.write(text if reader.binary else text.encode("utf-8", "surrogatepass"))
+                writer.flush()
+                symbols += len(text)
+    return symbols
+
+def verify(file_name, sample=None, parallel=False, model_directory=MODEL_DIRECTORY):
+    """
+    verify: checks container by decoding it block by block and comparing checksums, nothing is written
+
+    :param file_name: name of container file (string)
+    :param sample: part of blocks that are checked, all blocks are checked if not given (float)
+    :param parallel: decode blocks in parallel (bool)
+    :param model_directory: directory of pre-trained models, used when document was compressed with model (string)
+    :return: returns indexes of corrupted blocks, empty when container is correct (list)
+    """
+    with ContainerReader(file_name, model_directory) as reader:
+        return reader.verify(sample, parallel)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Decompression of Huffman container files")
+    parser.add_argument("file_name", help="path to compressed .bin file")
+    parser.add_argument("--output", default=None, help="path of decompressed txt document, - for standard output")
+    parser.add_argument("--chunk-size", type=int, default=DECODE_CHUNK,
+                        help="number of characters decoded and written at once")
+    parser.add_argument("--parallel", action="store_true", help="decode blocks in parallel")
+    parser.add_argument("--verify", action="store_true",
+                        help="only check checksums of decoded blocks, decompressed document is not written")
+    parser.add_argument("--sample", type=float, default=None,
+                        help="with --verify check only this part of blocks, chosen at random, for example %s" % VERIFY_SAMPLE)
+    parser.add_argument("--model-dir", default=MODEL_DIRECTORY, help="directory of pre-trained models")
+    parser.add_argument("--metrics", default=None,
+                        help="write measurements of all stages as JSON to given file")
+    return parser.parse_args()
+
+def start():
+    if len(sys.argv) == 1:
+        print("[ERROR] Path to bin file is required.")
+        sys.exit()
+    args = parse_arguments()
+
+    start_time = time.time()
+    if (args.output == "-"):
+        decompress_to(args.file_name, sys.stdout.buffer, args.chunk_size, args.parallel, args.model_dir)
+        if (args.metrics):
+            registry.to_json(args.metrics)
+        return
+    if (args.verify):
+        print("Verifying file: ", args.file_name)
+        corrupted = verify(args.file_name, args.sample, args.parallel, args.model_dir)
+        print("MATCHES" if not corrupted else "ERROR, corrupted blocks: " + str(corrupted))
+    else:
+        print("Decompressing file: ", args.file_name)
+        output_file_name = args.output or decompressed_file_name(args.file_name)
+        with open(output_file_name, "wb") as writer:
+            decompress_to(args.file_name, writer, args.chunk_size, args.parallel, args.model_dir)
+        print("Written file: ", output_file_name)
+    duration = time.time() - start_time
+    print(f"Duration {duration} seconds")
+    registry.report()
+    if (args.metrics):
+        registry.to_json(args.metrics)
+
+if __name__ == '__main__':
+    start()
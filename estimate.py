@@ -0,0 +1,222 @@
+import os
+import math
+from collections import Counter
+from tables import build_codes_from_frequency, encoded_length, code_lengths, symbol_frequency
+from container import pack_codes, HEADER, INDEX, CHECKSUM, BLOCK_SIZE
+from executor import get_executor, MIN_PART
+from metrics import registry, timer
+from util import open_document
+
+"""
+Estimation of compressed size without encoding.
+Size of encoded data is exactly sum of frequency * code length of every symbol, so only frequencies are counted
+and code lengths are calculated, container header, code table, block index and checksums are added to it.
+Every block starts at byte boundary, so symbols are counted block by block in one pass, frequency of document
+is sum of frequencies of blocks and padding of every block is calculated from its frequencies,
+predicted size is then exact size of container written by compression of characters or bytes.
+Files of directory are estimated together: small files are batched and counted by executor workers,
+large files are counted one by one and their blocks are split between workers
+"""
+
+#files smaller than this are counted in batches
+LARGE_FILE = 2 * MIN_PART
+
+def is_binary_file(file_name):
+    """
+    is_binary_file: every file that is not txt document is compressed as bytes
+
+    :param file_name: name of file (string)
+    :return: returns true when file is compressed in bytes mode (bool)
+    """
+    return not file_name.endswith(".txt")
+
+def read_document(file_name):
+    """
+    read_document: reads file as text or as bytes, in same way as it is read for compression
+
+    :param file_name: name of file (string)
+    :return: returns content of file (string or bytes)
+    """
+    with open_document(file_name, binary=is_binary_file(file_name)) as reader:
+        return reader.read()
+
+def count_symbols(document, block_size=None):
+    """
+    count_symbols: counts symbols of document in this process
+    With block size every block is counted on its own and frequencies of blocks are summed
+
+    :param document: text or binary data (string or bytes)
+    :param block_size: number of symbols in one block, document is counted whole if not given (int)
+    :return: returns frequency of every symbol (dictionary), with block size also frequency of every block (tuple)
+    """
+    if block_size is None:
+        return symbol_frequency(document)
+    blocks = [symbol_frequency(document[i:i + block_size]) for i in range(0, len(document), block_size)]
+    return sum_frequency(blocks), blocks
+
+def sum_frequency(blocks):
+    """
+    sum_frequency: sums frequencies of blocks to frequency of whole document
+
+    :param blocks: frequency of every block (list)
+    :return: returns frequency of every symbol (dictionary)
+    """
+    frequency = Counter()
+    for block in blocks:
+        frequency.update(block)
+    return dict(frequency)
+
+def count_blocks(document, block_size=BLOCK_SIZE):
+    """
+    count_blocks: counts blocks of large document with executor workers, every worker counts range of whole blocks
+
+    :param document: text or binary data (string or bytes)
+    :param block_size: number of symbols in one block (int)
+    :return: returns frequency of every symbol and frequency of every block (tuple)
+    """
+    executor = get_executor()
+    backend, parts = executor.choose(len(document))
+    #ranges start at block boundaries, so blocks of ranges are blocks of document
+    n = -(-len(document) // (parts * block_size)) * block_size or block_size
+    results = executor.map('count', count_symbols, [(document[i:i + n], block_size)
+                                                    for i in range(0, len(document), n)], backend, len(document))
+    blocks = [block for frequency, range_blocks in results for block in range_blocks]
+    return sum_frequency(frequency for frequency, range_blocks in results), blocks
+
+def block_bytes(blocks, lengths):
+    """
+    block_bytes: calculates size of encoded blocks from their frequencies, every block is padded to whole bytes
+
+    :param blocks: frequency of every block (list)
+    :param lengths: code length of every symbol (dictionary)
+    :return: returns number of bytes of all encoded blocks (int)
+    """
+    return sum((encoded_length(block, lengths) + 7) // 8 for block in blocks)
+
+def estimate_frequency(frequency, size, block_size=BLOCK_SIZE, max_length=None, blocks=None):
+    """
+    estimate_frequency: predicts size of container from frequencies of symbols
+    Without frequencies of blocks padding of blocks is not known and predicted size can be smaller
+    by less than one byte per block
+
+    :param frequency: frequency of every symbol in document (dictionary)
+    :param size: size of original file in bytes (int)
+    :param block_size: number of symbols in one block (int)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :param blocks: frequency of every block, used to add padding of every block (list)
+    :return: returns original size, predicted size, ratio, entropy and average code length in bits per symbol (dictionary)
+    """
+    symbols = sum(frequency.values())
+    codes = build_codes_from_frequency(frequency, True, max_length)
+    lengths = code_lengths(codes)
+    bits = encoded_length(frequency, lengths)
+    flags, table = pack_codes(codes)
+    number_of_blocks = math.ceil(symbols / block_size)
+    encoded = (bits + 7) // 8 if blocks is None else block_bytes(blocks, lengths)
+    predicted = HEADER.size + len(table) + encoded + number_of_blocks * (INDEX.size + CHECKSUM.size)
+    entropy = -sum(count / symbols * math.log2(count / symbols) for count in frequency.values()) if symbols else 0.0
+    return {
+        "size": size,
+        "symbols": symbols,
+        "alphabet": len(frequency),
+        "predicted": predicted,
+        "ratio": predicted / size if size else 0.0,
+        "entropy": entropy,
+        "bits_per_symbol": bits / symbols if symbols else 0.0,
+    }
+
+def estimate_file(file_name, count=count_symbols, block_size=BLOCK_SIZE, max_length=None):
+    """
+    estimate_file: predicts compressed size of one file, file is counted block by block but not encoded
+
+    :param file_name: name of file (string)
+    :param count: function that returns frequency of every symbol and of every block of document (function)
+    :param block_size: number of symbols in one block (int)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :return: returns estimate of file, see estimate_frequency (dictionary)
+    """
+    document = read_document(file_name)
+    with timer('count', len(document)):
+        frequency, blocks = count(document, block_size)
+    return {"file": file_name,
+            **estimate_frequency(frequency, os.path.getsize(file_name), block_size, max_length, blocks)}
+
+def estimate_batch(file_names, block_size=BLOCK_SIZE, max_length=None):
+    """
+    estimate_batch: estimates batch of small files in worker
+
+    :param file_names: names of files (list)
+    :param block_size: number of symbols in one block (int)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :return: returns estimate of every file (list)
+    """
+    return [estimate_file(file_name, count_symbols, block_size, max_length) for file_name in file_names]
+
+def list_files(file_names):
+    """
+    list_files: replaces directories with files in them, recursively
+
+    :param file_names: names of files or directories (list)
+    :return: returns sorted names of files (list)
+    """
+    files = []
+    for file_name in file_names:
+        if os.path.isdir(file_name):
+            for directory, subdirectories, names in os.walk(file_name):
+                files += [os.path.join(directory, name) for name in names]
+        else:
+            files.append(file_name)
+    return sorted(files)
+
+def batch_files(file_names, sizes):
+    """
+    batch_files: splits files smaller than LARGE_FILE to batches for executor workers,
+    batches are of about same size, one or more per worker
+
+    :param file_names: names of files (list)
+    :param sizes: size of every file in bytes (dictionary)
+    :return: returns backend chosen by executor and batches of small files (tuple)
+    """
+    small = [file_name for file_name in file_names if sizes[file_name] < LARGE_FILE]
+    backend, parts = get_executor().choose(sum(sizes[file_name] for file_name in small))
+    return backend, [small[i::parts] for i in range(parts)]
+
+def estimate(file_names, block_size=BLOCK_SIZE, max_length=None):
+    """
+    estimate: predicts compressed size of every file, directories are replaced with files in them
+    Small files are batched and estimated by executor workers, blocks of large files are counted by executor workers
+
+    :param file_names: names of files or directories (list)
+    :param block_size: number of symbols in one block (int)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :return: returns estimate of every file in order of names (list)
+    """
+    files = list_files(file_names)
+    sizes = {file_name: os.path.getsize(file_name) for file_name in files}
+    backend, batches = batch_files(files, sizes)
+    executor = get_executor()
+    results = {}
+    with timer('estimate', sum(sizes.values())):
+        for batch in executor.map('estimate', estimate_batch, [(batch, block_size, max_length) for batch in batches],
+                                  backend):
+            for result in batch:
+                results[result["file"]] = result
+        for file_name in files:
+            if file_name not in results:
+                results[file_name] = estimate_file(file_name, count_blocks, block_size, max_length)
+    registry.add('estimated_files', len(files))
+    return [results[file_name] for file_name in files]
+
+def print_estimates(estimates):
+    """
+    print_estimates: prints estimate of every file and total
+
+    :param estimates: estimates returned by estimate (list)
+    :return: returns nothing
+    """
+    for result in estimates:
+        print(f"{result['file']}: {result['size']} -> {result['predicted']} bytes, ratio {result['ratio']:.3f}, "
+              f"entropy {result['entropy']:.3f}, code {result['bits_per_symbol']:.3f} bits per symbol")
+    size = sum(result["size"] for result in estimates)
+    predicted = sum(result["predicted"] for result in estimates)
+    print(f"Total: {size} -> {predicted} bytes, ratio {predicted / size if size else 0.0:.3f}")
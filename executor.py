@@ -0,0 +1,222 @@
+import atexit
+import pickle
+import time
+from uuid import uuid4
+from multiprocessing import Pool, cpu_count, shared_memory, resource_tracker
+from multiprocessing.pool import ThreadPool
+from metrics import registry
+
+"""
+Long lived executor shared by all parallel stages (counting, encoding, decoding).
+Process and thread pools are created on first use and reused for every file,
+so process start and imports are paid once per program instead of once per stage.
+For every call cost model chooses backend and number of parts:
+    serial - input is too small to pay for sending it to other workers, or there is one core
+    thread - work releases GIL (numpy), threads avoid copying input to processes
+    process - pure Python work, which can run in parallel only in separate processes
+Each call is recorded in metrics registry as '<stage>.<backend>'
+"""
+
+#smallest number of symbols worth sending to one worker
+MIN_PART = 1 << 17
+
+class Executor:
+    def __init__(self, workers=None):
+        """
+        Construct a new 'Executor' object, pools are not started until they are needed.
+
+        :param workers: number of workers in each pool, number of cores if not given (int)
+        :return: returns nothing
+        """
+        self.workers = workers or cpu_count()
+        self.process_pool = None
+        self.thread_pool = None
+
+    def choose(self, size, releases_gil=False):
+        """
+        choose: chooses backend and number of parts for input of given size
+
+        :param size: number of symbols in input (int)
+        :param releases_gil: work is done by numpy and releases GIL (bool)
+        :return: returns backend ('serial', 'thread' or 'process') and number of parts (tuple)
+        """
+        parts = min(self.workers, size // MIN_PART)
+        if (parts <= 1):
+            return 'serial', 1
+        return ('thread' if releases_gil else 'process'), parts
+
+    def pool(self, backend):
+        """
+        pool: returns pool of given backend, pool is started on first use
+
+        :param backend: 'thread' or 'process' (string)
+        :return: returns pool (Pool or ThreadPool)
+        """
+        if (backend == 'thread'):
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPool(self.workers)
+            return self.thread_pool
+        if self.process_pool is None:
+            #workers must share resource tracker of this process, otherwise each worker starts its own tracker
+            #and reports shared memory it opened as leaked
+            resource_tracker.ensure_running()
+            self.process_pool = Pool(self.workers)
+        return self.process_pool
+
+    def map(self, stage, func, items, backend, size=0):
+        """
+        map: applies function to every item with given backend
+
+        :param stage: name of stage, used in metrics (string)
+        :param func: function applied to items, must be module level function for process backend (function)
+        :param items: arguments of function, tuples are unpacked (list)
+        :param backend: 'serial', 'thread' or 'process' (string)
+        :param size: number of symbols in all items, used in metrics (int)
+        :return: returns results in order of items (list)
+        """
+        begin = time.perf_counter()
+        items = [item if isinstance(item, tuple) else (item,) for item in items]
+        if (backend == 'serial'):
+            results = [func(*item) for item in items]
+        else:
+            results = self.pool(backend).starmap(func, items)
+        registry.record(stage + '.' + backend, time.perf_counter() - begin, size)
+        registry.add(stage + '.parts', len(items))
+        return results
+
+    def submit(self, func, args, backend):
+        """
+        submit: starts function with given backend without waiting for its result, used by pipelined stages
+
+        :param func: function, must be module level function for process backend (function)
+        :param args: arguments of function (tuple)
+        :param backend: 'serial', 'thread' or 'process' (string)
+        :return: returns result whose get method waits for value (AsyncResult or Completed)
+        """
+        if (backend == 'serial'):
+            return Completed(func(*args))
+        return self.pool(backend).apply_async(func, args)
+
+    def share(self, value):
+        """
+        share: wraps value that is sent to workers at most once
+
+        :param value: value needed by every task, for example code table
+        :return: returns shared value (Shared)
+        """
+        return Shared(value)
+
+    def close(self):
+        """
+        close: stops all started pools
+
+        :return: returns nothing
+        """
+        for pool in (self.process_pool, self.thread_pool):
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        self.process_pool = None
+        self.thread_pool = None
+
+
+class Completed:
+    def __init__(self, value):
+        """
+        Construct a new 'Completed' object, result of function that was run serially.
+
+        :param value: result of function
+        :return: returns nothing
+        """
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+worker_cache = {}
+
+class Shared:
+    def __init__(self, value):
+        """
+        Construct a new 'Shared' object.
+        When object is sent to process, value is pickled to shared memory only once and
+        task carries only name of shared memory, worker loads value once and keeps it in cache
+
+        :param value: shared value
+        :return: returns nothing
+        """
+        self.key = uuid4().hex
+        self.value = value
+        self.memory = None
+        self.size = 0
+
+    def __getstate__(self):
+        if self.memory is None:
+            data = pickle.dumps(self.value)
+            self.memory = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+            self.memory.buf[:len(data)] = data
+            self.size = len(data)
+        return {"key": self.key, "name": self.memory.name, "size": self.size}
+
+    def __setstate__(self, state):
+        self.key = state["key"]
+        self.value = None
+        self.memory = None
+        self.name = state["name"]
+        self.size = state["size"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, build=None):
+        """
+        get: returns shared value, in worker process value is loaded from shared memory on first use
+
+        :param build: function applied to value once, result is cached instead of value (function)
+        :return: returns shared value or result of build
+        """
+        cached = worker_cache.get(self.key)
+        if cached is None:
+            value = self.value
+            if value is None:
+                memory = shared_memory.SharedMemory(name=self.name)
+                try:
+                    value = pickle.loads(memory.buf[:self.size])
+                finally:
+                    memory.close()
+            cached = build(value) if build else value
+            if (len(worker_cache) > 16):
+                worker_cache.clear()
+            worker_cache[self.key] = cached
+        return cached
+
+    def close(self):
+        """
+        close: releases shared memory and cached value
+
+        :return: returns nothing
+        """
+        worker_cache.pop(self.key, None)
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+
+default_executor = None
+
+def get_executor():
+    """
+    get_executor: returns executor shared by whole program, it is closed when program exits
+
+    :return: returns executor (Executor)
+    """
+    global default_executor
+    if default_executor is None:
+        default_executor = Executor()
+        atexit.register(default_executor.close)
+    return default_executor
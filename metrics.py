@@ -0,0 +1,203 @@
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+"""
+Registry of measurements collected while compressing and decompressing.
+Every stage (count, build, encode, serialize, write, decode) is timed with perf_counter,
+stage can also record how many symbols it processed, so throughput can be reported.
+Counters hold sizes (input symbols, encoded bits, written bytes...).
+Gauges hold values that go up and down (for example depth of queue), with their last, maximal and average value.
+Peak memory of current process is measured with tracemalloc only when it is turned on,
+because tracing slows down allocations.
+Measurements can be recorded from worker threads (thread backend of executor, batches of service),
+so every update holds lock of registry
+"""
+
+class Metrics:
+    def __init__(self):
+        """
+        Construct a new empty 'Metrics' object.
+
+        :return: returns nothing
+        """
+        self.lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self.gauges = {}
+        self.peak_memory = None
+
+    def reset(self):
+        """
+        reset: removes all collected measurements
+
+        :return: returns nothing
+        """
+        with self.lock:
+            self.timers = {}
+            self.counters = {}
+            self.gauges = {}
+            self.peak_memory = None
+
+    def record(self, name, seconds, size=0):
+        """
+        record: adds one measured execution of stage
+
+        :param name: name of stage or function (string)
+        :param seconds: duration of execution (float)
+        :param size: number of symbols processed in execution (int)
+        :return: returns nothing
+        """
+        with self.lock:
+            entry = self.timers.setdefault(name, {"count": 0, "seconds": 0.0, "size": 0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["size"] += size
+
+    @contextmanager
+    def timer(self, name, size=0):
+        """
+        timer: measures execution of with block as one execution of stage
+
+        :param name: name of stage (string)
+        :param size: number of symbols processed in block (int)
+        :return: returns context manager
+        """
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - begin, size)
+
+    def add(self, name, value=1):
+        """
+        add: increases counter
+
+        :param name: name of counter (string)
+        :param value: value added to counter (int)
+        :return: returns nothing
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        """
+        observe: records current value of gauge
+
+        :param name: name of gauge (string)
+        :param value: current value (int or float)
+        :return: returns nothing
+        """
+        with self.lock:
+            entry = self.gauges.setdefault(name, {"count": 0, "last": value, "max": value, "total": 0})
+            entry["count"] += 1
+            entry["last"] = value
+            entry["max"] = max(entry["max"], value)
+            entry["total"] += value
+
+    def start_memory(self):
+        """
+        start_memory: starts tracing memory allocations of current process
+
+        :return: returns nothing
+        """
+        tracemalloc.start()
+
+    def stop_memory(self):
+        """
+        stop_memory: stops tracing memory allocations and saves peak traced memory in bytes
+
+        :return: returns nothing
+        """
+        if tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def to_dict(self):
+        """
+        to_dict: returns all measurements, throughput is given in millions of symbols per second
+
+        :return: returns measurements (dictionary)
+        """
+        with self.lock:
+            timers = {}
+            for name, entry in self.timers.items():
+                timers[name] = dict(entry)
+                if (entry["size"] and entry["seconds"]):
+                    timers[name]["throughput"] = entry["size"] / entry["seconds"] / 1e6
+            gauges = {name: {"last": entry["last"], "max": entry["max"], "average": entry["total"] / entry["count"]}
+                      for name, entry in self.gauges.items()}
+            counters = dict(self.counters)
+        return {"timers": timers, "counters": counters, "gauges": gauges, "peak_memory": self.peak_memory}
+
+    def to_json(self, file_name=None):
+        """
+        to_json: exports measurements as JSON
+
+        :param file_name: name of file to which JSON is written, JSON is only returned if not given (string)
+        :return: returns measurements as JSON (string)
+        """
+        text = json.dumps(self.to_dict(), indent=2)
+        if file_name is not None:
+            with open(file_name, "w") as writer:
+                writer.write(text)
+        return text
+
+    def report(self):
+        """
+        report: prints all measurements
+
+        :return: returns nothing
+        """
+        measurements = self.to_dict()
+        for name, entry in measurements["timers"].items():
+            line = "Total time taken in :  {} {} ({} calls)".format(name, entry["seconds"], entry["count"])
+            if "throughput" in entry:
+                line += ", {:.2f} M symbols/s".format(entry["throughput"])
+            print(line)
+        for name, value in measurements["counters"].items():
+            print(name, ":", value)
+        for name, entry in measurements["gauges"].items():
+            print(name, ": last", entry["last"], "max", entry["max"], "average", entry["average"])
+        if self.peak_memory is not None:
+            print("Peak memory :", self.peak_memory, "bytes")
+
+
+registry = Metrics()
+
+def timer(name, size=0):
+    """
+    timer: measures with block as stage in shared registry
+
+    :param name: name of stage (string)
+    :param size: number of symbols processed in block (int)
+    :return: returns context manager
+    """
+    return registry.timer(name, size)
+
+
+tree_debug = False
+
+def set_tree_debug(enabled):
+    """
+    set_tree_debug: turns drawing of Huffman tree while it is built on or off
+
+    :param enabled: draw tree (bool)
+    :return: returns nothing
+    """
+    global tree_debug
+    tree_debug = enabled
+
+def debug_tree(node, nodeString):
+    """
+    debug_tree: draws subtree when tree debugging is on, drawing is too slow for normal runs
+
+    :param node: root of subtree (Node)
+    :param nodeString: 'frequency' or 'code', value shown in nodes (string)
+    :return: returns nothing
+    """
+    if tree_debug:
+        node.display(nodeString)
+        print("\n\n")
@@ -0,0 +1,310 @@
+import os
+import sys
+import struct
+import hashlib
+import argparse
+from collections import Counter, OrderedDict
+from tables import DecodeTable, canonical_codes, code_strings, limited_code_lengths, symbol_frequency, \
+    symbol_value, join_symbols, code_lengths, is_byte_symbols, ENCODE_CHUNK, BYTE_SYMBOLS
+from tree import HuffmanTree
+from bits import BitWriter, as_reader
+from metrics import registry, timer
+from util import open_document
+
+"""
+Pre-trained Huffman models for many small documents.
+Model is trained once from sample corpus and saved to model directory, documents compressed with it
+store only model ID instead of code table and skip frequency pass, so compression is encode only.
+Model has one extra symbol, escape, for symbols that were not in sample: escape code is followed by
+code point of symbol in 21 bits (value of byte in 8 bits in bytes mode).
+Model ID is beginning of SHA-256 hash of saved model, loaded models are kept in LRU cache by ID
+together with their decode tables, so repeated decompression doesn't rebuild tables
+"""
+
+MODEL_DIRECTORY = "models"
+MODEL_EXTENSION = ".hufm"
+MODEL_MAGIC = b'HUFM'
+MODEL_VERSION = 1
+MODEL_HEADER = struct.Struct('>4sBBIB')
+MODEL_SYMBOL = struct.Struct('>IB')
+MODEL_BYTES = 1
+#number of bytes of SHA-256 hash used as model ID
+MODEL_ID_BYTES = 8
+MODEL_CACHE_SIZE = 32
+#bits of literal after escape, enough for every Unicode code point
+LITERAL_BITS = 21
+
+class Model:
+    def __init__(self, lengths, escape_length, binary=False):
+        """
+        Construct a new 'Model' object from code lengths of its symbols and of escape.
+
+        :param lengths: code length of every symbol of sample (dictionary)
+        :param escape_length: code length of escape (int)
+        :param binary: model of bytes, symbols are integers 0..255 (bool)
+        :return: returns nothing
+        """
+        self.lengths = lengths
+        self.escape_length = escape_length
+        self.binary = binary
+        self.literal_bits = 8 if binary else LITERAL_BITS
+        #escape sorts before every symbol, so it gets first code of its length
+        escape = -1 if binary else ''
+        self.codes = canonical_codes({escape: escape_length, **lengths})
+        self.escape_code = self.codes.pop(escape)
+        self.data = self.to_bytes()
+        self.id = hashlib.sha256(self.data).hexdigest()[:2 * MODEL_ID_BYTES]
+        self.strings = None
+        self.table = None
+        self.lookup = None
+
+    def __getstate__(self):
+        #tables are rebuilt by process that receives model
+        return {**self.__dict__, "strings": None, "table": None, "lookup": None}
+
+    def to_bytes(self):
+        """
+        to_bytes: serializes model, header is followed by code point and code length of every symbol
+
+        :return: returns serialized model (bytes)
+        """
+        data = bytearray(MODEL_HEADER.pack(MODEL_MAGIC, MODEL_VERSION, MODEL_BYTES if self.binary else 0,
+                                           len(self.lengths), self.escape_length))
+        for c in sorted(self.lengths, key=symbol_value):
+            data += MODEL_SYMBOL.pack(symbol_value(c), self.lengths[c])
+        return bytes(data)
+
+    def escape_string(self, c):
+        """
+        escape_string: returns bits of symbol that is not in model, escape code followed by literal
+
+        :param c: symbol (char or int)
+        :return: returns bits of escaped symbol, example : '0001000001' (string)
+        """
+        value, length = self.escape_code
+        return format(value, '0{}b'.format(length)) + format(symbol_value(c), '0{}b'.format(self.literal_bits))
+
+    def encode(self, string):
+        """
+        encode: encodes text or bytes with model, symbols that are not in model are escaped
+
+        :param string: input text or binary data (string or bytes)
+        :return: returns encoded data (BitWriter) and true if some symbol was escaped (tuple)
+        """
+        if self.strings is None:
+            self.strings = code_strings(self.codes)
+        strings = self.strings
+        escaped = not set(string).issubset(self.codes)
+        if (escaped):
+            if (self.binary):
+                strings = [strings[b] if b in strings else self.escape_string(b) for b in range(BYTE_SYMBOLS)]
+            else:
+                strings = dict(strings)
+                for c in set(string).difference(self.codes):
+                    strings[c] = self.escape_string(c)
+        writer = BitWriter()
+        for i in range(0, len(string), ENCODE_CHUNK):
+            bits = ''.join(map(strings.__getitem__, string[i:i + ENCODE_CHUNK]))
+            if bits:
+                writer.write(int(bits, 2), len(bits))
+        return writer, escaped
+
+    def decode_table(self, escaped=False):
+        """
+        decode_table: returns decoder of model, byte table is built once and cached with model
+        Data with escapes is decoded by model itself, one bit at a time
+
+        :param escaped: encoded data contains escapes (bool)
+        :return: returns decoder (DecodeTable or Model)
+        """
+        if (escaped):
+            return self
+        if self.table is None:
+            self.table = DecodeTable(self.codes)
+        return self.table
+
+    def decode(self, encoded, length):
+        """
+        decode: converts encoded data with escapes to original form
+
+        :param encoded: encoded data (BitReader or BitWriter)
+        :param length: number of encoded symbols (int)
+        :return: returns original text (string or bytes)
+        """
+        if self.lookup is None:
+            self.lookup = {code: c for c, code in self.codes.items()}
+            self.lookup[self.escape_code] = None
+        lookup = self.lookup
+        reader = as_reader(encoded)
+        decoded = []
+        code = 0
+        code_length = 0
+        while len(decoded) < length:
+            code = (code << 1) | reader.read_bit()
+            code_length += 1
+            if (code, code_length) not in lookup:
+                continue
+            c = lookup[(code, code_length)]
+            if c is None:
+                value = reader.read(self.literal_bits)
+                c = value if self.binary else chr(value)
+            decoded.append(c)
+            code = 0
+            code_length = 0
+        return join_symbols(decoded) if decoded else (b'' if self.binary else '')
+
+
+def model_from_bytes(data):
+    """
+    model_from_bytes: converts bytes written with Model.to_bytes back to model
+
+    :param data: serialized model (bytes)
+    :return: returns model (Model)
+    """
+    magic, version, flags, symbols, escape_length = MODEL_HEADER.unpack_from(data, 0)
+    if (magic != MODEL_MAGIC or version != MODEL_VERSION):
+        raise IOError("File is not Huffman model!")
+    binary = bool(flags & MODEL_BYTES)
+    lengths = {}
+    for i in range(symbols):
+        value, length = MODEL_SYMBOL.unpack_from(data, MODEL_HEADER.size + i * MODEL_SYMBOL.size)
+        lengths[value if binary else chr(value)] = length
+    return Model(lengths, escape_length, binary)
+
+def escape_model(codes):
+    """
+    escape_model: builds model with escape from code table of container, used for blocks appended to container
+    that contain symbols which are not in its code table
+    Last symbol of longest code length is moved one bit deeper and escape takes its place next to it,
+    so code lengths of all other symbols stay the same
+
+    :param codes: code table of container (dictionary)
+    :return: returns model (Model)
+    """
+    if not codes:
+        raise ValueError("Code table is empty!")
+    lengths = code_lengths(codes)
+    longest = max(lengths.values())
+    last = max(c for c in lengths if lengths[c] == longest)
+    lengths[last] = longest + 1
+    return Model(lengths, longest + 1, is_byte_symbols(codes))
+
+def train_model(samples, binary=False, max_length=None):
+    """
+    train_model: builds model from frequencies of symbols in sample documents
+    Escape gets frequency of symbols seen only once in sample, they estimate how often new symbols appear
+
+    :param samples: sample documents (list of strings or bytes)
+    :param binary: samples are bytes (bool)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :return: returns model (Model)
+    """
+    frequency = Counter()
+    for sample in samples:
+        frequency.update(symbol_frequency(sample))
+    if not frequency:
+        raise ValueError("Sample is empty!")
+    escape = -1 if binary else ''
+    frequency = dict(frequency)
+    frequency[escape] = max(1, sum(1 for count in frequency.values() if count == 1))
+    if (max_length is not None):
+        lengths = limited_code_lengths(frequency, max_length)
+    else:
+        lengths = HuffmanTree(frequency).code_lengths()
+    escape_length = lengths.pop(escape)
+    return Model(lengths, escape_length, binary)
+
+def train_files(file_names, binary=False, max_length=None):
+    """
+    train_files: builds model from sample files, directories are replaced with files in them
+
+    :param file_names: names of sample files or directories (list)
+    :param binary: read samples as bytes (bool)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :return: returns model (Model)
+    """
+    files = []
+    for file_name in file_names:
+        if os.path.isdir(file_name):
+            files += sorted(os.path.join(file_name, name) for name in os.listdir(file_name)
+                            if os.path.isfile(os.path.join(file_name, name)))
+        else:
+            files.append(file_name)
+
+    def samples():
+        for file_name in files:
+            with open_document(file_name, binary=binary) as reader:
+                yield reader.read()
+
+    with timer('train'):
+        return train_model(samples(), binary, max_length)
+
+def model_file_name(model_id, directory=MODEL_DIRECTORY):
+    """
+    model_file_name: returns name of file of model with given ID
+
+    :param model_id: model ID (string)
+    :param directory: model directory (string)
+    :return: returns name of model file (string)
+    """
+    return os.path.join(directory, model_id + MODEL_EXTENSION)
+
+def save_model(model, directory=MODEL_DIRECTORY):
+    """
+    save_model: writes model to model directory, file is named by model ID
+
+    :param model: model (Model)
+    :param directory: model directory, created if it doesn't exist (string)
+    :return: returns model ID (string)
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(model_file_name(model.id, directory), "wb") as writer:
+        writer.write(model.data)
+    return model.id
+
+
+model_cache = OrderedDict()
+
+def load_model(model_id, directory=MODEL_DIRECTORY):
+    """
+    load_model: returns model with given ID, model is read from model directory only when it is not in cache
+    Cache keeps MODEL_CACHE_SIZE most recently used models
+
+    :param model_id: model ID (string)
+    :param directory: model directory (string)
+    :return: returns model (Model)
+    """
+    if model_id in model_cache:
+        model_cache.move_to_end(model_id)
+        registry.add('model_cache_hits')
+        return model_cache[model_id]
+    with open(model_file_name(model_id, directory), "rb") as reader:
+        model = model_from_bytes(reader.read())
+    if (model.id != model_id):
+        raise IOError("Model file does not match model ID!")
+    registry.add('model_cache_misses')
+    model_cache[model_id] = model
+    if (len(model_cache) > MODEL_CACHE_SIZE):
+        model_cache.popitem(last=False)
+    return model
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Training of Huffman models from sample documents")
+    parser.add_argument("file_names", nargs="+", help="sample documents or directories with them")
+    parser.add_argument("--bytes", action="store_true", help="train model of bytes, for binary files and images")
+    parser.add_argument("--model-dir", default=MODEL_DIRECTORY, help="directory to which model is saved")
+    parser.add_argument("--max-code-length", type=int, default=None, help="limit length of model codes")
+    return parser.parse_args()
+
+def start():
+    if len(sys.argv) == 1:
+        print("[ERROR] Path to sample documents is required.")
+        sys.exit()
+    args = parse_arguments()
+    model = train_files(args.file_names, args.bytes, args.max_code_length)
+    save_model(model, args.model_dir)
+    print("Symbols in model: ", len(model.codes))
+    print("Model: ", model.id)
+
+if __name__ == '__main__':
+    start()
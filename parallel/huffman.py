@@ -1,10 +1,15 @@
-import heapq
-import time
 from collections import Counter
 from multiprocessing import *
+from multiprocessing import shared_memory
 import sys
 sys.path.append('../../NTP')
 from util import calculate_time
+from metrics import debug_tree
+from executor import get_executor
+from tables import decode_with_table, empty_symbols, code_points, np, encode_with_table, encode_vectorized, \
+    join_symbols, ENCODE_CHUNK
+from bits import BitWriter, as_reader
+from tree import HuffmanTree
 
 
 """
@@ -16,6 +21,8 @@ Codes are generated after tree is built and saved to global dictionary named cod
 """
 
 class Node:
+    __slots__ = ('left', 'right', 'char', 'frequency', 'code', 'level')
+
     def __init__(self, left=None, right=None, char=None, frequency=0, code='', level=0):
         """
         Construct a new 'Node' object.
@@ -96,7 +103,7 @@ class Node:
         is_leaf checks if node is has children or no
         :return: true or false weather node is leaf
         """
-        return self.left == None and self.right == None
+        return self.left is None and self.right is None
 
     def __lt__(self, other):
         """
@@ -109,90 +116,130 @@ class Node:
         """
         generate_codes generate huffman code for each node in tree, after tree is built,
         changes attribute code of each node in tree
-        all codes are saved to global dict named codes
+        tree is walked with stack instead of recursion, so deep trees don't reach recursion limit
         :return: return nothing
         """
-        if (self.char):
-            return
-        else:
-            self.left.code = self.code + '0'
-            self.right.code = self.code + '1'
-            self.left.generate_codes()
-            self.right.generate_codes()
-            self.display('code')
-            print("\n\n")
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if not node.is_leaf():
+                node.left.code = node.code + '0'
+                node.right.code = node.code + '1'
+                stack.append(node.right)
+                stack.append(node.left)
+        debug_tree(self, 'code')
 
 
-def chunks(lst, n):
-    list =  []
-    for i in range(0, len(lst), n):
-        list.append(lst[i:i + n])
-    return list
-
 @calculate_time
 def get_frequency(string):
     """
     calc_frequencies: calculates frequency of every character in given string in parallel
-    Divides given text into CHUNK_NUMBER parts and calcs frequencies for each chunk in parallel
-    Combining result is sequential
-
-    :param string: input text  (string)
+    Backend is chosen by executor: short strings are counted in one vectorized pass,
+    for long strings code points are written to shared memory part by part, without array of whole string
+    in this process, each process of persistent pool
+    counts its own range of shared array with numpy histogram and returns fixed size count array, arrays are summed
+    Without numpy characters are counted with Counter
+    Binary data is counted as array of bytes, keys of frequency are byte values
+
+    :param string: input text or binary data (string or bytes)
     :return: returns frequency of every char in string (dictionary)
     """
-    size = len(string)
-    n = size // cpu_count()
-    if (n == 0 ):
-        n = size
-    string_parts = chunks(string, size)
-
-    with Pool() as pool:
-        counters = pool.map(count_frequency, string_parts)
-    frequency = Counter({})
-    for counter in counters:
-        frequency += counter
+    if np is None:
+        return count_frequency(string)
+    executor = get_executor()
+    backend, parts = executor.choose(len(string))
+    if (backend == 'serial'):
+        symbols = code_points(string)
+        counts, = executor.map('count', np.bincount, [symbols], backend, len(symbols))
+        return counts_to_frequency(counts, symbols.dtype == np.uint8)
+
+    binary = not isinstance(string, str)
+    dtype = '|u1' if binary else '<u4'
+    memory = shared_memory.SharedMemory(create=True, size=len(string) * np.dtype(dtype).itemsize)
+    try:
+        symbols = np.ndarray((len(string),), dtype=dtype, buffer=memory.buf)
+        if (binary):
+            memory.buf[:len(string)] = string
+        else:
+            #only one part of text is encoded to code points at a time
+            for i in range(0, len(string), ENCODE_CHUNK):
+                symbols[i:i + ENCODE_CHUNK] = code_points(string[i:i + ENCODE_CHUNK])
+        size = int(symbols.max()) + 1
+        del symbols
+        n = len(string) // parts + 1
+        ranges = [(memory.name, len(string), i, min(i + n, len(string)), size, dtype)
+                  for i in range(0, len(string), n)]
+        counts = sum(executor.map('count', count_shared_range, ranges, backend, len(string)))
+    finally:
+        memory.close()
+        memory.unlink()
+    return counts_to_frequency(counts, binary)
+
+def count_shared_range(name, length, start, end, size, dtype='<u4'):
+    """
+    count_shared_range: counts code points in one range of shared array, runs in worker process
+
+    :param name: name of shared memory block with code points (string)
+    :param length: number of code points in shared memory (int)
+    :param start: index of first code point in range (int)
+    :param end: index after last code point in range (int)
+    :param size: length of count array, larger than every code point (int)
+    :param dtype: type of shared array, 32 bit code points or bytes (string)
+    :return: returns count of every code point in range (numpy array)
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        symbols = np.ndarray((length,), dtype=dtype, buffer=memory.buf)
+        counts = np.bincount(symbols[start:end], minlength=size)
+        del symbols
+    finally:
+        memory.close()
+    return counts
+
+def counts_to_frequency(counts, binary=False):
+    """
+    counts_to_frequency: converts array of counts indexed by code point to frequency dictionary
 
-    return frequency
+    :param counts: count of every code point (numpy array)
+    :param binary: counts are indexed by byte value, keys stay integers (bool)
+    :return: returns frequency of every char (dictionary)
+    """
+    if (binary):
+        return {int(i): int(counts[i]) for i in np.flatnonzero(counts)}
+    return {chr(i): int(counts[i]) for i in np.flatnonzero(counts)}
 
 def count_frequency(string_part):
     """
     calc_frequencies: calculates frequency of every character in given string part
 
-    :param string: part of input text  (string)
+    :param string: part of input text or binary data (string or bytes)
     :return: returns frequency of every char in given string part (Counter)
     """
-    frequency = Counter({})
-    for c in string_part:
-        if c in frequency.keys():
-            frequency[c] += 1
-        else:
-            frequency[c] = 1
-
-    return frequency
+    if np is None:
+        return Counter(string_part)
+    return Counter(counts_to_frequency(np.bincount(code_points(string_part)), not isinstance(string_part, str)))
 
 @calculate_time
 def build_huffman_tree(string):
     """
     build_huffman_tree creates huffman tree for given string,
-    uses heap implementation of priority queue
+    uses two queue construction from sorted frequencies
 
-    :param string: input text for compression (string)
+    :param string: input text or binary data for compression (string or bytes)
     :return: returns root of huffman tree (Node)
     """
     frequency = get_frequency(string)
-    heap = []
-    for c in frequency.keys():
-        root = Node(None, None, c, frequency[c])
-        heapq.heappush(heap, root)
-    while len(heap) > 1:
-        smallest = heapq.heappop(heap)
-        second_smallest = heapq.heappop(heap)
-        root = Node(smallest, second_smallest, None, smallest.frequency + second_smallest.frequency)
-        
-        heapq.heappush(heap, root)
-        root.display('frequency')
-        print('\n\n')
-  
-    return heapq.heappop(heap)
+    return build_tree_from_frequency(frequency)
+
+def build_tree_from_frequency(frequency):
+    """
+    build_tree_from_frequency creates huffman tree from already counted frequencies,
+    tree is built in arrays with two queue algorithm and converted to nodes
+
+    :param frequency: frequency of every char in document (dictionary)
+    :return: returns root of huffman tree (Node)
+    """
+    return HuffmanTree(frequency).to_nodes(Node)
 
 def find_code(tree, c):
     if (tree.is_leaf()):
@@ -212,51 +259,89 @@ def encode(string, tree):
     """
     encode : encode given string from codes dictionary
 
-    :param string: input text for compression (string)
-    :return: returns encoded string (string)
+    :param string: input text or binary data for compression (string or bytes)
+    :return: returns encoded data (BitWriter)
     """
-    list = []
+    writer = BitWriter()
     for c in string:
-        list.append(find_code(tree, c))
-    return ''.join(list)
+        code = find_code(tree, c)
+        if code:
+            writer.write(int(code, 2), len(code))
+    return writer
+
+def encode_part(string_part, codes, vectorized=False):
+    """
+    encode_part: encodes one part of text, code table is loaded once in each worker
+
+    :param string_part: part of input text (string)
+    :param codes: code table, codes[char] = (code value, code length) (Shared)
+    :param vectorized: encode part with numpy (bool)
+    :return: returns packed encoded bytes and number of bits in them (tuple)
+    """
+    if (vectorized and np is not None):
+        return encode_vectorized(string_part, codes.get())
+    encoded = encode_with_table(string_part, codes.get())
+    return encoded.getvalue(), len(encoded)
 
-def decode_timer(tree, encoded, index=0, length=0):
-    return decode(tree, encoded, index, length)
+def encode_model_part(string_part, model):
+    """
+    encode_model_part: encodes one part of text with pre-trained model, model is loaded once in each worker
 
-def decode(tree, encoded, index = 0, length = 0):
+    :param string_part: part of input text (string)
+    :param model: pre-trained model (Shared)
+    :return: returns packed encoded bytes, number of bits in them and true if some symbol was escaped (tuple)
     """
-    decode: finds sequence in encoded string that represents one character
+    encoded, escaped = model.get().encode(string_part)
+    return encoded.getvalue(), len(encoded), escaped
+
+def decode_timer(tree, encoded, length=0):
+    return decode(tree, encoded, length)
+
+def decode(tree, encoded, length = 0):
+    """
+    decode: reads sequence of bits that represents one character
     Finds path from root to leaf in tree
 
     :param tree: root of Huffman tree (Node)
-    :param encoded: encoded representation of text (string)
-    :param index: index of current character in text (int)
-    :param length: length of char sequence that represents one Huffman code (int)
-    :return: returns one character (char)
+    :param encoded: encoded data, cursor is at first bit of character code (BitReader)
+    :param length: length of bit sequence that represents one Huffman code (int)
+    :return: returns one character (char) and length of its code (int)
     """
-    if len(encoded) == 0:
-        return
     if tree.is_leaf():
         return tree.char, length
-    elif encoded[index] == '0':
-        return decode(tree.left, encoded, index + 1, length + 1)
-    elif encoded[index] == '1':
-        return decode(tree.right, encoded, index + 1, length + 1)
+    elif encoded.read_bit():
+        return decode(tree.right, encoded, length + 1)
+    else:
+        return decode(tree.left, encoded, length + 1)
 
 @calculate_time
-def get_original(tree, encoded):
+def get_original(tree, encoded, decoder='table', length=None):
     """
     get_original: convert encoded document to original form
+    Tree with one leaf has code of zero bits, so number of characters can't be read from encoded data,
+    it is taken from frequency of root, which counts all characters of document
 
     :param tree: root of Huffman tree (Node)
-    :param encoded: encoded representation of text (string)
-    :return: returns original text (string)
+    :param encoded: encoded data (BitWriter or BitReader)
+    :param decoder: 'table' decodes one byte per step with lookup table,
+    'recursive' decodes one character at a time with decode (string)
+    :param length: number of encoded characters, frequency of root if not given (int)
+    :return: returns original text, bytes when tree was built from bytes (string or bytes)
     """
+    if length is None:
+        length = tree.frequency
+    if (decoder == 'table'):
+        return decode_with_table(tree, encoded, length=length)
+    if (decoder != 'recursive'):
+        raise ValueError("Decoder is not correct!")
+    if (tree.is_leaf()):
+        return join_symbols([tree.char] * length) if length else empty_symbols([tree.char])
+
+    reader = as_reader(encoded)
     decoded = []
-    while(len(encoded) > 0):
-        char, lenght = decode_timer(tree, encoded)
-        encoded = encoded[lenght: ]
+    while(reader.remaining() > 0):
+        char, lenght = decode_timer(tree, reader)
         decoded.append(char)
 
-    return ''.join(decoded)
+    return join_symbols(decoded)
 
@@ -1,10 +1,18 @@
 from multiprocessing import *
-import time
 import platform
 import sys
+from collections import Counter
 sys.path.append('../../NTP')
 from util import *
 from huffman import *
+from tables import build_code_table, build_codes_from_frequency
+from bits import BitWriter
+from stream import compress_stream, CHUNK_SIZE
+from container import ContainerWriter, block_checksum, BLOCK_SIZE
+from metrics import registry, timer
+from tokens import tokenize_text, split_tokens
+from cli import start as start_cli
+from executor import get_executor
 
 @calculate_time
 def generate_codes_timer(tree):
@@ -14,50 +22,141 @@ def generate_codes_timer(tree):
 def convert_tree_to_bytes_timer(tree):
     return convert_tree_to_bytes(tree)
 
-def chunks(lst, n, tree):
+def chunks(lst, n, *args):
     list =  []
     for i in range(0, len(lst), n):
-        list.append((lst[i:i + n], tree))
+        list.append((lst[i:i + n], *args))
     return list
 
 @calculate_time
-def encode_huffman(string):
-    tree = build_huffman_tree(string)
-    generate_codes_timer(tree)
-    encoded_tree = convert_tree_to_bytes_timer(tree)
+def encode_huffman(string, encoder='table'):
+    """
+    encode_huffman: builds Huffman tree for given string and encodes parts of string in parallel
+    Executor chooses serial, thread or process backend and number of parts from size of string,
+    workers receive code table once and return packed bytes with their bit length,
+    parts are joined with bit shifted concatenation
+
+    :param string: input text or binary data for compression (string or bytes)
+    :param encoder: 'table' maps characters through precomputed code table,
+    'vectorized' encodes each part with numpy, 'search' finds code of every character in tree (string)
+    :return: returns encoded data (BitWriter), tree, number of bits in last byte of tree and encoded tree (tuple)
+    """
+    with timer('count', len(string)):
+        frequency = get_frequency(string)
+    with timer('build'):
+        tree = build_tree_from_frequency(frequency)
+        generate_codes_timer(tree)
+    with timer('serialize'):
+        encoded_tree = convert_tree_to_bytes_timer(tree)
     r = len(encoded_tree) % 8
-    string_parts = chunks(string, len(string)//cpu_count(), tree)
- 
-    with Pool() as pool:
-        results = pool.starmap(encode, string_parts)   
-    
-    return ''.join(results), tree, r, encoded_tree
+    executor = get_executor()
+    backend, parts = executor.choose(len(string), encoder == 'vectorized')
+    n = max(1, len(string)//parts)
+    encoded = BitWriter()
+    with timer('encode', len(string)):
+        if (encoder == 'search'):
+            results = executor.map('encode', encode, chunks(string, n, tree), backend, len(string))
+            for part in results:
+                encoded.extend(part)
+        else:
+            with executor.share(build_code_table(tree)) as codes:
+                string_parts = [(string[i:i + n], codes, encoder == 'vectorized') for i in range(0, len(string), n)]
+                results = executor.map('encode', encode_part, string_parts, backend, len(string))
+            for data, length in results:
+                encoded.write_bytes(data, length)
+    return encoded, tree, r, encoded_tree
 
-def start():
-    if len(sys.argv) == 1:
-        print("[ERROR] Path to txt document is required.")
-        sys.exit()
+@calculate_time
+def compress(string, output_file_name, encoder='table', block_size=BLOCK_SIZE, canonical=True,
+             max_length=None, alphabet="chars"):
+    """
+    compress: builds Huffman tree for given string and writes string to container
+    Blocks are encoded in parallel when string is large enough, each block is independently decodable
+
+    :param string: input text or binary data for compression (string or bytes)
+    :param output_file_name: name of container file (string)
+    :param encoder: 'table' maps characters through precomputed code table,
+    'vectorized' encodes each block with numpy (string)
+    :param block_size: number of characters in one block (int)
+    :param canonical: use canonical codes, only code lengths are stored in container (bool)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :param alphabet: 'chars' codes every character, 'words' or 'ngrams' code tokens of text, see tokens (string)
+    :return: returns code table, codes[char] = (code value, code length) (dictionary)
+    """
+    tokens = alphabet != "chars" and isinstance(string, str)
+    symbols = tokenize_text(string, alphabet) if tokens else string
+    with timer('count', len(string)):
+        frequency = Counter(symbols) if tokens else get_frequency(string)
+    with timer('build'):
+        codes = build_codes_from_frequency(frequency, canonical, max_length)
+    registry.add('input_symbols', len(string))
+    if (tokens):
+        blocks = split_tokens(symbols, block_size)
     else:
-        file_name = sys.argv[1]
+        blocks = [(string[i:i + block_size],) * 2 for i in range(0, len(string), block_size)]
+    vectorized = encoder == 'vectorized' and not tokens
 
-    print("Compressing file: ", file_name)
-    output_file_name = file_name.replace(".txt", "") + "_compressed_"
-    with open(file_name, "r") as reader:
-        document = reader.read()
+    executor = get_executor()
+    backend, parts = executor.choose(len(string), vectorized)
+    with timer('encode', len(string)):
+        with executor.share(codes) as shared:
+            results = executor.map('encode', encode_part, [(block, shared, vectorized) for block, text in blocks],
+                                   backend, len(string))
 
-    start_time = time.time()
-    encoded, tree,  r, encoded_tree = encode_huffman(document)
+    with ContainerWriter(output_file_name, codes, block_size) as writer:
+        for (block, text), (data, length) in zip(blocks, results):
+            writer.add_block(BitWriter.from_bytes(data, length), len(text), block_checksum(text))
+    return codes
 
-    save(output_file_name, r, encoded_tree, encoded)
+def compress_with_model(string, output_file_name, model, block_size=BLOCK_SIZE):
+    """
+    compress_with_model: encodes string with pre-trained model and writes it to container with ID of model
+    Frequencies are not counted and no code table is built or stored, compression is encode only,
+    blocks are encoded in parallel when string is large enough
 
-    original = get_original(tree, encoded)
+    :param string: input text or binary data for compression (string or bytes)
+    :param output_file_name: name of container file (string)
+    :param model: pre-trained model (Model)
+    :param block_size: number of characters in one block (int)
+    :return: returns code table of model, codes[char] = (code value, code length) (dictionary)
+    """
+    registry.add('input_symbols', len(string))
+    blocks = [string[i:i + block_size] for i in range(0, len(string), block_size)]
 
-    if (original == document):
-        print("MATCHES")
-    else:
-        print("ERROR")
-    duration = time.time() - start_time
-    print(f"Duration {duration} seconds")
+    executor = get_executor()
+    backend, parts = executor.choose(len(string))
+    with timer('encode', len(string)):
+        with executor.share(model) as shared:
+            results = executor.map('encode', encode_model_part, [(block, shared) for block in blocks],
+                                   backend, len(string))
+
+    with ContainerWriter(output_file_name, None, block_size, model) as writer:
+        for block, (data, length, escaped) in zip(blocks, results):
+            writer.add_block(BitWriter.from_bytes(data, length), len(block), block_checksum(block), escaped)
+    return model.codes
+
+def compress_file(file_name, chunk_size=CHUNK_SIZE, canonical=True, max_length=None, binary=False):
+    """
+    compress_file: compresses txt document in stream mode, with memory bounded by chunk size
+    Each batch of chunks, one per worker, is counted and encoded in parallel when chunks are large enough
+
+    :param file_name: path to txt document (string)
+    :param chunk_size: number of characters read and encoded at once by one process (int)
+    :param canonical: use canonical codes, only code lengths are stored in container (bool)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :param binary: compress file as bytes, for binary files and images (bool)
+    :return: returns name of written file (string)
+    """
+    build = lambda frequency: build_codes_from_frequency(frequency, canonical, max_length)
+    output_file_name = file_name.replace(".txt", "") + "_compressed.bin"
+    executor = get_executor()
+    backend, parts = executor.choose(chunk_size * executor.workers)
+    map = lambda func, items: executor.map('stream', func, items, backend)
+    compress_stream(file_name, output_file_name, build, count_frequency, map, parts, chunk_size, binary)
+    return output_file_name
+
+def start():
+    start_cli(get_frequency, compress, compress_with_model, compress_file, parallel=True)
     print("Processor", platform.processor(), "2,6 GHz 6-Core Intel Core i7")
 
 if __name__ == '__main__':
@@ -0,0 +1,175 @@
+import io
+import os
+import time
+import threading
+from queue import Queue, Empty
+from collections import deque
+from tables import encode_with_table, build_codes_from_frequency, symbol_frequency
+from bits import BitWriter
+from stream import read_chunks, count_file_frequency
+from container import ContainerWriter, pack_local_table, block_checksum, BLOCK_SIZE
+from executor import get_executor
+from metrics import registry, timer
+
+"""
+Pipelined compression: reading, encoding and writing of blocks overlap instead of running one after another.
+    reader - thread reads fixed size blocks and puts them to bounded queue
+    encoders - blocks are submitted to executor (serial, thread or process backend) as soon as they are read
+    writer - encoded blocks are written to container in order in which they were read
+At most `depth` blocks wait in queue and at most `depth` blocks are encoded at once, so reader stops
+when encoding is behind and memory use depends only on block size and depth.
+With local tables every block is encoded with code table built from its own frequencies and
+stored before the block, so there is no counting pass over whole file and blocks of different
+kind (for example logs of different services) get their own codes.
+Time spent waiting for reader and for encoders is recorded as 'pipeline.read_wait' and 'pipeline.encode_wait'
+"""
+
+#end of blocks in reader queue
+END = None
+
+def block_codes(block, max_length=None):
+    """
+    block_codes: builds canonical code table from frequencies of one block
+
+    :param block: text or binary data of block (string or bytes)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :return: returns code table of block (dictionary)
+    """
+    return build_codes_from_frequency(symbol_frequency(block), True, max_length)
+
+def compress_document(document, block_size=BLOCK_SIZE):
+    """
+    compress_document: compresses document to container in memory
+
+    :param document: text or binary data (string or bytes)
+    :param block_size: number of symbols in one block (int)
+    :return: returns container (bytes)
+    """
+    codes = block_codes(document) if document else {}
+    output = io.BytesIO()
+    with ContainerWriter(output, codes, block_size, binary=isinstance(document, bytes)) as writer:
+        for i in range(0, len(document), block_size):
+            block = document[i:i + block_size]
+            writer.add_block(encode_with_table(block, codes), len(block), block_checksum(block))
+    return output.getvalue()
+
+def encode_pipeline_block(block, codes=None, max_length=None):
+    """
+    encode_pipeline_block: encodes one block, with local table codes are built from block itself
+
+    :param block: text or binary data of block (string or bytes)
+    :param codes: code table of whole file, None for local table (Shared)
+    :param max_length: maximal code length of local table (int)
+    :return: returns packed local table (empty without local table), packed bytes, number of bits
+    and checksum of block (tuple)
+    """
+    table = b''
+    if codes is None:
+        codes = block_codes(block, max_length)
+        table = pack_local_table(codes)
+    else:
+        codes = codes.get()
+    encoded = encode_with_table(block, codes)
+    return table, encoded.getvalue(), len(encoded), block_checksum(block)
+
+def read_into(blocks, file_name, block_size, binary, stop):
+    """
+    read_into: reads file block by block into queue, runs in reader thread
+    Error is put to queue instead of block, so it is raised in thread that takes blocks
+
+    :param blocks: bounded queue of blocks (Queue)
+    :param file_name: name of input file (string)
+    :param block_size: number of characters in one block (int)
+    :param binary: read file as bytes (bool)
+    :param stop: set when blocks are no longer taken from queue, reader stops before next block (Event)
+    :return: returns nothing
+    """
+    try:
+        for chunks in read_chunks(file_name, block_size, 1, binary):
+            if stop.is_set():
+                return
+            blocks.put(chunks[0])
+        blocks.put(END)
+    except Exception as error:
+        blocks.put(error)
+
+def stop_reader(reader, blocks, stop):
+    """
+    stop_reader: stops reader thread and waits for it, queue is emptied so reader blocked on full queue can continue
+
+    :param reader: reader thread (Thread)
+    :param blocks: bounded queue of blocks (Queue)
+    :param stop: event checked by reader before every block (Event)
+    :return: returns nothing
+    """
+    stop.set()
+    while reader.is_alive():
+        try:
+            blocks.get(timeout=0.01)
+        except Empty:
+            pass
+    reader.join()
+
+def compress_pipeline(file_name, output_file_name, local=True, block_size=BLOCK_SIZE, max_length=None,
+                      binary=False, parallel=True, depth=None):
+    """
+    compress_pipeline: compresses file with overlapping read, encode and write stages
+    Without local tables frequencies of whole file are counted first and only encoding is pipelined
+
+    :param file_name: name of input file (string)
+    :param output_file_name: name of output container file (string)
+    :param local: every block gets code table built from its own frequencies (bool)
+    :param block_size: number of characters in one block (int)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :param binary: compress file as bytes, for binary files and images (bool)
+    :param parallel: encode blocks with executor workers, otherwise blocks are encoded in this thread (bool)
+    :param depth: number of blocks waiting in queue and being encoded, twice number of workers if not given (int)
+    :return: returns number of written blocks (int)
+    """
+    executor = get_executor()
+    backend, parts = executor.choose(os.path.getsize(file_name)) if parallel else ('serial', 1)
+    depth = depth or 2 * executor.workers
+    codes = None
+    if (not local):
+        with timer('count'):
+            frequency = count_file_frequency(file_name, symbol_frequency, chunk_size=block_size, binary=binary)
+        with timer('build'):
+            codes = executor.share(build_codes_from_frequency(frequency, True, max_length))
+
+    blocks = Queue(depth)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_into, args=(blocks, file_name, block_size, binary, stop), daemon=True)
+    reader.start()
+    pending = deque()
+    try:
+        with ContainerWriter(output_file_name, None if local else codes.get(), block_size, binary=binary) as writer:
+            def write_oldest():
+                length, result = pending.popleft()
+                begin = time.perf_counter()
+                table, data, bits, checksum = result.get()
+                registry.record('pipeline.encode_wait', time.perf_counter() - begin)
+                writer.add_block(BitWriter.from_bytes(data, bits), length, checksum, table=table)
+
+            with timer('pipeline.' + backend):
+                while True:
+                    begin = time.perf_counter()
+                    block = blocks.get()
+                    registry.record('pipeline.read_wait', time.perf_counter() - begin)
+                    if isinstance(block, Exception):
+                        raise block
+                    if block is END:
+                        break
+                    registry.add('input_symbols', len(block))
+                    pending.append((len(block), executor.submit(encode_pipeline_block, (block, codes, max_length),
+                                                                backend)))
+                    if (len(pending) >= depth):
+                        write_oldest()
+                while pending:
+                    write_oldest()
+            blocks_written = len(writer.index)
+    finally:
+        #on error reader can be blocked on full queue and shared code table must still be removed
+        stop_reader(reader, blocks, stop)
+        if codes is not None:
+            codes.close()
+    return blocks_written
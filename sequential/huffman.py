@@ -1,7 +1,10 @@
-import heapq
 import sys
 sys.path.append('../../NTP')
 from util import calculate_time
+from metrics import debug_tree
+from tables import decode_with_table, empty_symbols, byte_frequency, join_symbols
+from bits import BitWriter, as_reader
+from tree import HuffmanTree
 
 """
 Huffman coding tree represented with Node class
@@ -9,6 +12,8 @@ For leaf left, right and frequency fields are set to None
 Non leaft nodes have char and frequency fields set to None
 """
 class Node:
+    __slots__ = ('left', 'right', 'char', 'frequency', 'code')
+
     def __init__(self, left=None, right=None, char=None, frequency=0, code=''):
         """
         Construct a new 'Node' object.
@@ -31,7 +36,7 @@ class Node:
         is_leaf checks if node is has children or no
         :return: true or false weather node is leaf
         """
-        return self.left == None and self.right == None
+        return self.left is None and self.right is None
 
     def __lt__(self, other):
         """
@@ -44,18 +49,18 @@ class Node:
         """
         generate_codes generate huffman code for each node in tree, after tree is built,
         changes attribute code of each node in tree
-        all codes are saved to global dict named codes
+        tree is walked with stack instead of recursion, so deep trees don't reach recursion limit
         :return: return nothing
         """
-        if (self.char):
-            return
-        else:
-            self.left.code = self.code + '0'
-            self.right.code = self.code + '1'
-            self.left.generate_codes()
-            self.right.generate_codes()
-            self.display('code')
-            print("\n\n")
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if not node.is_leaf():
+                node.left.code = node.code + '0'
+                node.right.code = node.code + '1'
+                stack.append(node.right)
+                stack.append(node.left)
+        debug_tree(self, 'code')
 
     def display(self, nodeString):
         lines, *_ = self._display_aux(nodeString)
@@ -118,10 +123,13 @@ class Node:
 def get_frequency(string):
     """
     calc_frequencies: calculates frequency of every character in given string
+    Binary data is counted in fixed array of 256 counters, keys are byte values
 
-    :param string: input text  (string)
+    :param string: input text or binary data (string or bytes)
     :return: returns frequency of every char in string (dictionary)
     """
+    if not isinstance(string, str):
+        return byte_frequency(string)
     frequency = {}
     for c in string:
         if c in frequency.keys():
@@ -134,26 +142,23 @@ def get_frequency(string):
 def build_huffman_tree(string):
     """
     build_huffman_tree creates huffman tree for given string,
-    uses heap implementation of priority queue
+    uses two queue construction from sorted frequencies
 
-    :param string: input text for compression (string)
+    :param string: input text or binary data for compression (string or bytes)
     :return: returns root of huffman tree (Node)
     """
     frequency = get_frequency(string)
-    heap = []
-    for c in frequency.keys():
-        root = Node(None, None, c, frequency[c])
-        heapq.heappush(heap, root)
-
-    while len(heap) > 1:
-        smallest = heapq.heappop(heap)
-        second_smallest = heapq.heappop(heap)
-        root = Node(smallest, second_smallest, None, smallest.frequency + second_smallest.frequency)
-        heapq.heappush(heap, root)
-        root.display('frequency')
-    
-    return heapq.heappop(heap)
+    return build_tree_from_frequency(frequency)
 
+def build_tree_from_frequency(frequency):
+    """
+    build_tree_from_frequency creates huffman tree from already counted frequencies,
+    tree is built in arrays with two queue algorithm and converted to nodes
+
+    :param frequency: frequency of every char in document (dictionary)
+    :return: returns root of huffman tree (Node)
+    """
+    return HuffmanTree(frequency).to_nodes(Node)
 
 def find_code(tree, c):
     if (tree.is_leaf()):
@@ -174,49 +179,62 @@ def encode(string, tree):
     """
     encode : encode given string from codes dictionary
 
-    :param string: input text for compression (string)
-    :return: returns encoded string (string)
+    :param string: input text or binary data for compression (string or bytes)
+    :return: returns encoded data (BitWriter)
     """
-    list = []
+    writer = BitWriter()
     for c in string:
-        list.append(find_code(tree, c))
-    return ''.join(list)
+        code = find_code(tree, c)
+        if code:
+            writer.write(int(code, 2), len(code))
+    return writer
 
 
-def decode(tree, encoded, index = 0, length = 0):
+def decode(tree, encoded, length = 0):
     """
-    decode: finds sequence in encoded string that represents one character
+    decode: reads sequence of bits that represents one character
     Finds path from root to leaf in tree
 
     :param tree: root of Huffman tree (Node)
-    :param encoded: encoded representation of text (string)
-    :param index: index of current character in text (int)
-    :param length: length of char sequence that represents one Huffman code (int)
-    :return: returns one character (char)
+    :param encoded: encoded data, cursor is at first bit of character code (BitReader)
+    :param length: length of bit sequence that represents one Huffman code (int)
+    :return: returns one character (char) and length of its code (int)
     """
-    if len(encoded) == 0:
-        return
     if tree.is_leaf():
         return tree.char, length
-    elif encoded[index] == '0':
-        return decode(tree.left, encoded, index + 1, length + 1)
-    elif encoded[index] == '1':
-        return decode(tree.right, encoded, index + 1, length + 1)
+    elif encoded.read_bit():
+        return decode(tree.right, encoded, length + 1)
+    else:
+        return decode(tree.left, encoded, length + 1)
 
 @calculate_time
-def get_original(tree, encoded):
+def get_original(tree, encoded, decoder='table', length=None):
     """
     get_original: convert encoded document to original form
+    Tree with one leaf has code of zero bits, so number of characters can't be read from encoded data,
+    it is taken from frequency of root, which counts all characters of document
 
     :param tree: root of Huffman tree (Node)
-    :param encoded: encoded representation of text (string)
-    :return: returns original text (string)
+    :param encoded: encoded data (BitWriter or BitReader)
+    :param decoder: 'table' decodes one byte per step with lookup table,
+    'recursive' decodes one character at a time with decode (string)
+    :param length: number of encoded characters, frequency of root if not given (int)
+    :return: returns original text, bytes when tree was built from bytes (string or bytes)
     """
+    if length is None:
+        length = tree.frequency
+    if (decoder == 'table'):
+        return decode_with_table(tree, encoded, length=length)
+    if (decoder != 'recursive'):
+        raise ValueError("Decoder is not correct!")
+    if (tree.is_leaf()):
+        return join_symbols([tree.char] * length) if length else empty_symbols([tree.char])
+
+    reader = as_reader(encoded)
     decoded = []
-    while(len(encoded) > 0):
-        char, lenght = decode(tree, encoded)
-        encoded = encoded[lenght: ]
+    while(reader.remaining() > 0):
+        char, lenght = decode(tree, reader)
         decoded.append(char)
 
-    return ''.join(decoded)
+    return join_symbols(decoded)
 
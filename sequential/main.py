@@ -1,45 +1,115 @@
-import time
 import sys
+from collections import Counter
 sys.path.append('../../NTP')
 from util import *
 from huffman import *
+from tables import build_code_table, build_codes_from_frequency, encode_with_table
+from stream import compress_stream, CHUNK_SIZE
+from container import ContainerWriter, block_checksum, BLOCK_SIZE
+from metrics import registry, timer
+from tokens import tokenize_text, split_tokens
+from cli import start as start_cli
 
 @calculate_time
-def encode_huffman(string):
-    tree = build_huffman_tree(string)
-    tree.generate_codes()
-    encoded_tree =convert_tree_to_bytes(tree)
+def encode_huffman(string, encoder='table'):
+    """
+    encode_huffman: builds Huffman tree for given string and encodes string with it
+
+    :param string: input text or binary data for compression (string or bytes)
+    :param encoder: 'table' maps characters through precomputed code table,
+    'vectorized' encodes whole string with numpy, 'search' finds code of every character in tree (string)
+    :return: returns encoded data (BitWriter), tree, number of bits in last byte of tree and encoded tree (tuple)
+    """
+    with timer('count', len(string)):
+        frequency = get_frequency(string)
+    with timer('build'):
+        tree = build_tree_from_frequency(frequency)
+        tree.generate_codes()
+    with timer('serialize'):
+        encoded_tree =convert_tree_to_bytes(tree)
     r = len(encoded_tree) % 8
-    encoded = encode(string, tree)
+    with timer('encode', len(string)):
+        if (encoder == 'search'):
+            encoded = encode(string, tree)
+        else:
+            codes = build_code_table(tree)
+            encoded = encode_with_table(string, codes, encoder == 'vectorized')
 
     return encoded, tree, r, encoded_tree
 
-def start():
-    if len(sys.argv) == 1:
-        print("[ERROR] Path to txt document is required.")
-        sys.exit()
+@calculate_time
+def compress(string, output_file_name, encoder='table', block_size=BLOCK_SIZE, canonical=True,
+             max_length=None, alphabet="chars"):
+    """
+    compress: builds Huffman tree for given string and writes string to container, encoded block by block
+
+    :param string: input text or binary data for compression (string or bytes)
+    :param output_file_name: name of container file (string)
+    :param encoder: 'table' maps characters through precomputed code table,
+    'vectorized' encodes each block with numpy (string)
+    :param block_size: number of characters in one independently decodable block (int)
+    :param canonical: use canonical codes, only code lengths are stored in container (bool)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :param alphabet: 'chars' codes every character, 'words' or 'ngrams' code tokens of text, see tokens (string)
+    :return: returns code table, codes[char] = (code value, code length) (dictionary)
+    """
+    tokens = alphabet != "chars" and isinstance(string, str)
+    symbols = tokenize_text(string, alphabet) if tokens else string
+    with timer('count', len(string)):
+        frequency = Counter(symbols) if tokens else get_frequency(string)
+    with timer('build'):
+        codes = build_codes_from_frequency(frequency, canonical, max_length)
+    registry.add('input_symbols', len(string))
+    if (tokens):
+        blocks = split_tokens(symbols, block_size)
     else:
-        file_name = sys.argv[1]
+        blocks = [(string[i:i + block_size],) * 2 for i in range(0, len(string), block_size)]
+    with ContainerWriter(output_file_name, codes, block_size) as writer:
+        for block, text in blocks:
+            with timer('encode', len(text)):
+                encoded = encode_with_table(block, codes, encoder == 'vectorized' and not tokens)
+            writer.add_block(encoded, len(text), block_checksum(text))
+    return codes
 
-    print("Compressing file: ", file_name)
-    output_file_name = file_name.replace(".txt", "") + "_compressed_"
-    with open(file_name, "r") as reader:
-        document = reader.read()
+def compress_with_model(string, output_file_name, model, block_size=BLOCK_SIZE):
+    """
+    compress_with_model: encodes string with pre-trained model and writes it to container with ID of model
+    Frequencies are not counted and no code table is built or stored, compression is encode only
 
-    start_time = time.time()
-    encoded, tree,  r, encoded_tree = encode_huffman(document)
-    save(output_file_name, r, encoded_tree, encoded)
-    # print("ENCODED STRING : ", encoded)
+    :param string: input text or binary data for compression (string or bytes)
+    :param output_file_name: name of container file (string)
+    :param model: pre-trained model (Model)
+    :param block_size: number of characters in one independently decodable block (int)
+    :return: returns code table of model, codes[char] = (code value, code length) (dictionary)
+    """
+    registry.add('input_symbols', len(string))
+    with ContainerWriter(output_file_name, None, block_size, model) as writer:
+        for i in range(0, len(string), block_size):
+            block = string[i:i + block_size]
+            with timer('encode', len(block)):
+                encoded, escaped = model.encode(block)
+            writer.add_block(encoded, len(block), block_checksum(block), escaped)
+    return model.codes
 
-    original = get_original(tree, encoded)
-    # print("DECODED STRING : ", original)
+def compress_file(file_name, chunk_size=CHUNK_SIZE, canonical=True, max_length=None, binary=False):
+    """
+    compress_file: compresses txt document in stream mode, with memory bounded by chunk size
 
-    if (original == document):
-        print("MATCHES")
-    else:
-        print("ERROR")
-    duration = time.time() - start_time
-    print(f"Duration {duration} seconds")
+    :param file_name: path to txt document (string)
+    :param chunk_size: number of characters read and encoded at once (int)
+    :param canonical: use canonical codes, only code lengths are stored in container (bool)
+    :param max_length: maximal code length, codes are not limited if not given (int)
+    :param binary: compress file as bytes, for binary files and images (bool)
+    :return: returns name of written file (string)
+    """
+    build = lambda frequency: build_codes_from_frequency(frequency, canonical, max_length)
+    output_file_name = file_name.replace(".txt", "") + "_compressed.bin"
+    compress_stream(file_name, output_file_name, build, get_frequency,
+                    chunk_size=chunk_size, binary=binary)
+    return output_file_name
+
+def start():
+    start_cli(get_frequency, compress, compress_with_model, compress_file, parallel=False)
 
 if __name__ == '__main__':
     start()
\ No newline at end of file
@@ -0,0 +1,384 @@
+import sys
+import time
+import socket
+import struct
+import asyncio
+import argparse
+from container import ContainerReader
+from pipeline import compress_document
+from decompress import decompressed_file_name
+from executor import get_executor
+from metrics import registry
+
+"""
+Local compression service, long running process that compresses and decompresses documents on request,
+so interpreter start, imports and worker pool are paid once instead of once per document.
+Service listens on Unix socket or on localhost TCP port, every request and response is one frame:
+    request - operation, flags and length of payload, followed by payload (document or container)
+    response - status and length of payload, followed by payload (container, document or error message)
+Connection can send many requests one after another.
+Small requests are collected into batches, batch is closed after BATCH_DELAY seconds or when it has
+BATCH_REQUESTS requests or BATCH_BYTES bytes, and whole batch is sent to one worker of shared executor,
+large request is sent alone, small batches run in thread pool of executor. Payloads are read from socket and written to it in chunks of STREAM_CHUNK bytes,
+but every request and response is held whole in memory, so payload larger than MAX_PAYLOAD bytes is skipped
+without being stored and answered with error, and so is decompression to document larger than MAX_PAYLOAD.
+Requests wait in bounded queue and only MAX_BATCHES batches are processed at once, when queue is full
+connections stop reading new requests, so memory of waiting requests is bounded by QUEUE_SIZE * MAX_PAYLOAD.
+Latency of every request, waiting in queue and processing of batches are recorded in metrics registry,
+depth of queue is recorded as gauge 'service.queue_depth', STATS request returns all of them as JSON
+"""
+
+REQUEST = struct.Struct('>BBQ')
+RESPONSE = struct.Struct('>BQ')
+COMPRESS = 1
+DECOMPRESS = 2
+STATS = 3
+#payload of compress request is binary data, otherwise it is UTF-8 text
+FLAG_BYTES = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+STREAM_CHUNK = 1 << 16
+#largest payload of request and response, whole payload is held in memory
+MAX_PAYLOAD = 1 << 26
+BATCH_DELAY = 0.002
+BATCH_REQUESTS = 64
+BATCH_BYTES = 1 << 20
+QUEUE_SIZE = 256
+MAX_BATCHES = 4
+DEFAULT_PORT = 7707
+
+def run_request(operation, flags, payload):
+    """
+    run_request: runs one compress or decompress request
+
+    :param operation: COMPRESS or DECOMPRESS (int)
+    :param flags: flags of request (int)
+    :param payload: document or container (bytes)
+    :return: returns status and payload of response (tuple)
+    """
+    try:
+        if (operation == COMPRESS):
+            document = payload if flags & FLAG_BYTES else payload.decode("utf-8", "surrogatepass")
+            return STATUS_OK, compress_document(document)
+        if (operation == DECOMPRESS):
+            with ContainerReader(payload) as reader:
+                #every symbol is at least one byte, so too large document is refused before decoding
+                if (reader.length > MAX_PAYLOAD):
+                    raise ValueError("Document is too large!")
+                document = reader.decode()
+            document = document if reader.binary else document.encode("utf-8", "surrogatepass")
+            if (len(document) > MAX_PAYLOAD):
+                raise ValueError("Document is too large!")
+            return STATUS_OK, document
+        raise ValueError("Operation is not correct!")
+    except Exception as error:
+        return STATUS_ERROR, str(error).encode("utf-8")
+
+def stop_requests(batch):
+    """
+    stop_requests: answers requests that will not be processed because service is stopping
+
+    :param batch: request, future and time of queueing of every request (list)
+    :return: returns nothing
+    """
+    response = (STATUS_ERROR, "Service is stopping!".encode("utf-8"))
+    for request, future, queued in batch:
+        if not future.done():
+            future.set_result(response)
+
+def run_batch(requests):
+    """
+    run_batch: runs batch of requests in worker
+
+    :param requests: operation, flags and payload of every request (list)
+    :return: returns status and payload of every response (list)
+    """
+    return [run_request(*request) for request in requests]
+
+
+class CompressionService:
+    def __init__(self, queue_size=QUEUE_SIZE, max_batches=MAX_BATCHES):
+        """
+        Construct a new 'CompressionService' object, service is started with serve.
+
+        :param queue_size: number of requests that can wait for batching (int)
+        :param max_batches: number of batches processed at once (int)
+        :return: returns nothing
+        """
+        self.queue_size = queue_size
+        self.max_batches = max_batches
+        self.queue = None
+        self.batches = None
+        #batches that are running, reference keeps task alive until it is done
+        self.tasks = set()
+        self.executor = get_executor()
+
+    async def serve(self, path=None, port=DEFAULT_PORT):
+        """
+        serve: listens for connections until it is cancelled, then stops batching,
+        answers waiting requests with error and waits until running batches complete their requests
+
+        :param path: path of Unix socket, localhost TCP port is used if not given (string)
+        :param port: localhost TCP port (int)
+        :return: returns nothing
+        """
+        self.queue = asyncio.Queue(self.queue_size)
+        self.batches = asyncio.Semaphore(self.max_batches)
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, "127.0.0.1", port)
+        batcher = asyncio.create_task(self.batch_requests())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            await asyncio.gather(batcher, return_exceptions=True)
+            while not self.queue.empty():
+                stop_requests([self.queue.get_nowait()])
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def handle(self, reader, writer):
+        """
+        handle: reads requests of one connection and writes their responses in same order
+
+        :param reader: stream of connection (StreamReader)
+        :param writer: stream of connection (StreamWriter)
+        :return: returns nothing
+        """
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(REQUEST.size)
+                except asyncio.IncompleteReadError:
+                    break
+                begin = time.perf_counter()
+                operation, flags, length = REQUEST.unpack(header)
+                if (length > MAX_PAYLOAD):
+                    #payload is skipped chunk by chunk, so next request of connection can be read
+                    while length > 0:
+                        length -= len(await reader.readexactly(min(STREAM_CHUNK, length)))
+                    response = "Payload is too large!".encode("utf-8")
+                    writer.write(RESPONSE.pack(STATUS_ERROR, len(response)) + response)
+                    await writer.drain()
+                    registry.add('service.rejected')
+                    continue
+                payload = bytearray()
+                while len(payload) < length:
+                    payload += await reader.readexactly(min(STREAM_CHUNK, length - len(payload)))
+                if (operation == STATS):
+                    status, response = STATUS_OK, registry.to_json().encode("utf-8")
+                else:
+                    future = asyncio.get_running_loop().create_future()
+                    await self.queue.put(((operation, flags, bytes(payload)), future, time.perf_counter()))
+                    registry.observe('service.queue_depth', self.queue.qsize())
+                    del payload
+                    status, response = await future
+                writer.write(RESPONSE.pack(status, len(response)))
+                for i in range(0, len(response), STREAM_CHUNK):
+                    writer.write(response[i:i + STREAM_CHUNK])
+                    await writer.drain()
+                await writer.drain()
+                registry.record('service.latency', time.perf_counter() - begin, length)
+                registry.add('service.requests')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def batch_requests(self):
+        """
+        batch_requests: collects waiting requests into batches and sends every batch to executor
+
+        :return: returns nothing
+        """
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                size = len(batch[0][0][2])
+                deadline = loop.time() + BATCH_DELAY
+                while len(batch) < BATCH_REQUESTS and size < BATCH_BYTES:
+                    timeout = deadline - loop.time()
+                    if (timeout <= 0):
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    batch.append(item)
+                    size += len(item[0][2])
+                registry.observe('service.queue_depth', self.queue.qsize())
+                await self.batches.acquire()
+                task = asyncio.create_task(self.run(batch, size))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+                batch = []
+        except asyncio.CancelledError:
+            #batch collected when service stopped is never sent to executor
+            stop_requests(batch)
+            raise
+
+    async def run(self, batch, size):
+        """
+        run: processes one batch with executor and completes futures of its requests
+        Batch that is too small for process runs in thread pool of executor instead of serially,
+        so event loop keeps accepting requests, at most max_batches batches run at once
+
+        :param batch: request, future and time of queueing of every request (list)
+        :param size: number of bytes in payloads of batch (int)
+        :return: returns nothing
+        """
+        loop = asyncio.get_running_loop()
+        begin = time.perf_counter()
+        for request, future, queued in batch:
+            registry.record('service.queue_wait', begin - queued)
+        try:
+            requests = [request for request, future, queued in batch]
+            backend, parts = self.executor.choose(size)
+            backend = 'thread' if backend == 'serial' else backend
+            done = loop.create_future()
+            self.executor.pool(backend).apply_async(
+                run_batch, (requests,),
+                callback=lambda result: loop.call_soon_threadsafe(done.set_result, result),
+                error_callback=lambda error: loop.call_soon_threadsafe(done.set_exception, error))
+            responses = await done
+            registry.record('service.batch.' + backend, time.perf_counter() - begin, size)
+            registry.add('service.batch.requests', len(batch))
+        except Exception as error:
+            responses = [(STATUS_ERROR, str(error).encode("utf-8"))] * len(batch)
+        finally:
+            self.batches.release()
+        for (request, future, queued), response in zip(batch, responses):
+            if not future.done():
+                future.set_result(response)
+
+
+class ServiceClient:
+    def __init__(self, path=None, port=DEFAULT_PORT):
+        """
+        Construct a new 'ServiceClient' object and connects to service.
+
+        :param path: path of Unix socket, localhost TCP port is used if not given (string)
+        :param port: localhost TCP port (int)
+        :return: returns nothing
+        """
+        if path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(path)
+        else:
+            self.socket = socket.create_connection(("127.0.0.1", port))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.socket.close()
+
+    def receive(self, length):
+        data = bytearray()
+        while len(data) < length:
+            chunk = self.socket.recv(min(STREAM_CHUNK, length - len(data)))
+            if not chunk:
+                raise ConnectionError("Service closed connection!")
+            data += chunk
+        return bytes(data)
+
+    def request(self, operation, payload=b'', flags=0):
+        """
+        request: sends one request and waits for its response
+
+        :param operation: COMPRESS, DECOMPRESS or STATS (int)
+        :param payload: document or container (bytes)
+        :param flags: flags of request (int)
+        :return: returns payload of response (bytes)
+        """
+        self.socket.sendall(REQUEST.pack(operation, flags, len(payload)))
+        for i in range(0, len(payload), STREAM_CHUNK):
+            self.socket.sendall(payload[i:i + STREAM_CHUNK])
+        status, length = RESPONSE.unpack(self.receive(RESPONSE.size))
+        response = self.receive(length)
+        if (status != STATUS_OK):
+            raise IOError(response.decode("utf-8"))
+        return response
+
+    def compress(self, document):
+        """
+        compress: compresses document with service
+
+        :param document: text or binary data (string or bytes)
+        :return: returns container (bytes)
+        """
+        if isinstance(document, str):
+            return self.request(COMPRESS, document.encode("utf-8", "surrogatepass"))
+        return self.request(COMPRESS, document, FLAG_BYTES)
+
+    def decompress(self, container):
+        """
+        decompress: decompresses container with service
+
+        :param container: container (bytes)
+        :return: returns decompressed document, text is returned as UTF-8 (bytes)
+        """
+        return self.request(DECOMPRESS, container)
+
+    def stats(self):
+        """
+        stats: returns measurements of service
+
+        :return: returns measurements as JSON (string)
+        """
+        return self.request(STATS).decode("utf-8")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Local Huffman compression service")
+    parser.add_argument("command", choices=["serve", "compress", "decompress", "stats"],
+                        help="start service, or send request to running service")
+    parser.add_argument("file_name", nargs="?", default=None, help="document or bin file sent to service")
+    parser.add_argument("--socket", default=None, help="path of Unix socket, localhost TCP port is used if not given")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="localhost TCP port")
+    parser.add_argument("--output", default=None, help="file to which response is written")
+    return parser.parse_args()
+
+def start():
+    args = parse_arguments()
+    if (args.command == "serve"):
+        print("Serving on: ", args.socket or "127.0.0.1:" + str(args.port))
+        try:
+            asyncio.run(CompressionService().serve(args.socket, args.port))
+        except KeyboardInterrupt:
+            registry.report()
+        return
+    with ServiceClient(args.socket, args.port) as client:
+        if (args.command == "stats"):
+            print(client.stats())
+            return
+        if args.file_name is None:
+            print("[ERROR] Path to document is required.")
+            sys.exit()
+        with open(args.file_name, "rb") as reader:
+            data = reader.read()
+        if (args.command == "compress"):
+            if args.file_name.endswith(".txt"):
+                data = data.decode("utf-8")
+            response = client.compress(data)
+            output_file_name = args.output or args.file_name.replace(".txt", "") + "_compressed.bin"
+        else:
+            response = client.decompress(data)
+            output_file_name = args.output or decompressed_file_name(args.file_name)
+        with open(output_file_name, "wb") as writer:
+            writer.write(response)
+        print("Written file: ", output_file_name)
+
+if __name__ == '__main__':
+    start()
@@ -0,0 +1,89 @@
+from collections import Counter
+from functools import partial
+from util import calculate_time, open_document
+from tables import encode_with_table
+from container import ContainerWriter, block_checksum
+from metrics import registry, timer
+
+"""
+Streaming compression of text files that do not fit in memory.
+First pass counts frequencies chunk by chunk, second pass encodes chunk by chunk
+and writes every chunk to output container as one block, so memory use depends only on chunk size
+"""
+
+CHUNK_SIZE = 1 << 20
+
+def read_chunks(file_name, chunk_size=CHUNK_SIZE, batch=1, binary=False):
+    """
+    read_chunks: reads text file in chunks
+
+    :param file_name: name of txt file (string)
+    :param chunk_size: number of characters in one chunk (int)
+    :param batch: number of chunks returned together (int)
+    :param binary: read file as bytes, chunk_size is then number of bytes (bool)
+    :return: yields lists of at most `batch` chunks (list)
+    """
+    with open_document(file_name, binary=binary) as reader:
+        chunks = []
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if (len(chunks) == batch):
+                yield chunks
+                chunks = []
+        if chunks:
+            yield chunks
+
+@calculate_time
+def count_file_frequency(file_name, count, map=map, batch=1, chunk_size=CHUNK_SIZE, binary=False):
+    """
+    count_file_frequency: calculates frequency of every character in text file, one chunk at a time
+
+    :param file_name: name of txt file (string)
+    :param count: function that returns frequency of every char in one chunk (function)
+    :param map: map function used for counting chunks of one batch, can be parallel (function)
+    :param batch: number of chunks counted together (int)
+    :param chunk_size: number of characters in one chunk (int)
+    :param binary: read file as bytes (bool)
+    :return: returns frequency of every char in file (Counter)
+    """
+    frequency = Counter()
+    for chunks in read_chunks(file_name, chunk_size, batch, binary):
+        for part in map(count, chunks):
+            frequency.update(part)
+    return frequency
+
+@calculate_time
+def compress_stream(file_name, output_file_name, build_codes, count, map=map, batch=1, chunk_size=CHUNK_SIZE,
+                    binary=False):
+    """
+    compress_stream: compresses text file with bounded memory
+    Builds Huffman codes from frequencies counted in first pass, then encodes file
+    chunk by chunk in second pass, writing every encoded chunk to container as soon as it is encoded
+
+    :param file_name: name of txt file (string)
+    :param output_file_name: name of output container file (string)
+    :param build_codes: function that builds code table from frequencies (function)
+    :param count: function that returns frequency of every char in one chunk (function)
+    :param map: map function used for chunks of one batch, can be parallel (function)
+    :param batch: number of chunks counted and encoded together (int)
+    :param chunk_size: number of characters in one chunk (int)
+    :param binary: compress file as bytes, for binary files and images (bool)
+    :return: returns code table (dictionary)
+    """
+    with timer('count'):
+        frequency = count_file_frequency(file_name, count, map, batch, chunk_size, binary)
+    with timer('build'):
+        codes = build_codes(frequency)
+    encode_chunk = partial(encode_with_table, codes=codes)
+    registry.add('input_symbols', sum(frequency.values()))
+
+    with ContainerWriter(output_file_name, codes, chunk_size) as writer:
+        for chunks in read_chunks(file_name, chunk_size, batch, binary):
+            with timer('encode', sum(len(chunk) for chunk in chunks)):
+                encoded = list(map(encode_chunk, chunks))
+            for chunk, part in zip(chunks, encoded):
+                writer.add_block(part, len(chunk), block_checksum(chunk))
+    return codes
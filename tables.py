@@ -0,0 +1,715 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from collections import Counter
+from bits import BitWriter, as_reader
+from tree import HuffmanTree
+from metrics import registry
+
+"""
+Lookup tables used for table driven Huffman encoding and decoding.
+Encoder maps each character to its precomputed code instead of searching the tree,
+decoder reads encoded data one byte at a time instead of walking the tree bit by bit
+In bytes mode symbols are integers 0..255 instead of characters and decoded data is bytes
+"""
+
+DECODE_BITS = 8
+ENCODE_CHUNK = 1 << 16
+#vectorized encoder builds output in words of this many bits
+WORD_BITS = 64
+BYTE_SYMBOLS = 256
+#decode table pays off when there are more encoded bits than this per symbol of code,
+#row of every reached state costs about as much as walking 200 bits one by one,
+#so table must pay off even when all rows are built
+TABLE_BITS_PER_SYMBOL = 256
+
+class DecodeRows(dict):
+    def __init__(self, build_row):
+        """
+        Construct a new 'DecodeRows' object, rows of decode table that are built on first use.
+        With large alphabets building rows of all states costs much more than decoding,
+        while data usually reaches only part of states
+
+        :param build_row: function that builds row of one state (function)
+        :return: returns nothing
+        """
+        super().__init__()
+        self.build_row = build_row
+
+    def __missing__(self, state):
+        row = self.build_row(state)
+        self[state] = row
+        return row
+
+class DecodeTable:
+    def __init__(self, codes, bits=None):
+        """
+        Construct a new 'DecodeTable' object from code table.
+        Codes are arranged to binary trie, every internal node of trie is one decoder state (root is state 0).
+        Child of internal node is its state or, for leaf, -1 - index of leaf symbol.
+        For every state and every byte value, table holds text decoded while walking
+        bits of that byte from that state and state in which walk ended, row of state is built
+        when decoding first reaches that state.
+        When there are too few encoded bits to pay for rows (TABLE_BITS_PER_SYMBOL), trie is walked bit by bit
+
+        :param codes: code table, codes[char] = (code value, code length) (dictionary)
+        :param bits: number of encoded bits that will be decoded, rows are always used if not given (int)
+        :return: returns nothing
+        """
+        self.symbols = symbol_strings(list(codes))
+        self.empty = empty_symbols(codes)
+        self.children = [[None, None]]
+        self.single = None
+        self.walk = bits is not None and bits < TABLE_BITS_PER_SYMBOL * len(codes)
+        for index, c in enumerate(codes):
+            value, length = codes[c]
+            if (length == 0):
+                self.single = self.symbols[index]
+                continue
+            state = 0
+            for shift in range(length - 1, 0, -1):
+                bit = (value >> shift) & 1
+                if self.children[state][bit] is None:
+                    self.children[state][bit] = len(self.children)
+                    self.children.append([None, None])
+                state = self.children[state][bit]
+            self.children[state][value & 1] = -1 - index
+        #prefixes[k] is row of root for k bits, it ends rows in which some code ends k bits before end of byte
+        self.prefixes = []
+        for width in range(DECODE_BITS + 1):
+            self.prefixes.append(self.fill_row(0, width))
+        self.table = DecodeRows(self.build_row)
+        self.table[0] = self.prefixes[DECODE_BITS]
+
+    def fill_row(self, state, width):
+        """
+        fill_row: builds row of state for values of `width` bits from codes that continue from that state
+        Trie is walked only to depth of width, code that ends after r bits fills all 2^(width - r) values
+        that start with it at once, with its symbol followed by row of root for remaining bits
+
+        :param state: decoder state (int)
+        :param width: number of bits of value (int)
+        :return: return row, row[value] = (decoded text, next state) (list)
+        """
+        row = [(self.empty, state)] * (1 << width)
+        stack = [(state, 0, 0)] if width else []
+        while stack:
+            node, depth, prefix = stack.pop()
+            depth += 1
+            for bit in (0, 1):
+                child = self.children[node][bit]
+                value = (prefix << 1) | bit
+                start = value << (width - depth)
+                end = (value + 1) << (width - depth)
+                if child is None:
+                    #code table is not complete (escape of model is left out), valid data never walks this path
+                    row[start:end] = [(self.empty, 0)] * (end - start)
+                elif child < 0:
+                    symbol = self.symbols[-1 - child]
+                    row[start:end] = [(symbol + text, next_state) for text, next_state in self.prefixes[width - depth]]
+                elif (depth == width):
+                    row[start] = (self.empty, child)
+                else:
+                    stack.append((child, depth, value))
+        return row
+
+    def build_row(self, state):
+        """
+        build_row: builds table row of one state
+
+        :param state: decoder state (int)
+        :return: return row, row[byte] = (decoded text, next state) (list)
+        """
+        return self.fill_row(state, DECODE_BITS)
+
+    def decode(self, encoded, length=None):
+        """
+        decode: converts encoded data to original form
+        Encoded data is walked with cursor one byte per step, bits of last incomplete byte are walked through trie
+
+        :param encoded: encoded data, cursor must be at start of a byte (BitReader or BitWriter)
+        :param length: number of encoded characters, needed only when tree has one leaf (int)
+        :return: returns original text (string or bytes)
+        """
+        return self.empty.join(self.decode_chunks(encoded, length))
+
+    def decode_chunks(self, encoded, length=None, chunk_size=None):
+        """
+        decode_chunks: converts encoded data to original form part by part
+        One byte decodes to at most DECODE_BITS symbols, so every part is decoded from
+        chunk_size / DECODE_BITS bytes and has at most chunk_size symbols (characters, unless symbols are tokens)
+
+        :param encoded: encoded data, cursor must be at start of a byte (BitReader or BitWriter)
+        :param length: number of encoded characters, needed only when tree has one leaf (int)
+        :param chunk_size: maximal number of characters in one part, whole data is one part if not given (int)
+        :return: yields parts of original text (string or bytes)
+        """
+        reader = as_reader(encoded)
+        if self.single is not None:
+            #length counts characters, single symbol can be token of several characters
+            count = (length or 0) // len(self.single)
+            step = max(1, chunk_size // len(self.single)) if chunk_size else max(1, count)
+            for i in range(0, count, step):
+                yield self.single * min(step, count - i)
+            return
+        if (self.walk):
+            yield from self.walk_bits(reader, 0, chunk_size)
+            return
+        if (reader.position & 7):
+            raise ValueError("Decoding must start at byte boundary!")
+
+        table = self.table
+        state = 0
+        first = reader.position >> 3
+        last = reader.length >> 3
+        step = max(1, chunk_size // DECODE_BITS) if chunk_size else max(1, last - first)
+        for start in range(first, last, step):
+            decoded = []
+            append = decoded.append
+            for byte in reader.data[start:min(start + step, last)]:
+                text, state = table[state][byte]
+                if text:
+                    append(text)
+            yield self.empty.join(decoded)
+
+        reader.position = last * 8
+        yield from self.walk_bits(reader, state, chunk_size)
+
+    def walk_bits(self, reader, state=0, chunk_size=None):
+        """
+        walk_bits: decodes remaining bits of reader by walking trie one bit at a time
+
+        :param reader: encoded data (BitReader)
+        :param state: state in which walk starts (int)
+        :param chunk_size: number of symbols in one part, all symbols are one part if not given (int)
+        :return: yields parts of original text (string or bytes)
+        """
+        children = self.children
+        symbols = self.symbols
+        data = reader.data
+        decoded = []
+        position = reader.position
+        while position < reader.length:
+            #bits of one byte are walked without reading them one by one from reader
+            byte = data[position >> 3]
+            end = min(reader.length, (position | 7) + 1)
+            for shift in range(7 - (position & 7), 6 - ((end - 1) & 7), -1):
+                state = children[state][(byte >> shift) & 1]
+                if state < 0:
+                    decoded.append(symbols[-1 - state])
+                    state = 0
+            position = end
+            while (chunk_size and len(decoded) >= chunk_size):
+                yield self.empty.join(decoded[:chunk_size])
+                decoded = decoded[chunk_size:]
+        reader.position = position
+        if decoded:
+            yield self.empty.join(decoded)
+
+class CanonicalTable:
+    def __init__(self, lengths):
+        """
+        Construct a new 'CanonicalTable' object from code lengths of canonical code.
+        Codes of same length are consecutive numbers, so for every length table keeps only
+        first code, number of codes and index of first symbol with that length
+
+        :param lengths: code length of every char (dictionary)
+        :return: returns nothing
+        """
+        order = sorted(sorted(lengths), key=lengths.__getitem__)
+        self.symbols = symbol_strings(order)
+        self.empty = empty_symbols(lengths)
+        self.single = self.symbols[0] if len(self.symbols) == 1 else None
+        longest = max(lengths.values(), default=0)
+        self.count = [0] * (longest + 1)
+        for c in order:
+            self.count[lengths[c]] += 1
+        self.first = [0] * (longest + 1)
+        self.offset = [0] * (longest + 1)
+        code = 0
+        index = 0
+        for length in range(1, longest + 1):
+            code = (code + self.count[length - 1]) << 1
+            self.first[length] = code
+            self.offset[length] = index
+            index += self.count[length]
+
+    def decode(self, encoded, length=None):
+        """
+        decode: converts encoded data to original form, reading one bit at a time
+
+        :param encoded: encoded data (BitReader or BitWriter)
+        :param length: number of encoded characters, needed only when code has one symbol (int)
+        :return: returns original text (string or bytes)
+        """
+        return self.empty.join(self.decode_chunks(encoded, length))
+
+    def decode_chunks(self, encoded, length=None, chunk_size=None):
+        """
+        decode_chunks: converts encoded data to original form part by part
+
+        :param encoded: encoded data (BitReader or BitWriter)
+        :param length: number of encoded characters, needed only when code has one symbol (int)
+        :param chunk_size: number of characters in one part, last part can be shorter,
+                           whole data is one part if not given (int)
+        :return: yields parts of original text (string or bytes)
+        """
+        reader = as_reader(encoded)
+        if self.single is not None:
+            #length counts characters, single symbol can be token of several characters
+            count = (length or 0) // len(self.single)
+            step = max(1, chunk_size // len(self.single)) if chunk_size else max(1, count)
+            for i in range(0, count, step):
+                yield self.single * min(step, count - i)
+            return
+        decoded = []
+        code = 0
+        code_length = 0
+        while reader.remaining():
+            code = (code << 1) | reader.read_bit()
+            code_length += 1
+            index = code - self.first[code_length]
+            if (0 <= index < self.count[code_length]):
+                decoded.append(self.symbols[self.offset[code_length] + index])
+                code = 0
+                code_length = 0
+                if (chunk_size and len(decoded) == chunk_size):
+                    yield self.empty.join(decoded)
+                    decoded = []
+        if decoded:
+            yield self.empty.join(decoded)
+
+def is_byte_symbols(symbols):
+    """
+    is_byte_symbols: checks if symbols of code table are bytes (integers) instead of characters
+
+    :param symbols: code table or list of symbols (dictionary or list)
+    :return: returns true if symbols are bytes (bool)
+    """
+    return any(isinstance(c, int) for c in symbols)
+
+def empty_symbols(symbols):
+    """
+    empty_symbols: returns empty decoded data of same kind as symbols, used to join decoded parts
+
+    :param symbols: code table or list of symbols (dictionary or list)
+    :return: returns empty bytes for byte symbols or empty string (bytes or string)
+    """
+    return b'' if is_byte_symbols(symbols) else ''
+
+def symbol_strings(symbols):
+    """
+    symbol_strings: converts byte symbols to one byte long bytes, so they can be joined like characters
+
+    :param symbols: list of symbols (list)
+    :return: returns list of characters or bytes (list)
+    """
+    return [bytes((c,)) if isinstance(c, int) else c for c in symbols]
+
+def join_symbols(symbols):
+    """
+    join_symbols: joins decoded symbols to text or, for byte symbols, to bytes
+
+    :param symbols: decoded symbols (list)
+    :return: returns original data (string or bytes)
+    """
+    return bytes(symbols) if is_byte_symbols(symbols[:1]) else ''.join(symbols)
+
+def byte_frequency(data):
+    """
+    byte_frequency: counts every byte value in one pass, with numpy as histogram of 256 counters
+
+    :param data: binary input (bytes, bytearray or memoryview)
+    :return: returns frequency of every byte (dictionary)
+    """
+    if np is None:
+        return dict(Counter(data))
+    counts = np.bincount(np.frombuffer(data, np.uint8), minlength=BYTE_SYMBOLS)
+    return {b: int(count) for b, count in enumerate(counts) if count}
+
+def symbol_frequency(data):
+    """
+    symbol_frequency: counts every symbol of text or binary data, bytes are counted with byte_frequency
+
+    :param data: text or binary data (string or bytes)
+    :return: returns frequency of every symbol (dictionary)
+    """
+    return Counter(data) if isinstance(data, str) else byte_frequency(data)
+
+def build_decode_table(tree):
+    """
+    build_decode_table: builds lookup table for decoding DECODE_BITS bits (one byte) at a time
+    Tree codes must be generated
+
+    :param tree: root of Huffman tree (Node)
+    :return: return decode table (DecodeTable)
+    """
+    return DecodeTable(build_code_table(tree))
+
+def decode_with_table(tree, encoded, table=None, length=None):
+    """
+    decode_with_table: converts encoded data to original form using decode table
+    Table that is built here walks trie bit by bit when encoded data is too short to pay for rows of table
+
+    :param tree: root of Huffman tree (Node)
+    :param encoded: encoded representation of text, cursor must be at start of a byte (BitReader or BitWriter)
+    :param table: table built with build_decode_table for same tree, built if not given (DecodeTable)
+    :param length: number of encoded characters, needed only when tree has one leaf (int)
+    :return: returns original text (string)
+    """
+    if table is None:
+        table = DecodeTable(build_code_table(tree), len(encoded))
+    return table.decode(encoded, length)
+
+def build_code_table(tree):
+    """
+    build_code_table: collects code of every leaf in Huffman tree, must be called after generate_codes
+
+    :param tree: root of Huffman tree (Node)
+    :return: return code table, table[char] = (code value, code length) (dictionary)
+    """
+    codes = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.is_leaf():
+            codes[node.char] = (int(node.code, 2) if node.code else 0, len(node.code))
+        else:
+            stack.append(node.right)
+            stack.append(node.left)
+    return codes
+
+def get_code_lengths(tree):
+    """
+    get_code_lengths: calculates length of Huffman code of every character (depth of its leaf)
+    Codes don't have to be generated
+
+    :param tree: root of Huffman tree (Node)
+    :return: returns code length of every char (dictionary)
+    """
+    lengths = {}
+    stack = [(tree, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node.is_leaf():
+            lengths[node.char] = depth
+        else:
+            stack.append((node.right, depth + 1))
+            stack.append((node.left, depth + 1))
+    return lengths
+
+def build_canonical_codes(tree):
+    """
+    build_canonical_codes: assigns canonical Huffman codes with same lengths as codes in tree
+    Canonical code is fully described by code lengths, so only lengths have to be stored
+
+    :param tree: root of Huffman tree (Node)
+    :return: return code table, table[char] = (code value, code length) (dictionary)
+    """
+    return canonical_codes(get_code_lengths(tree))
+
+def get_leaf_frequency(tree):
+    """
+    get_leaf_frequency: collects frequency of every character from leaves of tree
+
+    :param tree: root of Huffman tree (Node)
+    :return: returns frequency of every char (dictionary)
+    """
+    frequency = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.is_leaf():
+            frequency[node.char] = node.frequency
+        else:
+            stack.append(node.right)
+            stack.append(node.left)
+    return frequency
+
+def build_limited_codes(tree, max_length):
+    """
+    build_limited_codes: assigns canonical codes not longer than max_length
+    When tree is deeper than max_length, code lengths are calculated with package-merge
+    and cost of limit in bits is recorded in metrics registry
+
+    :param tree: root of Huffman tree (Node)
+    :param max_length: maximal code length (int)
+    :return: return code table, table[char] = (code value, code length) (dictionary)
+    """
+    lengths = get_code_lengths(tree)
+    if (max(lengths.values()) <= max_length):
+        return canonical_codes(lengths)
+    return canonical_codes(limit_code_lengths(get_leaf_frequency(tree), lengths, max_length))
+
+def limit_code_lengths(frequency, lengths, max_length):
+    """
+    limit_code_lengths: replaces code lengths longer than max_length with package-merge lengths
+    and records cost of limit in bits as 'limit.extra_bits'
+
+    :param frequency: frequency of every char (dictionary)
+    :param lengths: optimal code length of every char (dictionary)
+    :param max_length: maximal code length (int)
+    :return: returns code length of every char (dictionary)
+    """
+    if (max(lengths.values()) <= max_length):
+        return lengths
+    limited = limited_code_lengths(frequency, max_length)
+    optimal_bits = encoded_length(frequency, lengths)
+    limited_bits = encoded_length(frequency, limited)
+    registry.add('limit.extra_bits', limited_bits - optimal_bits)
+    return limited
+
+def build_codes(tree, canonical=True, max_length=None):
+    """
+    build_codes: returns code table for Huffman tree
+
+    :param tree: root of Huffman tree (Node)
+    :param canonical: assign canonical codes instead of generating codes from tree (bool)
+    :param max_length: maximal code length, codes are canonical when it is given (int)
+    :return: return code table, table[char] = (code value, code length) (dictionary)
+    """
+    if (max_length is not None):
+        return build_limited_codes(tree, max_length)
+    if (canonical):
+        return build_canonical_codes(tree)
+    tree.generate_codes()
+    return build_code_table(tree)
+
+def build_codes_from_frequency(frequency, canonical=True, max_length=None):
+    """
+    build_codes_from_frequency: returns code table for frequencies
+    Codes are read from array tree without creating nodes, canonical codes need only code lengths
+
+    :param frequency: frequency of every char in document (dictionary)
+    :param canonical: assign canonical codes instead of generating codes from tree (bool)
+    :param max_length: maximal code length, codes are canonical when it is given (int)
+    :return: return code table, table[char] = (code value, code length), empty for empty document (dictionary)
+    """
+    if not frequency:
+        return {}
+    if (not canonical and max_length is None):
+        return HuffmanTree(frequency).codes()
+    lengths = HuffmanTree(frequency).code_lengths()
+    if (max_length is not None):
+        lengths = limit_code_lengths(frequency, lengths, max_length)
+    return canonical_codes(lengths)
+
+def canonical_codes(lengths):
+    """
+    canonical_codes: assigns canonical Huffman codes from code lengths
+    Symbols are sorted by code length and then by symbol, each code is previous code plus one,
+    shifted left when code length grows
+
+    :param lengths: code length of every char (dictionary)
+    :return: return code table, table[char] = (code value, code length) (dictionary)
+    """
+    codes = {}
+    code = 0
+    previous = 0
+    #stable sort by length of symbols already sorted by symbol, without building key tuples
+    for c in sorted(sorted(lengths), key=lengths.__getitem__):
+        length = lengths[c]
+        code <<= length - previous
+        codes[c] = (code, length)
+        code += 1
+        previous = length
+    return codes
+
+def limited_code_lengths(frequency, max_length):
+    """
+    limited_code_lengths: calculates optimal code lengths that are not longer than max_length
+    Uses package-merge algorithm: symbols sorted by frequency are paired to packages max_length - 1 times,
+    each time packages are merged with symbols again, first 2n - 2 items of last list are chosen
+    and code length of symbol is number of chosen items that contain it
+
+    :param frequency: frequency of every char in document (dictionary)
+    :param max_length: maximal code length (int)
+    :return: returns code length of every char (dictionary)
+    """
+    symbols = sorted(frequency, key=lambda c: (frequency[c], c))
+    if (len(symbols) <= 1):
+        return {c: 0 for c in symbols}
+    if ((1 << max_length) < len(symbols)):
+        raise ValueError("Maximal code length is too small for number of symbols!")
+
+    #item is (weight, index of symbol or -1 for package, items in package)
+    leaves = [(frequency[c], i, None) for i, c in enumerate(symbols)]
+    items = leaves
+    for _ in range(max_length - 1):
+        packages = [(items[i][0] + items[i + 1][0], -1, (items[i], items[i + 1]))
+                    for i in range(0, len(items) - 1, 2)]
+        items = sorted(leaves + packages, key=lambda item: item[0])
+
+    lengths = [0] * len(symbols)
+    stack = items[:2 * len(symbols) - 2]
+    while stack:
+        weight, index, children = stack.pop()
+        if (index >= 0):
+            lengths[index] += 1
+        else:
+            stack.extend(children)
+    return {c: lengths[i] for i, c in enumerate(symbols)}
+
+def encoded_length(frequency, lengths):
+    """
+    encoded_length: calculates number of bits of encoded document
+
+    :param frequency: frequency of every char in document (dictionary)
+    :param lengths: code length of every char (dictionary)
+    :return: returns number of encoded bits (int)
+    """
+    return sum(frequency[c] * lengths[c] for c in frequency)
+
+def code_lengths(codes):
+    """
+    code_lengths: returns code length of every char in code table
+
+    :param codes: code table (dictionary)
+    :return: return code length of every char (dictionary)
+    """
+    return {c: length for c, (value, length) in codes.items()}
+
+def code_strings(codes):
+    """
+    code_strings: converts code table to string representation of codes
+
+    :param codes: code table built with build_code_table (dictionary)
+    :return: return string code of every char, example : {'a': '110'} (dictionary)
+    """
+    return {c: format(value, '0{}b'.format(length)) if length else '' for c, (value, length) in codes.items()}
+
+def encode_with_table(string, codes, vectorized=False):
+    """
+    encode_with_table: encode given string using precomputed code table
+    Without numpy codes are joined for ENCODE_CHUNK characters at a time and packed to writer,
+    symbol that is not in code table raises KeyError
+
+    :param string: input text or binary data for compression (string or bytes)
+    :param codes: code table built with build_code_table (dictionary)
+    :param vectorized: encode whole string at once with numpy (bool)
+    :return: returns encoded data (BitWriter)
+    """
+    if (vectorized and np is not None):
+        return BitWriter.from_bytes(*encode_vectorized(string, codes))
+    strings = code_strings(codes)
+    if is_byte_symbols(codes):
+        #fixed table indexed by byte value, byte that is not in code table has no string and can't be joined
+        strings = [strings.get(b) for b in range(BYTE_SYMBOLS)]
+    writer = BitWriter()
+    for i in range(0, len(string), ENCODE_CHUNK):
+        chunk = string[i:i + ENCODE_CHUNK]
+        try:
+            bits = ''.join(map(strings.__getitem__, chunk))
+        except TypeError:
+            raise KeyError(next(b for b in chunk if strings[b] is None)) from None
+        if bits:
+            writer.write(int(bits, 2), len(bits))
+    return writer
+
+def encode_vectorized(string, codes):
+    """
+    encode_vectorized: encode given string in bulk with numpy
+    Characters are mapped to arrays of code values and code lengths, prefix sum of lengths
+    gives bit offset of every code. Output is built in 64 bit words: codes of one word don't overlap,
+    so they are joined with one OR reduction per word, code that crosses end of word spills its
+    lowest bits to next word. String is encoded ENCODE_CHUNK symbols at a time, so arrays stay in cache.
+    Codes longer than 64 bits are encoded with encode_with_table, symbol that is not in code table raises KeyError
+
+    :param string: input text or binary data for compression (string or bytes)
+    :param codes: code table built with build_code_table (dictionary)
+    :return: returns packed encoded bytes and number of bits in them (tuple)
+    """
+    if not string:
+        return b'', 0
+    longest = max((length for value, length in codes.values()), default=0)
+    if (longest > WORD_BITS):
+        encoded = encode_with_table(string, codes)
+        return encoded.getvalue(), len(encoded)
+    symbols = code_points(string)
+    lookup = SymbolLookup(codes, int(symbols.max()))
+    if (longest == 0):
+        #code of one symbol has no bits, symbols are only checked
+        lookup.indexes(symbols)
+        return b'', 0
+    order = sorted(codes, key=symbol_value)
+    lengths = np.array([codes[c][1] for c in order], dtype=np.uint64)
+    #code is aligned to highest bit of word and shifted right by its offset in word,
+    #bits that are shifted out belong to next word, they are its highest bits
+    values = np.array([codes[c][0] for c in order], dtype=np.uint64) << (np.uint64(WORD_BITS) - lengths)
+    words = np.zeros((len(symbols) * longest + WORD_BITS - 1) // WORD_BITS + 1, dtype=np.uint64)
+    position = np.uint64(0)
+    for i in range(0, len(symbols), ENCODE_CHUNK):
+        index = lookup.indexes(symbols[i:i + ENCODE_CHUNK])
+        symbol_lengths = lengths[index]
+        starts = np.cumsum(symbol_lengths)
+        starts += position
+        position = starts[-1]
+        starts -= symbol_lengths
+        aligned = values[index]
+        offsets = starts & np.uint64(WORD_BITS - 1)
+        words_index = starts >> np.uint64(6)
+        spills = np.flatnonzero(offsets + symbol_lengths > WORD_BITS)
+        #codes are in order of bits, so codes of every word are consecutive and don't overlap,
+        #first word can already hold codes of previous chunk
+        first = np.flatnonzero(np.concatenate(([True], words_index[1:] != words_index[:-1])))
+        words[words_index[first]] |= np.bitwise_or.reduceat(aligned >> offsets, first)
+        words[words_index[spills] + 1] |= aligned[spills] << (np.uint64(WORD_BITS) - offsets[spills])
+    length = int(position)
+    return words[:(length + WORD_BITS - 1) // WORD_BITS].astype('>u8').tobytes()[:(length + 7) // 8], length
+
+class SymbolLookup:
+    def __init__(self, codes, largest):
+        """
+        Construct a new 'SymbolLookup' object, maps code points to indexes of symbols in code table
+        sorted by symbol value. Small code points are looked up in array, large ones are searched in sorted keys
+
+        :param codes: code table (dictionary)
+        :param largest: largest code point that will be looked up (int)
+        :return: returns nothing
+        """
+        self.keys = np.array(sorted(symbol_value(c) for c in codes), dtype=np.int64)
+        self.lookup = None
+        if (largest < 1 << 16):
+            self.lookup = np.full(largest + 1, -1, dtype=np.int32)
+            known = self.keys[self.keys <= largest]
+            self.lookup[known] = np.arange(len(known))
+
+    def indexes(self, symbols):
+        """
+        indexes: returns index of every symbol, symbol that is not in code table raises KeyError
+
+        :param symbols: code point of every character or value of every byte (numpy array)
+        :return: returns index of every symbol (numpy array)
+        """
+        if self.lookup is not None:
+            index = self.lookup[symbols]
+            missing = np.flatnonzero(index < 0)
+        else:
+            index = np.minimum(np.searchsorted(self.keys, symbols), len(self.keys) - 1)
+            missing = np.flatnonzero(self.keys[index] != symbols)
+        if len(missing):
+            symbol = int(symbols[missing[0]])
+            raise KeyError(symbol if symbols.dtype == np.uint8 else chr(symbol))
+        return index
+
+def symbol_value(c):
+    """
+    symbol_value: returns integer value of symbol, code point of character or value of byte
+
+    :param c: symbol (char or int)
+    :return: returns value of symbol (int)
+    """
+    return c if isinstance(c, int) else ord(c)
+
+def code_points(string):
+    """
+    code_points: converts string to numpy array of code points without per character work
+    Binary data is viewed as array of bytes without copying
+
+    :param string: input text or binary data (string, bytes or memoryview)
+    :return: returns code point of every character or value of every byte (numpy array)
+    """
+    if not isinstance(string, str):
+        return np.frombuffer(string, dtype=np.uint8)
+    return np.frombuffer(string.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+"""
+Modules of project are imported from root of repository, as in sequential and parallel main
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
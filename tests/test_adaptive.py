@@ -0,0 +1,63 @@
+import io
+import random
+from adaptive import compress_adaptive, decompress_adaptive, AdaptiveEncoder, AdaptiveDecoder, AdaptiveTree
+
+"""
+Round trip of adaptive Huffman streams, read in small parts so that codes change between reads
+"""
+
+TEXT = "adaptive huffman ünïcödé 日本語 \U0001f600\n" * 200
+
+def round_trip(data, binary, read_size):
+    compressed = io.BytesIO()
+    compress_adaptive(io.BytesIO(data), compressed, binary, read_size)
+    compressed.seek(0)
+    decompressed = io.BytesIO()
+    decompress_adaptive(compressed, decompressed, read_size)
+    return decompressed.getvalue()
+
+def test_adaptive_text():
+    data = TEXT.encode("utf-8")
+    #read size of 7 bytes splits multibyte characters between reads
+    for read_size in (7, 1 << 16):
+        assert round_trip(data, False, read_size) == data
+
+def test_adaptive_bytes():
+    data = bytes(range(256)) * 8 + b'\x00' * 1000
+    assert round_trip(data, True, 100) == data
+
+def test_adaptive_empty():
+    assert round_trip(b'', False, 100) == b''
+
+def test_adaptive_encoder():
+    encoder = AdaptiveEncoder()
+    encoded = encoder.encode(TEXT[:100]) + encoder.encode(TEXT[100:]) + encoder.finish()
+    assert AdaptiveDecoder().decode(encoded) == TEXT
+
+def check_tree(tree):
+    nodes = tree.nodes
+    for index, node in enumerate(nodes):
+        assert node.index == index
+        assert node.block.weight == node.frequency
+        #leader of block is first node of its weight, weights never increase along list
+        assert nodes[node.block.leader].block is node.block
+        assert node.block.leader == min(i for i in range(index + 1) if nodes[i].frequency == node.frequency)
+        if (index):
+            assert nodes[index - 1].frequency >= node.frequency
+        if not node.is_leaf():
+            assert node.frequency == node.left.frequency + node.right.frequency
+    block = nodes[-1].block
+    while block.higher is not None:
+        assert block.higher.lower is block and block.higher.weight > block.weight
+        block = block.higher
+
+def test_weight_blocks():
+    generator = random.Random(17)
+    text = "".join(chr(0x4e00 + int(generator.paretovariate(1.2))) for _ in range(600)) + "abracadabra" * 20
+    tree = AdaptiveTree()
+    for c in text:
+        tree.update(c)
+        check_tree(tree)
+    encoder = AdaptiveEncoder()
+    data = encoder.encode(text) + encoder.finish()
+    assert AdaptiveDecoder().decode(data) == text
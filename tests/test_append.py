@@ -0,0 +1,94 @@
+from collections import Counter
+from tables import encode_with_table, canonical_codes
+from tree import HuffmanTree
+from container import ContainerWriter, ContainerReader, block_checksum, FLAG_TOKENS, KIND_SHARED, KIND_ESCAPE, \
+    KIND_LOCAL
+from tokens import tokenize_text, split_tokens
+from pipeline import compress_document
+from append import append
+from model import train_model, save_model
+
+"""
+Round trip of documents with data appended to container
+"""
+
+TEXT = "the quick brown fox jumps over the lazy dog\n" * 200
+
+def append_and_decode(file_name, new, block_size):
+    with open(file_name, "wb") as writer:
+        writer.write(compress_document(TEXT, 1000))
+    kinds = append(file_name, new, block_size)
+    with ContainerReader(file_name) as reader:
+        assert reader.decode() == TEXT + new
+        assert reader.decode(parallel=True) == TEXT + new
+        assert reader.decode_range(len(TEXT) - 10, len(TEXT) + 10) == (TEXT + new)[len(TEXT) - 10:len(TEXT) + 10]
+        assert reader.verify() == []
+    return kinds
+
+def test_append_shared(tmp_path):
+    assert append_and_decode(str(tmp_path / "shared.bin"), TEXT[:500], 500) == {KIND_SHARED: 1}
+
+def test_append_escape(tmp_path):
+    assert append_and_decode(str(tmp_path / "escape.bin"), TEXT[:499] + "Z", 500) == {KIND_ESCAPE: 1}
+
+def test_append_local(tmp_path):
+    assert append_and_decode(str(tmp_path / "local.bin"), "日本語のテキスト" * 60, 500) == {KIND_LOCAL: 1}
+
+def test_append_mixed(tmp_path):
+    new = TEXT[:500] + TEXT[:499] + "Z" + "0123456789+-*/" * 40
+    assert set(append_and_decode(str(tmp_path / "mixed.bin"), new, 500)) == {KIND_SHARED, KIND_ESCAPE, KIND_LOCAL}
+
+def test_append_compact(tmp_path):
+    file_name = str(tmp_path / "compact.bin")
+    model = train_model([TEXT])
+    save_model(model, str(tmp_path))
+    document = TEXT[:100]
+    with ContainerWriter(file_name, None, 1000, model) as writer:
+        encoded, escaped = model.encode(document)
+        writer.add_block(encoded, len(document), block_checksum(document), escaped)
+    kinds = append(file_name, TEXT[:499] + "Z", 500, str(tmp_path))
+    assert kinds == {KIND_ESCAPE: 1}
+    with ContainerReader(file_name, str(tmp_path)) as reader:
+        assert not reader.compact
+        assert reader.decode() == document + TEXT[:499] + "Z"
+        assert reader.verify() == []
+
+def test_append_tokens(tmp_path):
+    file_name = str(tmp_path / "tokens.bin")
+    symbols = tokenize_text(TEXT, "words")
+    codes = canonical_codes(HuffmanTree(Counter(symbols)).code_lengths())
+    with ContainerWriter(file_name, codes, 1000) as writer:
+        for block, text in split_tokens(symbols, 1000):
+            writer.add_block(encode_with_table(block, codes), len(text), block_checksum(text))
+    new = "new line with ünïcode and words that are not tokens\n"
+    kinds = append(file_name, new, 20)
+    assert set(kinds) == {KIND_LOCAL}
+    with ContainerReader(file_name) as reader:
+        assert reader.flags & FLAG_TOKENS
+        assert reader.decode() == TEXT + new
+        assert reader.decode_range(len(TEXT) - 10, len(TEXT) + 10) == (TEXT + new)[len(TEXT) - 10:len(TEXT) + 10]
+        assert reader.verify() == []
+
+def test_append_interrupted(tmp_path, monkeypatch):
+    file_name = str(tmp_path / "interrupted.bin")
+    codes = canonical_codes(HuffmanTree(Counter(TEXT)).code_lengths())
+    with ContainerWriter(file_name, codes, 1000) as writer:
+        for i in range(0, len(TEXT), 1000):
+            block = TEXT[i:i + 1000]
+            writer.add_block(encode_with_table(block, codes), len(block), block_checksum(block))
+    with open(file_name, "rb") as reader:
+        original = reader.read()
+    add_block = ContainerWriter.add_block
+    def failing_add_block(writer, *args, **kwargs):
+        if (len(writer.index) > len(TEXT) // 1000 + 1):
+            raise RuntimeError("Interrupted!")
+        return add_block(writer, *args, **kwargs)
+    monkeypatch.setattr(ContainerWriter, "add_block", failing_add_block)
+    try:
+        append(file_name, TEXT, 100)
+    except RuntimeError:
+        pass
+    with open(file_name, "rb") as reader:
+        assert reader.read() == original
+    with ContainerReader(file_name) as reader:
+        assert reader.decode() == TEXT
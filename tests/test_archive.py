@@ -0,0 +1,83 @@
+import os
+import pytest
+from archive import create_archive, ArchiveReader
+
+"""
+Archive of files and directories, members are extracted and compared with original files
+"""
+
+def write_files(directory):
+    files = {
+        "notes.txt": "first line\r\nsecond line ünïcode\n".encode("utf-8") * 100,
+        "image.png": bytes(range(256)) * 10,
+        "logs/service.log": b"GET /index 200\n" * 500,
+        "logs/empty.txt": b'',
+    }
+    for name, data in files.items():
+        path = os.path.join(directory, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as writer:
+            writer.write(data)
+    return files
+
+def test_archive(tmp_path):
+    source = tmp_path / "source"
+    files = write_files(str(source))
+    file_name = str(tmp_path / "archive.bin")
+    inputs = [str(source / "notes.txt"), str(source / "image.png"), str(source / "logs")]
+    assert create_archive(inputs, file_name) == len(files)
+    output = tmp_path / "output"
+    with ArchiveReader(file_name) as archive:
+        assert archive.names() == ["image.png", "logs/empty.txt", "logs/service.log", "notes.txt"]
+        for name in archive.names():
+            with open(archive.extract(name, str(output)), "rb") as reader:
+                assert reader.read() == files[name]
+        assert archive.verify() == []
+
+def test_archive_read_member(tmp_path):
+    source = tmp_path / "source"
+    files = write_files(str(source))
+    file_name = str(tmp_path / "archive.bin")
+    create_archive([str(source / "notes.txt"), str(source / "logs")], file_name)
+    with ArchiveReader(file_name) as archive:
+        #only txt files are compressed as text, other files as bytes
+        assert archive.read("notes.txt") == files["notes.txt"].decode("utf-8")
+        assert archive.read("logs/service.log") == files["logs/service.log"]
+
+def test_archive_duplicate_names(tmp_path):
+    for directory in ("a", "b"):
+        os.makedirs(str(tmp_path / directory))
+        with open(str(tmp_path / directory / "x.txt"), "w") as writer:
+            writer.write(directory)
+    with pytest.raises(ValueError):
+        create_archive([str(tmp_path / "a" / "x.txt"), str(tmp_path / "b" / "x.txt")], str(tmp_path / "archive.bin"))
+    #same file given twice is one member
+    assert create_archive([str(tmp_path / "a" / "x.txt")] * 2, str(tmp_path / "archive.bin")) == 1
+
+def test_archive_stream_member(tmp_path):
+    source = tmp_path / "source"
+    files = write_files(str(source))
+    file_name = str(tmp_path / "archive.bin")
+    create_archive([str(source / "notes.txt"), str(source / "logs")], file_name, block_size=1000)
+    with ArchiveReader(file_name) as archive:
+        with archive.container("notes.txt") as reader:
+            #container of member is view of mapped archive, not copy
+            assert isinstance(reader.data, memoryview)
+        for chunk_size in (1, 100, 1 << 16):
+            parts = list(archive.iter_read("logs/service.log", chunk_size))
+            assert all(len(part) == chunk_size for part in parts[:-1])
+            assert b''.join(parts) == files["logs/service.log"]
+        assert archive.read("notes.txt", parallel=True) == files["notes.txt"].decode("utf-8")
+
+def test_archive_corrupted_member(tmp_path):
+    source = tmp_path / "source"
+    write_files(str(source))
+    file_name = str(tmp_path / "archive.bin")
+    create_archive([str(source / "logs")], file_name)
+    with ArchiveReader(file_name) as archive:
+        offset, size, original_size, checksum = archive.members["logs/service.log"]
+        archive.members["logs/service.log"] = (offset, size, original_size, checksum ^ 1)
+        output = tmp_path / "output"
+        with pytest.raises(IOError):
+            archive.extract("logs/service.log", str(output))
+        assert not os.path.exists(str(output / "logs" / "service.log"))
@@ -0,0 +1,73 @@
+import random
+import pytest
+from bits import BitWriter, BitReader
+
+"""
+Packing of bits that are not aligned to bytes, compared to bits written as string of '0' and '1'
+"""
+
+def random_fields(seed, count=500):
+    generator = random.Random(seed)
+    fields = []
+    for _ in range(count):
+        length = generator.randint(0, 40)
+        fields.append((generator.getrandbits(length) if length else 0, length))
+    return fields
+
+def as_string(fields):
+    return "".join(format(value, "b").zfill(length) if length else "" for value, length in fields)
+
+def packed(bits):
+    padded = bits + "0" * (-len(bits) % 8)
+    return bytes(int(padded[i:i + 8], 2) for i in range(0, len(padded), 8))
+
+def test_unaligned_write():
+    fields = random_fields(1)
+    writer = BitWriter()
+    for value, length in fields:
+        writer.write(value, length)
+    bits = as_string(fields)
+    assert len(writer) == len(bits)
+    assert writer.getvalue() == packed(bits)
+
+def test_write_bytes_and_extend():
+    for offset in range(9):
+        for length in (0, 1, 7, 8, 9, 23, 64, 101):
+            prefix = "1" * offset
+            bits = as_string(random_fields(offset * 1000 + length, 10))[:length].ljust(length, "1")
+            writer = BitWriter()
+            writer.write(int(prefix or "0", 2), offset)
+            writer.write_bytes(packed(bits), length)
+            assert writer.getvalue() == packed(prefix + bits)
+            assert len(writer) == offset + length
+
+            other = BitWriter.from_bytes(packed(bits), length)
+            extended = BitWriter()
+            extended.write(int(prefix or "0", 2), offset)
+            extended.extend(other)
+            assert extended.getvalue() == packed(prefix + bits)
+            assert len(extended) == offset + length
+
+def test_unaligned_read():
+    fields = random_fields(2)
+    bits = as_string(fields)
+    reader = BitReader(packed(bits), len(bits))
+    for value, length in fields:
+        assert reader.read(length) == value
+    assert reader.remaining() == 0
+
+    reader = BitReader(packed(bits), len(bits), position=3)
+    assert "".join(str(reader.read_bit()) for _ in range(reader.remaining())) == bits[3:]
+    with pytest.raises(EOFError):
+        reader.read_bit()
+
+def test_take_keeps_pending_bits():
+    fields = random_fields(3)
+    writer = BitWriter()
+    taken = b""
+    for value, length in fields:
+        writer.write(value, length)
+        taken += writer.take()
+    bits = as_string(fields)
+    assert taken + writer.getvalue() == packed(bits)
+    assert len(writer) == len(bits) % 8
@@ -0,0 +1,124 @@
+import os
+import random
+from collections import Counter
+from tables import encode_with_table, canonical_codes
+from tree import HuffmanTree
+from container import ContainerWriter, ContainerReader, block_checksum, FLAG_BYTES, FLAG_TOKENS, FLAG_MODEL, \
+    FLAG_LOCAL, FLAG_ESCAPES
+from tokens import tokenize_text, split_tokens
+from model import train_model, save_model
+from pipeline import compress_document, compress_pipeline
+
+"""
+Round trip of documents through container in every mode of compression
+"""
+
+TEXT = "the quick brown fox jumps over the lazy dog, ünïcödé 日本語\r\n" * 300
+DATA = bytes(range(256)) * 20 + b'\x00' * 3000
+
+def test_chars():
+    with ContainerReader(compress_document(TEXT, 1000)) as reader:
+        assert not reader.binary
+        assert reader.decode() == TEXT
+        assert reader.decode(parallel=True) == TEXT
+        assert reader.verify() == []
+
+def test_bytes():
+    with ContainerReader(compress_document(DATA, 1000)) as reader:
+        assert reader.flags & FLAG_BYTES
+        assert reader.decode() == DATA
+
+def test_empty():
+    for document in ("", b''):
+        with ContainerReader(compress_document(document)) as reader:
+            assert not reader.decode()
+            assert reader.index == []
+
+def test_tokens(tmp_path):
+    file_name = str(tmp_path / "tokens.bin")
+    for alphabet in ("words", "ngrams"):
+        symbols = tokenize_text(TEXT, alphabet)
+        codes = canonical_codes(HuffmanTree(Counter(symbols)).code_lengths())
+        with ContainerWriter(file_name, codes, 1000) as writer:
+            for block, text in split_tokens(symbols, 1000):
+                writer.add_block(encode_with_table(block, codes), len(text), block_checksum(text))
+        with ContainerReader(file_name) as reader:
+            assert reader.flags & FLAG_TOKENS
+            assert reader.decode() == TEXT
+
+def test_model(tmp_path):
+    file_name = str(tmp_path / "model.bin")
+    model = train_model([TEXT[:2000]])
+    save_model(model, str(tmp_path))
+    #symbols that are not in sample are written with escape
+    document = TEXT + "symbols not in sample: {}[]~"
+    with ContainerWriter(file_name, None, 1000, model) as writer:
+        for i in range(0, len(document), 1000):
+            block = document[i:i + 1000]
+            encoded, escaped = model.encode(block)
+            writer.add_block(encoded, len(block), block_checksum(block), escaped)
+    with ContainerReader(file_name, str(tmp_path)) as reader:
+        assert reader.flags & FLAG_MODEL
+        assert reader.decode() == document
+        assert reader.verify() == []
+
+def test_model_compact(tmp_path):
+    file_name = str(tmp_path / "compact.bin")
+    model = train_model([TEXT[:2000]])
+    save_model(model, str(tmp_path))
+    #small document with model is written without header, code table and index of full form
+    for document in (TEXT[:43], TEXT[:40] + "{}~", ""):
+        with ContainerWriter(file_name, None, 1000, model) as writer:
+            if document:
+                encoded, escaped = model.encode(document)
+                writer.add_block(encoded, len(document), block_checksum(document), escaped)
+        if (document == TEXT[:43]):
+            assert os.path.getsize(file_name) < len(document.encode("utf-8"))
+        with ContainerReader(file_name, str(tmp_path)) as reader:
+            assert reader.compact
+            assert reader.flags & FLAG_MODEL
+            assert bool(reader.flags & FLAG_ESCAPES) == ("~" in document)
+            assert reader.decode() == document
+            assert reader.decode_range(3, 10) == document[3:10]
+            assert reader.verify() == []
+
+def test_local_tables(tmp_path):
+    input_file_name = str(tmp_path / "input.txt")
+    file_name = str(tmp_path / "local.bin")
+    with open(input_file_name, "w", encoding="utf-8", newline="") as writer:
+        writer.write(TEXT)
+    compress_pipeline(input_file_name, file_name, block_size=1000, parallel=False)
+    with ContainerReader(file_name) as reader:
+        assert reader.flags & FLAG_LOCAL
+        assert reader.decode() == TEXT
+
+def test_decode_range():
+    with ContainerReader(compress_document(TEXT, 1000)) as reader:
+        for start, end in ((0, 1), (0, 1000), (999, 1001), (1500, 4500), (len(TEXT) - 5, len(TEXT)), (10, 10)):
+            assert reader.decode_range(start, end) == TEXT[start:end]
+
+def test_verify_sample(monkeypatch):
+    container = bytearray(compress_document(TEXT, 1000))
+    with ContainerReader(bytes(container)) as reader:
+        offset, bits, length = reader.index[5]
+        blocks = len(reader.index)
+    #every bit of one byte of block 5 is flipped, block decodes to different text
+    container[offset + 3] ^= 0xff
+    sampled = []
+    def sample(population, k):
+        chosen = random_sample(population, k)
+        sampled.append(chosen)
+        return chosen
+
+    random_sample = random.sample
+    monkeypatch.setattr(random, "sample", sample)
+    random.seed(19)
+    with ContainerReader(bytes(container)) as reader:
+        assert reader.verify() == [5]
+        assert reader.verify(sample=1.0) == [5]
+        for _ in range(20):
+            corrupted = reader.verify(sample=0.25)
+            assert len(sampled[-1]) == round(blocks * 0.25)
+            assert corrupted == ([5] if 5 in sampled[-1] else [])
+    #corrupted block is found in some of samples, other blocks are never reported
+    assert any(5 in chosen for chosen in sampled[1:])
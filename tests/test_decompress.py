@@ -0,0 +1,58 @@
+import os
+import sys
+import subprocess
+import pytest
+from decompress import decompressed_file_name, iter_decompress
+from pipeline import compress_document
+
+"""
+Command line round trip: document compressed by main is decompressed by decompress.py and by main,
+and decompression of container part by part
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEXT = "line with NUL \x00 and CRLF\r\nünïcödé 日本語\r\n\x00\x00\rlast line\n" * 200
+
+def run(*args):
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "sequential")]))
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=environment, capture_output=True, check=True)
+
+@pytest.mark.parametrize("flags", [[], ["--stream", "--chunk-size", "333"], ["--pipeline", "--block-size", "500"]])
+def test_command_line_round_trip(tmp_path, flags):
+    document = str(tmp_path / "document.txt")
+    with open(document, "wb") as writer:
+        writer.write(TEXT.encode("utf-8"))
+    run(os.path.join("sequential", "main.py"), document, *flags)
+    file_name = str(tmp_path / "document_compressed.bin")
+
+    run("decompress.py", file_name, "--chunk-size", "100")
+    with open(decompressed_file_name(file_name), "rb") as reader:
+        assert reader.read() == TEXT.encode("utf-8")
+    assert run("decompress.py", file_name, "--output", "-", "--chunk-size", "7").stdout == TEXT.encode("utf-8")
+    assert b"MATCHES" in run("decompress.py", file_name, "--verify").stdout
+
+    os.remove(decompressed_file_name(file_name))
+    run(os.path.join("sequential", "main.py"), file_name, "--decompress")
+    with open(decompressed_file_name(file_name), "rb") as reader:
+        assert reader.read() == TEXT.encode("utf-8")
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_iter_decompress(tmp_path, parallel):
+    file_name = str(tmp_path / "document_compressed.bin")
+    for document in (TEXT[:3000], TEXT.encode("utf-8")[:3001], "a" * 50):
+        for block_size in (100, 1024, len(document) + 1):
+            with open(file_name, "wb") as writer:
+                writer.write(compress_document(document, block_size))
+            for chunk_size in (1, 7, 1000, len(document), len(document) + 5):
+                parts = list(iter_decompress(file_name, chunk_size, parallel))
+                assert document[:0].join(parts) == document
+                #every part has chunk_size symbols, only last part can be shorter
+                assert [len(part) for part in parts[:-1]] == [chunk_size] * (len(parts) - 1)
+                assert 0 < len(parts[-1]) <= chunk_size
+
+def test_iter_decompress_empty(tmp_path):
+    file_name = str(tmp_path / "document_compressed.bin")
+    for document in ("", b""):
+        with open(file_name, "wb") as writer:
+            writer.write(compress_document(document))
+        assert document[:0].join(iter_decompress(file_name, 7)) == document
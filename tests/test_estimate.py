@@ -0,0 +1,56 @@
+import io
+import pytest
+import tables
+import estimate
+from estimate import estimate_file, estimate_frequency, count_symbols, count_blocks
+from tables import build_codes_from_frequency, encode_with_table
+from container import ContainerWriter, block_checksum
+
+"""
+Predicted size of container compared with size of container written by compression
+"""
+
+TEXT = "the quick brown fox jumps over the lazy dog, ünïcödé 日本語 \U0001f600\r\n" * 300 + "zzzzzzzzzzzzzzzzz"
+DATA = bytes(range(256)) * 20 + b'\x00' * 3001
+
+def container_size(document, block_size, max_length=None):
+    codes = build_codes_from_frequency(count_symbols(document), True, max_length)
+    output = io.BytesIO()
+    with ContainerWriter(output, codes, block_size, binary=isinstance(document, bytes)) as writer:
+        for i in range(0, len(document), block_size):
+            block = document[i:i + block_size]
+            writer.add_block(encode_with_table(block, codes), len(block), block_checksum(block))
+    return len(output.getvalue())
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_estimate_is_exact(tmp_path, monkeypatch, numpy):
+    if (numpy):
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(tables, "np", None)
+    for name, document in (("text.txt", TEXT), ("data.bin", DATA), ("one.txt", "aaaa"), ("empty.txt", "")):
+        file_name = str(tmp_path / name)
+        with open(file_name, "wb") as writer:
+            writer.write(document if isinstance(document, bytes) else document.encode("utf-8"))
+        for block_size in (3, 1000, 4096, len(document) + 1):
+            for max_length in (None, 9):
+                predicted = estimate_file(file_name, block_size=block_size, max_length=max_length)["predicted"]
+                assert predicted == container_size(document, block_size, max_length)
+
+def test_estimate_without_document():
+    #without document padding of blocks is not added, prediction is smaller by less than one byte per block
+    frequency = count_symbols(TEXT)
+    for block_size in (7, 1000):
+        blocks = -(-len(TEXT) // block_size)
+        predicted = estimate_frequency(frequency, 0, block_size)["predicted"]
+        assert 0 <= container_size(TEXT, block_size) - predicted < blocks
+
+def test_count_blocks(monkeypatch):
+    #ranges of workers start at block boundaries, blocks are same as when document is counted in one process
+    monkeypatch.setattr(estimate.get_executor(), "choose", lambda size, releases_gil=False: ("serial", 4))
+    for document in (TEXT, DATA, ""):
+        for block_size in (3, 1000, len(document) + 1):
+            frequency, blocks = count_blocks(document, block_size)
+            assert (frequency, blocks) == count_symbols(document, block_size)
+            assert frequency == dict(count_symbols(document))
+            assert sum(sum(block.values()) for block in blocks) == len(document)
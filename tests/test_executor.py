@@ -0,0 +1,31 @@
+import pytest
+from executor import Executor, MIN_PART
+
+"""
+Cost model of executor: backend and number of parts chosen from size of input
+"""
+
+@pytest.mark.parametrize("workers", [1, 2, 6])
+def test_choose(workers):
+    executor = Executor(workers)
+    for releases_gil in (False, True):
+        parallel = 'thread' if releases_gil else 'process'
+        assert executor.choose(0, releases_gil) == ('serial', 1)
+        assert executor.choose(MIN_PART, releases_gil) == ('serial', 1)
+        assert executor.choose(2 * MIN_PART - 1, releases_gil) == ('serial', 1)
+        if (workers == 1):
+            assert executor.choose(100 * MIN_PART, releases_gil) == ('serial', 1)
+            continue
+        assert executor.choose(2 * MIN_PART, releases_gil) == (parallel, 2)
+        assert executor.choose(3 * MIN_PART - 1, releases_gil) == (parallel, 2)
+        assert executor.choose(3 * MIN_PART, releases_gil) == (parallel, min(workers, 3))
+        #parts are never more than workers
+        assert executor.choose(100 * MIN_PART, releases_gil) == (parallel, workers)
+
+def test_map():
+    executor = Executor(2)
+    assert executor.map('test', divmod, [(7, 2), (9, 4)], 'serial') == [(3, 1), (2, 1)]
+    assert executor.map('test', abs, [-1, 2], 'thread') == [1, 2]
+    assert executor.submit(divmod, (7, 2), 'serial').get() == (3, 1)
+    executor.close()
+    assert executor.thread_pool is None
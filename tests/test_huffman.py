@@ -0,0 +1,34 @@
+import pytest
+from sequential import huffman as sequential_huffman
+from parallel import huffman as parallel_huffman
+from tables import build_code_table, encode_with_table
+
+"""
+Table driven decoder of get_original compared with recursive decoder, for tree of every encoder
+"""
+
+TEXTS = ["abracadabra", "the quick brown fox jumps over the lazy dog, ünïcödé 日本語\r\n" * 50, "aaaa", "a"]
+
+def encode_text(huffman, text, encoder):
+    tree = huffman.build_huffman_tree(text)
+    tree.generate_codes()
+    if (encoder == 'search'):
+        return tree, huffman.encode(text, tree)
+    return tree, encode_with_table(text, build_code_table(tree), encoder == 'vectorized')
+
+@pytest.mark.parametrize("huffman", [sequential_huffman, parallel_huffman])
+@pytest.mark.parametrize("encoder", ['search', 'table', 'vectorized'])
+def test_table_matches_recursive(huffman, encoder):
+    for text in TEXTS:
+        tree, encoded = encode_text(huffman, text, encoder)
+        assert huffman.get_original(tree, encoded, 'table') == text
+        assert huffman.get_original(tree, encoded, 'recursive') == text
+
+@pytest.mark.parametrize("huffman", [sequential_huffman, parallel_huffman])
+def test_single_symbol(huffman):
+    for data in ("aaaa", b'\x00' * 5):
+        tree, encoded = encode_text(huffman, data, 'table')
+        assert len(encoded) == 0
+        for decoder in ('table', 'recursive'):
+            assert huffman.get_original(tree, encoded, decoder) == data
+            assert huffman.get_original(tree, encoded, decoder, 2) == data[:2]
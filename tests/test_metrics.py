@@ -0,0 +1,57 @@
+import json
+import time
+import pytest
+from metrics import Metrics
+
+"""
+Timers, counters, gauges and peak memory of metrics registry and their JSON report
+"""
+
+def test_timer():
+    metrics = Metrics()
+    for _ in range(2):
+        with metrics.timer('encode', 1000):
+            time.sleep(0.01)
+    #failed block is measured too
+    with pytest.raises(ValueError):
+        with metrics.timer('encode', 500):
+            raise ValueError()
+    entry = metrics.to_dict()["timers"]["encode"]
+    assert entry["count"] == 3 and entry["size"] == 2500
+    assert entry["seconds"] >= 0.02
+    assert entry["throughput"] == pytest.approx(2500 / entry["seconds"] / 1e6)
+
+def test_memory():
+    metrics = Metrics()
+    assert metrics.to_dict()["peak_memory"] is None
+    metrics.start_memory()
+    data = bytearray(1 << 20)
+    del data
+    metrics.stop_memory()
+    assert metrics.peak_memory >= 1 << 20
+    #stopping again keeps peak of last tracing
+    metrics.stop_memory()
+    assert metrics.peak_memory >= 1 << 20
+
+def test_json_report(tmp_path, capsys):
+    metrics = Metrics()
+    metrics.record('decode', 0.5, 1000000)
+    metrics.add('output_bytes', 10)
+    metrics.add('output_bytes', 5)
+    for value in (4, 1, 7):
+        metrics.observe('queue_depth', value)
+    file_name = str(tmp_path / "metrics.json")
+    text = metrics.to_json(file_name)
+    with open(file_name) as reader:
+        assert reader.read() == text
+    measurements = json.loads(text)
+    assert measurements == {
+        "timers": {"decode": {"count": 1, "seconds": 0.5, "size": 1000000, "throughput": 2.0}},
+        "counters": {"output_bytes": 15},
+        "gauges": {"queue_depth": {"last": 7, "max": 7, "average": 4.0}},
+        "peak_memory": None,
+    }
+    metrics.report()
+    assert "2.00 M symbols/s" in capsys.readouterr().out
+    metrics.reset()
+    assert json.loads(metrics.to_json()) == {"timers": {}, "counters": {}, "gauges": {}, "peak_memory": None}
@@ -0,0 +1,91 @@
+import os
+import sys
+import tracemalloc
+import importlib.util
+import pytest
+from collections import Counter
+from multiprocessing import shared_memory
+from tables import code_points, encode_with_table, build_code_table, build_codes_from_frequency
+from container import ContainerReader
+from pipeline import compress_document
+import executor
+from executor import Executor
+from parallel import huffman as parallel_huffman
+
+"""
+Parallel stages run with two workers and small parts, so short documents are split as large ones would be
+"""
+
+TEXT = "the quick brown fox jumps over the lazy dog, ünïcödé 日本語 \U0001f600\r\n" * 300
+DATA = bytes(range(256)) * 20 + b'\x00' * 3001
+
+@pytest.fixture
+def workers(monkeypatch):
+    pool = Executor(2)
+    monkeypatch.setattr(executor, "MIN_PART", 64)
+    monkeypatch.setattr(executor, "default_executor", pool)
+    yield pool
+    pool.close()
+
+def test_shared_counting(workers):
+    pytest.importorskip("numpy")
+    for document in (TEXT, DATA, TEXT[:200]):
+        assert workers.choose(len(document))[0] == 'process'
+        assert parallel_huffman.get_frequency(document) == Counter(document)
+        assert parallel_huffman.count_frequency(document) == Counter(document)
+
+def test_shared_counting_memory(workers):
+    pytest.importorskip("numpy")
+    #count arrays of workers are about 1MB each, array of whole text would be 4 bytes per character
+    document = TEXT * 200
+    tracemalloc.start()
+    try:
+        frequency = parallel_huffman.get_frequency(document)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert frequency == Counter(document)
+    #code points are written to shared memory part by part, array of whole text is never created
+    assert peak < 4 * len(document) // 2
+
+def test_shared_range(workers):
+    np = pytest.importorskip("numpy")
+    symbols = code_points(TEXT)
+    memory = shared_memory.SharedMemory(create=True, size=symbols.nbytes)
+    try:
+        np.ndarray(symbols.shape, dtype=symbols.dtype, buffer=memory.buf)[:] = symbols
+        size = int(symbols.max()) + 1
+        for start, end in ((0, len(TEXT)), (0, 0), (7, 1000), (len(TEXT) - 3, len(TEXT))):
+            counts = parallel_huffman.count_shared_range(memory.name, len(TEXT), start, end, size, symbols.dtype.str)
+            assert parallel_huffman.counts_to_frequency(counts) == Counter(TEXT[start:end])
+    finally:
+        memory.close()
+        memory.unlink()
+
+@pytest.fixture
+def parallel_main(monkeypatch):
+    #main imports huffman of its own directory as top level module
+    monkeypatch.setitem(sys.modules, "huffman", parallel_huffman)
+    spec = importlib.util.spec_from_file_location("parallel_main", os.path.join(os.path.dirname(parallel_huffman.__file__), "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.mark.parametrize("encoder", ['search', 'table', 'vectorized'])
+def test_stitched_parts(workers, parallel_main, encoder):
+    for document in (TEXT, DATA, TEXT[:201]):
+        encoded, tree, r, encoded_tree = parallel_main.encode_huffman(document, encoder)
+        expected = encode_with_table(document, build_code_table(tree))
+        assert (encoded.getvalue(), len(encoded)) == (expected.getvalue(), len(expected))
+        assert parallel_huffman.get_original(tree, encoded) == document
+
+def test_parallel_blocks(workers, parallel_main, tmp_path):
+    file_name = str(tmp_path / "document_compressed.bin")
+    for document in (TEXT, DATA):
+        for block_size in (100, 4097, len(document)):
+            codes = parallel_main.compress(document, file_name, block_size=block_size)
+            assert codes == build_codes_from_frequency(Counter(document))
+            with open(file_name, "rb") as reader:
+                assert reader.read() == compress_document(document, block_size)
+            with ContainerReader(file_name) as reader:
+                assert reader.decode(parallel=True) == document
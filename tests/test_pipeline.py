@@ -0,0 +1,69 @@
+import threading
+import pytest
+from queue import Queue
+import pipeline
+from pipeline import compress_pipeline, read_into, stop_reader
+from container import ContainerReader
+
+"""
+Reader thread of pipelined compression, its bounded queue and errors of reading passed to thread that encodes blocks
+"""
+
+TEXT = "the quick brown fox jumps over the lazy dog, ünïcödé 日本語\r\n" * 200
+
+def write_text(tmp_path):
+    file_name = str(tmp_path / "document.txt")
+    with open(file_name, "w", encoding="utf-8", newline="") as writer:
+        writer.write(TEXT)
+    return file_name
+
+def test_reader_waits_for_full_queue(tmp_path):
+    file_name = write_text(tmp_path)
+    blocks = Queue(2)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_into, args=(blocks, file_name, 100, False, stop), daemon=True)
+    reader.start()
+    #reader reads two blocks ahead and then waits until blocks are taken
+    reader.join(0.2)
+    assert reader.is_alive() and blocks.full()
+    assert blocks.get() == TEXT[:100] and blocks.get() == TEXT[100:200]
+    stop_reader(reader, blocks, stop)
+    assert not reader.is_alive()
+
+def test_reader_queue_is_bounded(tmp_path, monkeypatch):
+    sizes = []
+    class RecordingQueue(Queue):
+        def put(self, item, *args, **kwargs):
+            super().put(item, *args, **kwargs)
+            sizes.append((self.qsize(), self.maxsize))
+
+    monkeypatch.setattr(pipeline, "Queue", RecordingQueue)
+    file_name = write_text(tmp_path)
+    output_file_name = str(tmp_path / "document.bin")
+    for local in (True, False):
+        sizes.clear()
+        written = compress_pipeline(file_name, output_file_name, local, block_size=100, parallel=False, depth=3)
+        assert written == -(-len(TEXT) // 100)
+        assert len(sizes) == written + 1 and all(size <= maxsize == 3 for size, maxsize in sizes)
+        with ContainerReader(output_file_name) as reader:
+            assert reader.decode() == TEXT
+
+def test_reader_error(tmp_path, monkeypatch):
+    def failing_chunks(file_name, chunk_size, batch, binary):
+        for i in range(3):
+            yield [TEXT[i * chunk_size:(i + 1) * chunk_size]]
+        raise IOError("Disk is not readable!")
+
+    monkeypatch.setattr(pipeline, "read_chunks", failing_chunks)
+    blocks = Queue(10)
+    read_into(blocks, "document.txt", 100, False, threading.Event())
+    assert [blocks.get() for _ in range(3)] == [TEXT[:100], TEXT[100:200], TEXT[200:300]]
+    assert isinstance(blocks.get(), IOError) and blocks.empty()
+    #error of reader thread is raised by compression, reader thread is stopped
+    file_name = write_text(tmp_path)
+    threads = threading.active_count()
+    for local in (True, False):
+        with pytest.raises(IOError, match="not readable"):
+            compress_pipeline(file_name, str(tmp_path / "document.bin"), local, block_size=100, parallel=False,
+                              depth=2)
+        assert threading.active_count() == threads
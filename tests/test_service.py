@@ -0,0 +1,93 @@
+import os
+import time
+import asyncio
+import threading
+import pytest
+import service
+from service import CompressionService, ServiceClient
+from pipeline import compress_document
+
+"""
+Local compression service, requests are sent over Unix socket to service running in background thread
+"""
+
+TEXT = "the quick brown fox jumps over the lazy dog, ünïcödé 日本語\r\n" * 100
+DATA = bytes(range(256)) * 10
+
+async def serve(path, stopped):
+    task = asyncio.ensure_future(CompressionService().serve(path))
+    while not stopped.is_set():
+        await asyncio.sleep(0.01)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+@pytest.fixture
+def socket_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "MAX_PAYLOAD", 1 << 16)
+    path = str(tmp_path / "service.sock")
+    stopped = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(serve(path, stopped),))
+    thread.start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    yield path
+    stopped.set()
+    thread.join()
+
+def test_service_round_trip(socket_path):
+    with ServiceClient(socket_path) as client:
+        for document in (TEXT, DATA, ""):
+            container = client.compress(document)
+            assert container == compress_document(document)
+            original = client.decompress(container)
+            assert original == (document if isinstance(document, bytes) else document.encode("utf-8"))
+        assert "service.requests" in client.stats()
+
+def test_service_clients(socket_path):
+    results = []
+    def send(i):
+        with ServiceClient(socket_path) as client:
+            document = TEXT[i:]
+            results.append(client.decompress(client.compress(document)) == document.encode("utf-8"))
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 8
+
+def test_service_too_large(socket_path):
+    with ServiceClient(socket_path) as client:
+        with pytest.raises(IOError, match="too large"):
+            client.compress(b'x' * ((1 << 16) + 1))
+        #decompressed document larger than payload limit is refused too
+        with pytest.raises(IOError, match="too large"):
+            client.decompress(compress_document(b'x' * ((1 << 16) + 1)))
+        #connection stays usable after rejected requests
+        assert client.decompress(client.compress(TEXT)) == TEXT.encode("utf-8")
+
+def test_service_stop(tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "BATCH_REQUESTS", 1)
+    async def stop():
+        compression = CompressionService(max_batches=1)
+        task = asyncio.ensure_future(compression.serve(str(tmp_path / "service.sock")))
+        while compression.queue is None:
+            await asyncio.sleep(0.01)
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in range(3)]
+        for future in futures:
+            compression.queue.put_nowait(((service.COMPRESS, 0, TEXT.encode("utf-8")), future, time.perf_counter()))
+        #first batch runs, second waits for running batch and third stays in queue
+        while not compression.tasks:
+            await asyncio.sleep(0)
+        assert compression.queue.qsize() == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert not compression.tasks
+        return [future.result() for future in futures]
+    responses = asyncio.run(stop())
+    assert responses[0] == (service.STATUS_OK, compress_document(TEXT))
+    assert responses[1:] == [(service.STATUS_ERROR, b"Service is stopping!")] * 2
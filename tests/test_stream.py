@@ -0,0 +1,49 @@
+from collections import Counter
+from tables import build_codes_from_frequency
+from stream import compress_stream
+from container import ContainerReader
+from util import open_document
+
+"""
+Streaming compression of documents read chunk by chunk
+"""
+
+def compress_file(tmp_path, text, chunk_size, **kwargs):
+    input_file_name = str(tmp_path / "input.txt")
+    file_name = str(tmp_path / "input_compressed.bin")
+    with open_document(input_file_name, "w") as writer:
+        writer.write(text)
+    build = lambda frequency: build_codes_from_frequency(frequency, **kwargs)
+    compress_stream(input_file_name, file_name, build, Counter, chunk_size=chunk_size)
+    return file_name
+
+def test_stream_empty(tmp_path):
+    for kwargs in ({}, {"canonical": False}, {"max_length": 4}):
+        assert build_codes_from_frequency({}, **kwargs) == {}
+        with ContainerReader(compress_file(tmp_path, "", 10, **kwargs)) as reader:
+            assert reader.decode() == ""
+            assert reader.verify() == []
+
+def test_stream_uneven_chunks(tmp_path):
+    text = "abracadabra ünïcödé 日本語\r\n" * 4 + "tail"
+    for chunk_size in (7, 10, len(text) - 1, len(text) + 1):
+        for kwargs in ({}, {"canonical": False}, {"max_length": 5}):
+            with ContainerReader(compress_file(tmp_path, text, chunk_size, **kwargs)) as reader:
+                assert reader.length == len(text)
+                assert [length for offset, bits, length in reader.index] == \
+                       [len(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+                assert reader.decode() == text
+                assert reader.decode_range(chunk_size - 1, chunk_size + 2) == text[chunk_size - 1:chunk_size + 2]
+                assert reader.verify() == []
+
+def test_stream_uneven_chunks_bytes(tmp_path):
+    data = bytes(range(256)) + b'\x00\r\n' * 10
+    input_file_name = str(tmp_path / "input.bin")
+    file_name = str(tmp_path / "input_compressed.bin")
+    with open(input_file_name, "wb") as writer:
+        writer.write(data)
+    compress_stream(input_file_name, file_name, build_codes_from_frequency, Counter, chunk_size=7, binary=True)
+    with ContainerReader(file_name) as reader:
+        assert reader.binary
+        assert len(reader.index) == (len(data) + 6) // 7
+        assert reader.decode() == data
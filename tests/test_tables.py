@@ -0,0 +1,123 @@
+import random
+import pytest
+from fractions import Fraction
+from collections import Counter
+from tables import encode_with_table, encode_vectorized, build_codes_from_frequency, byte_frequency, \
+    limited_code_lengths, canonical_codes, encoded_length, DecodeTable, np
+from tree import HuffmanTree
+
+"""
+Encoding through precomputed code table, with and without numpy
+"""
+
+TEXT = "the quick brown fox jumps over the lazy dog, ünïcödé 日本語 \U0001f600\r\n" * 300
+DATA = bytes(range(256)) * 20 + b'\x00' * 3000
+
+def test_vectorized_matches_table():
+    pytest.importorskip("numpy")
+    for document, frequency in ((TEXT, Counter(TEXT)), (DATA, byte_frequency(DATA)), ("aaaa", {"a": 4})):
+        for canonical in (True, False):
+            codes = build_codes_from_frequency(frequency, canonical)
+            for end in (0, 1, 7, len(document)):
+                encoded = encode_with_table(document[:end], codes)
+                assert encode_vectorized(document[:end], codes) == (encoded.getvalue(), len(encoded))
+                assert encode_with_table(document[:end], codes, True).getvalue() == encoded.getvalue()
+
+def test_limited_lengths():
+    #Fibonacci frequencies give Huffman tree of maximal depth
+    fibonacci = [1, 1]
+    while len(fibonacci) < 20:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    frequency = {chr(ord("a") + i): f for i, f in enumerate(fibonacci)}
+    unlimited = HuffmanTree(frequency).code_lengths()
+    assert max(unlimited.values()) == 19
+    previous = None
+    for max_length in range(5, 21):
+        lengths = limited_code_lengths(frequency, max_length)
+        assert set(lengths) == set(frequency)
+        assert max(lengths.values()) <= max_length
+        assert sum(Fraction(1, 2 ** length) for length in lengths.values()) == 1
+        cost = encoded_length(frequency, lengths)
+        assert previous is None or cost <= previous
+        previous = cost
+        codes = canonical_codes(lengths)
+        encoded = encode_with_table("".join(frequency), codes)
+        assert len(encoded) == sum(lengths.values())
+    assert previous == encoded_length(frequency, unlimited)
+    with pytest.raises(ValueError):
+        limited_code_lengths(frequency, 4)
+
+def walk_byte(table, state, byte):
+    #walk of bits of one byte through trie, as decode table did before rows were filled by code prefixes
+    decoded = []
+    for shift in range(7, -1, -1):
+        state = table.children[state][(byte >> shift) & 1]
+        if state is None:
+            return table.empty.join(decoded), 0
+        if state < 0:
+            decoded.append(table.symbols[-1 - state])
+            state = 0
+    return table.empty.join(decoded), state
+
+def test_decode_rows_match_walk():
+    generator = random.Random(1)
+    large = "".join(chr(0x4e00 + generator.randint(0, 500)) for _ in range(3000))
+    for document in (TEXT, DATA, large, "ab"):
+        frequency = byte_frequency(document) if isinstance(document, bytes) else Counter(document)
+        for canonical in (True, False):
+            codes = build_codes_from_frequency(frequency, canonical)
+            encoded = encode_with_table(document, codes)
+            rows = DecodeTable(codes)
+            walk = DecodeTable(codes, 0)
+            assert not rows.walk and walk.walk
+            for table in (rows, walk):
+                assert table.decode(encoded) == document
+                for chunk_size in (1, 3, 8, 1000):
+                    parts = list(table.decode_chunks(encoded, chunk_size=chunk_size))
+                    assert document[:0].join(parts) == document
+                    #with rows every byte is decoded at once, part can't be shorter than one byte
+                    if (table.walk or chunk_size >= 8):
+                        assert all(len(part) <= chunk_size for part in parts)
+            for state in range(len(rows.children)):
+                assert rows.table[state] == [walk_byte(rows, state, byte) for byte in range(256)]
+
+def test_incomplete_code():
+    #model leaves escape out of its code table, data never reaches missing code
+    codes = canonical_codes({"a": 1, "b": 2, "c": 3})
+    table = DecodeTable(codes)
+    encoded = encode_with_table("abcabca", codes)
+    assert table.decode(encoded) == "abcabca"
+    assert table.table[0][0b11111111] == ("", 0)
+    for state in range(len(table.children)):
+        assert table.table[state] == [walk_byte(table, state, byte) for byte in range(256)]
+
+def test_vectorized_long_codes():
+    pytest.importorskip("numpy")
+    fibonacci = [1, 1]
+    while len(fibonacci) < 70:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    large = "".join(chr(0x10000 + i) for i in range(200)) * 400
+    for frequency, document in (({chr(0x4e00 + i): f for i, f in enumerate(fibonacci)}, None),
+                                ({chr(0x4e00 + i): f for i, f in enumerate(fibonacci[:60])}, None),
+                                (Counter(large), large), (Counter(TEXT * 5), TEXT * 5)):
+        document = document or "".join(frequency) * 3
+        for max_length in (None, 12):
+            codes = build_codes_from_frequency(frequency, max_length=max_length)
+            encoded = encode_with_table(document, codes)
+            assert encode_vectorized(document, codes) == (encoded.getvalue(), len(encoded))
+
+def test_missing_symbol():
+    codes = build_codes_from_frequency(Counter("abcab"))
+    byte_codes = build_codes_from_frequency(byte_frequency(b"abcab"))
+    cases = [("abxc", codes, "x"), ("ab\U0001f600", codes, "\U0001f600"), ("ab\x00", codes, "\x00"),
+             (b"abxc", byte_codes, ord("x")), (b"ab\xff", byte_codes, 255)]
+    for vectorized in (False, True):
+        if (vectorized and np is None):
+            continue
+        for document, table, symbol in cases:
+            with pytest.raises(KeyError) as error:
+                encode_with_table(document, table, vectorized)
+            assert error.value.args[0] == symbol
+    #code of one symbol has no bits, other symbols must still be rejected
+    with pytest.raises(KeyError):
+        encode_with_table("aab", {"a": (0, 0)}, np is not None)
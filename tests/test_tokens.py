@@ -0,0 +1,30 @@
+import random
+from tokens import ngram_dictionary, word_dictionary, tokenize, tokenize_text, split_tokens
+
+"""
+Word and n-gram dictionaries and tokenization of text with them
+"""
+
+random.seed(7)
+WORDS = ["".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 8)))
+         for _ in range(300)]
+TEXT = " ".join(random.choice(WORDS) for _ in range(20000))
+
+def test_ngram_budget():
+    dictionary = ngram_dictionary(TEXT, 200)
+    assert len(dictionary) == 200
+    #bigrams get every token that is left after trigrams
+    assert len([token for token in dictionary if len(token) == 3]) == 100
+    assert len(ngram_dictionary(TEXT, 201)) == 201
+
+def test_ngram_every_offset():
+    #every occurrence of 'xyz' starts at position 2 modulo 3
+    assert "xyz" in ngram_dictionary("ab" + "xyz" * 10, 2)
+
+def test_tokenize():
+    for alphabet, dictionary in (("words", word_dictionary(TEXT, 50)), ("ngrams", ngram_dictionary(TEXT, 50))):
+        tokens = tokenize(TEXT, dictionary, alphabet)
+        assert "".join(tokens) == TEXT
+        assert all(token in dictionary or len(token) == 1 for token in tokens)
+    tokens = tokenize_text(TEXT[:1000], "ngrams")
+    assert "".join(text for block, text in split_tokens(tokens, 100)) == TEXT[:1000]
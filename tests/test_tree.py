@@ -0,0 +1,42 @@
+import heapq
+import random
+from collections import Counter
+from tree import HuffmanTree
+from tables import encoded_length
+
+"""
+Two queue construction of Huffman tree compared with construction with heap
+"""
+
+def heap_cost(frequency):
+    #cost of Huffman tree is sum of weights of all internal nodes, which is number of bits of encoded document
+    heap = list(frequency.values())
+    heapq.heapify(heap)
+    cost = 0
+    while len(heap) > 1:
+        weight = heapq.heappop(heap) + heapq.heappop(heap)
+        cost += weight
+        heapq.heappush(heap, weight)
+    return cost
+
+def frequencies():
+    generator = random.Random(13)
+    yield Counter("the quick brown fox jumps over the lazy dog, ünïcödé 日本語\r\n" * 30)
+    yield {"a": 5}
+    yield {"a": 1, "b": 1}
+    yield {chr(ord("a") + i): 1 for i in range(26)}
+    yield {i: 2 ** i for i in range(30)}
+    for _ in range(50):
+        yield {i: generator.randint(1, 1000) for i in range(generator.randint(2, 300))}
+
+def test_cost_matches_heap():
+    for frequency in frequencies():
+        tree = HuffmanTree(frequency)
+        assert encoded_length(frequency, tree.code_lengths()) == heap_cost(frequency)
+        n = len(tree.symbols)
+        assert len(tree) == 2 * n - 1
+        assert tree.weights[tree.root()] == sum(frequency.values())
+        #internal nodes are created with non decreasing frequency
+        assert tree.weights[n:] == sorted(tree.weights[n:])
+        for i in range(n, len(tree)):
+            assert tree.weights[i] == tree.weights[tree.left[i - n]] + tree.weights[tree.right[i - n]]
@@ -0,0 +1,145 @@
+import re
+from collections import Counter
+from metrics import registry, timer
+
+"""
+Alphabets of larger symbols for Huffman coding of natural language text.
+Instead of one symbol per character, text is split to tokens from dictionary built from text itself:
+    words - words, runs of whitespace and punctuation (for example 'the', ' ', '\n\n')
+    ngrams - frequent character bigrams and trigrams, text is split greedily, longest token first
+Dictionary keeps only MAX_TOKENS tokens that save most symbols and appear at least MIN_TOKEN_COUNT times,
+rest of text falls back to single characters, so every text can be tokenized with its dictionary.
+Tokens are symbols of Huffman tree like characters, decoder emits whole token in one step,
+so there are fewer encoded symbols and fewer decode steps per character
+"""
+
+ALPHABETS = ("chars", "words", "ngrams")
+#words, runs of whitespace and single other characters, every character of text matches
+TOKEN_PATTERN = re.compile(r'\w+|\s+|[^\w\s]')
+MAX_TOKENS = 1024
+MIN_TOKEN_COUNT = 4
+NGRAM_SIZES = (3, 2)
+
+def prune_dictionary(counts, max_tokens=MAX_TOKENS, min_count=MIN_TOKEN_COUNT):
+    """
+    prune_dictionary: keeps tokens longer than one character that save most symbols
+
+    :param counts: number of occurrences of every candidate token (dictionary)
+    :param max_tokens: maximal number of tokens in dictionary (int)
+    :param min_count: minimal number of occurrences of token (int)
+    :return: returns tokens of dictionary (set)
+    """
+    candidates = [token for token, count in counts.items() if len(token) > 1 and count >= min_count]
+    candidates.sort(key=lambda token: (-counts[token] * (len(token) - 1), token))
+    return set(candidates[:max_tokens])
+
+def word_dictionary(text, max_tokens=MAX_TOKENS, min_count=MIN_TOKEN_COUNT):
+    """
+    word_dictionary: builds dictionary of most frequent words and runs of whitespace
+
+    :param text: input text (string)
+    :param max_tokens: maximal number of tokens in dictionary (int)
+    :param min_count: minimal number of occurrences of token (int)
+    :return: returns tokens of dictionary (set)
+    """
+    return prune_dictionary(Counter(TOKEN_PATTERN.findall(text)), max_tokens, min_count)
+
+def ngram_dictionary(text, max_tokens=MAX_TOKENS, min_count=MIN_TOKEN_COUNT):
+    """
+    ngram_dictionary: builds dictionary of most frequent character bigrams and trigrams
+    N-grams are counted at every position of text, trigrams get at most half of dictionary
+    and bigrams get rest of it, so dictionary has max_tokens tokens when text has enough candidates
+
+    :param text: input text (string)
+    :param max_tokens: maximal number of tokens in dictionary (int)
+    :param min_count: minimal number of occurrences of token (int)
+    :return: returns tokens of dictionary (set)
+    """
+    dictionary = set()
+    for size in NGRAM_SIZES:
+        counts = Counter(text[i:i + size] for i in range(len(text) - size + 1))
+        budget = max_tokens - len(dictionary) if size == NGRAM_SIZES[-1] else max_tokens // 2
+        dictionary |= prune_dictionary(counts, budget, min_count)
+    return dictionary
+
+def build_dictionary(text, alphabet="words", max_tokens=MAX_TOKENS, min_count=MIN_TOKEN_COUNT):
+    """
+    build_dictionary: builds dictionary of tokens for given alphabet
+
+    :param text: input text (string)
+    :param alphabet: 'words' or 'ngrams' (string)
+    :param max_tokens: maximal number of tokens in dictionary (int)
+    :param min_count: minimal number of occurrences of token (int)
+    :return: returns tokens of dictionary (set)
+    """
+    if (alphabet == "words"):
+        return word_dictionary(text, max_tokens, min_count)
+    if (alphabet == "ngrams"):
+        return ngram_dictionary(text, max_tokens, min_count)
+    raise ValueError("Alphabet is not correct!")
+
+def tokenize(text, dictionary, alphabet="words"):
+    """
+    tokenize: splits text to tokens of dictionary, text that is not in dictionary is split to characters
+
+    :param text: input text (string)
+    :param dictionary: tokens of dictionary (set)
+    :param alphabet: 'words' splits text to words first, 'ngrams' takes longest token at every position (string)
+    :return: returns tokens, joined they give text (list)
+    """
+    tokens = []
+    if (alphabet == "words"):
+        for token in TOKEN_PATTERN.findall(text):
+            if token in dictionary:
+                tokens.append(token)
+            else:
+                tokens.extend(token)
+        return tokens
+    sizes = sorted({len(token) for token in dictionary}, reverse=True)
+    i = 0
+    while i < len(text):
+        for size in sizes:
+            if text[i:i + size] in dictionary:
+                tokens.append(text[i:i + size])
+                i += size
+                break
+        else:
+            tokens.append(text[i])
+            i += 1
+    return tokens
+
+def split_tokens(tokens, block_size):
+    """
+    split_tokens: splits tokens to blocks of about block_size characters, token is never split between blocks
+
+    :param tokens: tokens of text (list)
+    :param block_size: number of characters in one block (int)
+    :return: returns tokens and text of every block (list)
+    """
+    blocks = []
+    start = 0
+    length = 0
+    for i, token in enumerate(tokens):
+        length += len(token)
+        if (length >= block_size):
+            blocks.append((tokens[start:i + 1], ''.join(tokens[start:i + 1])))
+            start = i + 1
+            length = 0
+    if (start < len(tokens)):
+        blocks.append((tokens[start:], ''.join(tokens[start:])))
+    return blocks
+
+def tokenize_text(text, alphabet="words", max_tokens=MAX_TOKENS, min_count=MIN_TOKEN_COUNT):
+    """
+    tokenize_text: builds dictionary from text and splits text with it
+
+    :param text: input text (string)
+    :param alphabet: 'words' or 'ngrams' (string)
+    :param max_tokens: maximal number of tokens in dictionary (int)
+    :param min_count: minimal number of occurrences of token (int)
+    :return: returns tokens of text (list)
+    """
+    with timer('tokenize', len(text)):
+        tokens = tokenize(text, build_dictionary(text, alphabet, max_tokens, min_count), alphabet)
+    registry.add('tokens', len(tokens))
+    return tokens
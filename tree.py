@@ -0,0 +1,117 @@
+from metrics import debug_tree
+
+"""
+Huffman tree stored in parallel arrays instead of linked Node objects.
+Leaves are nodes 0..n-1, sorted by frequency, internal nodes are n..2n-2 in order in which they are created,
+so every internal node has larger index than its children and root is the last node.
+For internal node i its children are left[i - n] and right[i - n].
+Tree is built with two queues in linear time after leaves are sorted:
+first queue holds leaves and second holds internal nodes, internal nodes are created
+with non decreasing frequency, so both queues stay sorted and smallest node is at head of one of them
+"""
+
+class HuffmanTree:
+    __slots__ = ('symbols', 'weights', 'left', 'right')
+
+    def __init__(self, frequency):
+        """
+        Construct a new 'HuffmanTree' object from frequencies with two queue algorithm.
+
+        :param frequency: frequency of every symbol in document (dictionary)
+        :return: returns nothing
+        """
+        if not frequency:
+            raise ValueError("Frequency is empty!")
+        self.symbols = sorted(sorted(frequency), key=frequency.__getitem__)
+        self.weights = [frequency[symbol] for symbol in self.symbols]
+        self.left = []
+        self.right = []
+        n = len(self.symbols)
+        weights = self.weights
+        leaf = 0
+        node = n
+        for _ in range(n - 1):
+            #on equal frequency leaf is taken first, it gives tree of smaller depth
+            if (node == len(weights) or (leaf < n and weights[leaf] <= weights[node])):
+                first = leaf
+                leaf += 1
+            else:
+                first = node
+                node += 1
+            if (node == len(weights) or (leaf < n and weights[leaf] <= weights[node])):
+                second = leaf
+                leaf += 1
+            else:
+                second = node
+                node += 1
+            self.left.append(first)
+            self.right.append(second)
+            weights.append(weights[first] + weights[second])
+
+    def __len__(self):
+        return len(self.weights)
+
+    def root(self):
+        """
+        root: returns index of root node
+
+        :return: returns index of root (int)
+        """
+        return len(self.weights) - 1
+
+    def depths(self):
+        """
+        depths: calculates depth of every node without recursion
+        Nodes are visited from root down, parent always has larger index than its children
+
+        :return: returns depth of every node (list)
+        """
+        n = len(self.symbols)
+        depth = [0] * len(self.weights)
+        for i in range(len(self.weights) - 1, n - 1, -1):
+            child_depth = depth[i] + 1
+            depth[self.left[i - n]] = child_depth
+            depth[self.right[i - n]] = child_depth
+        return depth
+
+    def code_lengths(self):
+        """
+        code_lengths: returns length of Huffman code of every symbol (depth of its leaf)
+
+        :return: returns code length of every symbol (dictionary)
+        """
+        depth = self.depths()
+        return {symbol: depth[i] for i, symbol in enumerate(self.symbols)}
+
+    def codes(self):
+        """
+        codes: returns codes read from tree, left child adds bit 0 and right child adds bit 1 to code of parent
+        Nodes are visited from root down, like in depths
+
+        :return: return code table, table[symbol] = (code value, code length) (dictionary)
+        """
+        n = len(self.symbols)
+        value = [0] * len(self.weights)
+        depth = [0] * len(self.weights)
+        for i in range(len(self.weights) - 1, n - 1, -1):
+            left = self.left[i - n]
+            right = self.right[i - n]
+            value[left] = value[i] << 1
+            value[right] = (value[i] << 1) | 1
+            depth[left] = depth[right] = depth[i] + 1
+        return {symbol: (value[i], depth[i]) for i, symbol in enumerate(self.symbols)}
+
+    def to_nodes(self, node_class):
+        """
+        to_nodes: converts tree to linked nodes, used by code that walks tree node by node
+
+        :param node_class: class of node, constructed as node_class(left, right, char, frequency) (class)
+        :return: returns root of tree (node_class)
+        """
+        n = len(self.symbols)
+        nodes = [node_class(None, None, symbol, weight) for symbol, weight in zip(self.symbols, self.weights)]
+        for i in range(n, len(self.weights)):
+            root = node_class(nodes[self.left[i - n]], nodes[self.right[i - n]], None, self.weights[i])
+            nodes.append(root)
+            debug_tree(root, 'frequency')
+        return nodes[-1]
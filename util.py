@@ -1,31 +1,20 @@
 import os
-import io
 import time
+from bits import BitWriter
+from metrics import registry
 
 """
 Functions for writing and reading from binary files as well as from txt files.
 Functions for converting string to byte array as well as for encoding huffman tree to byte array
 """
 
-def convert_to_bytes(string):
+def write_binary(file_name, mode, bits):
     """
-    convert_to_bytes: converts string to byte array
-
-    :param string: string to be converted (string)
-    :return: return byte array representation of given string
-    """
-    b = bytearray()
-    for i in range(0, len(string), 8):
-        b.append(int(string[i:i+8], 2))
-    return bytes(b)
-
-def write_binary(file_name, mode, string):
-    """
-    write_binary: opens binary file and write string as byte array to it
+    write_binary: opens binary file and write packed bits to it
 
     :param file_name: name of binary file, must have .bin extension (string)
     :param mode: mode for opening file accepted values are wb or ab
-    :param string: string that will be written to file (string)
+    :param bits: bits that will be written to file, last byte is padded with zeros (BitWriter or bytes)
     :return: return nothing
     """
     filename, file_extension = os.path.splitext(file_name)
@@ -33,8 +22,24 @@ def write_binary(file_name, mode, string):
         raise IOError("File must be binary!")
     if (mode not in ["ab", "wb"]):
         raise ValueError("Mode is not correct!")
+    if isinstance(bits, BitWriter):
+        bits = bits.getvalue()
     with open(file_name, mode) as writer:
-        writer.write(convert_to_bytes(string))
+        writer.write(bits)
+
+def open_document(file_name, mode="r", binary=False):
+    """
+    open_document: opens document for reading or writing, text is UTF-8 without newline translation,
+    so text that is compressed, estimated or archived is always same as bytes of file
+
+    :param file_name: name of document (string)
+    :param mode: 'r' or 'w' (string)
+    :param binary: open document as bytes, for binary files and images (bool)
+    :return: returns opened file (file)
+    """
+    if (binary):
+        return open(file_name, mode + "b")
+    return open(file_name, mode, encoding="utf-8", errors="surrogatepass", newline="")
 
 def write_txt(file_name, string):
     """
@@ -47,22 +52,30 @@ def write_txt(file_name, string):
     filename, file_extension = os.path.splitext(file_name)
     if (file_extension != ".txt"):
         raise IOError("File must be txt!")
-    with io.open(file_name, "w", encoding="utf-8") as writer:
+    with open_document(file_name, "w") as writer:
         writer.write(string)
 
-def convert_tree_to_bytes(tree):
+def convert_tree_to_bytes(tree, writer=None):
     """
-    convert_tree_to_bytes: converts Huffman tree to it's byte representation
+    convert_tree_to_bytes: converts Huffman tree to it's bit representation
     Each leaf is coded with 1 and all other nodes are coded with 0
-    For each leaf bit 1 is followed by ASCII representation of character stored in that leaf
+    For each leaf bit 1 is followed by ASCII representation of character (or value of byte) stored in that leaf
 
     :param tree: root node of Huffman tree (Node)
-    :return: return byte array representation of Huffman tree
+    :param writer: writer to which tree is appended, new writer is created if not given (BitWriter)
+    :return: return bit representation of Huffman tree (BitWriter)
     """
+    if writer is None:
+        writer = BitWriter()
     if (tree.is_leaf()):
-        return '1' + bin(ord(tree.char))[2:]
+        code = tree.char if isinstance(tree.char, int) else ord(tree.char)
+        writer.write(1, 1)
+        writer.write(code, code.bit_length())
     else:
-        return '0' + convert_tree_to_bytes(tree.left) + convert_tree_to_bytes(tree.right)
+        writer.write(0, 1)
+        convert_tree_to_bytes(tree.left, writer)
+        convert_tree_to_bytes(tree.right, writer)
+    return writer
 
 def print_tree(node, level=0):
     """
@@ -72,78 +85,25 @@ def print_tree(node, level=0):
     :return: return nothing
     """
     if node != None:
-        if (node.char):
+        if (node.char is not None):
             print(' ' * 4 * level + '->', node.char, " kod: ", node.code)
         else:
             print(' ' * 4 * level + '->', node.frequency)
         print_tree(node.left, level + 1)
         print_tree(node.right, level + 1)
 
-def load_tree_from_file(file_name, r):
-    """
-    load_tree_from_file: loads bytes representation of Huffman tree from binary file
-    :param file_name: name of binary file containing tree (string)
-    :param r: rest from dividing length of tree (bit number) with 8 (one byte is 8 bits)
-    represents length of last byte
-    :return: return string representation of tree (string)
-    """
-    filename, file_extension = os.path.splitext(file_name)
-    if (file_extension != ".bin"):
-        raise IOError("File must be binary!")
-    with open(file_name, "rb") as reader:
-        encoded_tree = []
-        while True:
-            byte_s = reader.read(1)
-            if not byte_s:
-                break
-            byte = byte_s[0]
-            bits = bin(byte)[2:]
-            if (bits == '0'):
-                break
-            while (len(bits) < 8):
-                bits = '0' + bits
-            encoded_tree.append(bits)
-            last_bits = bits
-
-    #remove zeros from last byte if it's length was less than 8
-    if (r < 8):
-        while (len(last_bits) != r):
-            last_bits = last_bits[1:]
-        encoded_tree[len(encoded_tree) - 1] = last_bits
-
-    return ''.join(encoded_tree)
-
-
-def save(output_file_name, r, encoded_tree, encoded):
-    """
-    save: save to file encoded tree with encoded data
-    Changes name of file, name must contain number of bits in last written byte
-    :param output_file_name: prefix of output file name, contains name of original file followed by _compressed_ (string)
-    :param r: number of bits in last written byte (int)
-    :param encoded_tree: Huffman's tree encoded to 1 and 0 (string)
-    :param encoded: encoded input text (string)
-    :return: return nothing
-    """
-    output_file_name += str(r) + ".bin"
-    write_binary(output_file_name, "wb", encoded_tree)
-    #extra 0 is for spacing tree from data
-    write_binary(output_file_name, "ab", '0')
-    write_binary(output_file_name, "ab", encoded)
-
-
 def calculate_time(func):
     # added arguments inside the inner1,
     # if function takes any arguments,
     # can be added like this.
     def inner1(*args, **kwargs):
         # storing time before function execution
-        begin = time.time()
+        begin = time.perf_counter()
 
         result = func(*args, **kwargs)
 
-        # storing time after function execution
-        end = time.time()
-        print("Total time taken in : ", func.__name__, end - begin)
+        # storing time after function execution in metrics registry
+        registry.record(func.__name__, time.perf_counter() - begin)
 
         return result
 